@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Benchmark pdf_page_filter.py stage by stage on the bundled SDS volumes.
+
+Each volume runs in a fresh process so peak RSS is measured per volume. The
+stages timed are: opening the PDF, detect_page_numbers,
+interpolate_missing_pages, page selection and PdfWriter.write. Every volume
+is run several times (--repeat) and the median of each stage is kept along
+with its spread. A stage only counts as a regression when it is long enough
+to time reliably and slowed down by more than both the threshold and the
+run-to-run noise. Detection accuracy is scored against a stored ground-truth
+page map, so speedups that break page numbering are caught alongside timing
+regressions.
+
+Usage:
+    python benchmark_pdf_filter.py                       # run and compare to baseline
+    python benchmark_pdf_filter.py --json results.json   # also save the results
+    python benchmark_pdf_filter.py --update-baseline     # accept current results
+    python benchmark_pdf_filter.py --write-ground-truth  # seed ground truth from detection
+"""
+
+import io
+import sys
+import json
+import time
+import statistics
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import pdf_page_filter
+from pdf_page_filter import PdfReader, PdfWriter
+
+BENCHMARK_DIR = Path(__file__).resolve().parent / 'benchmarks'
+DEFAULT_BASELINE = BENCHMARK_DIR / 'baseline.json'
+DEFAULT_GROUND_TRUTH = BENCHMARK_DIR / 'ground_truth.json'
+
+STAGES = ['open', 'detect', 'interpolate', 'select', 'write']
+
+# Relative slowdown of a stage (or of the total) reported as a regression
+DEFAULT_THRESHOLD = 0.20
+
+# Stages shorter than this (in both runs) are too noisy to flag
+MIN_COMPARABLE_SECONDS = 0.05
+
+# Runs per volume; the median of each stage is compared
+DEFAULT_REPEAT = 3
+
+# A slowdown must also exceed this many standard deviations of the run-to-run spread
+NOISE_FACTOR = 3.0
+
+
+def _peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def benchmark_volume(pdf_path, header_band=None, band_edges=('top',), jobs=1, truth=None):
+    """
+    Time each filter stage on one PDF (run in a fresh worker process).
+
+    Args:
+        pdf_path: Path to the PDF
+        header_band: Header/footer band height for detection
+        band_edges: Which strips to scan in band mode
+        jobs: Worker processes for detection
+        truth: Ground-truth mapping of physical index -> printed number (or
+            None for unnumbered pages), or None to skip accuracy scoring
+
+    Returns:
+        Dictionary with per-stage seconds, detection pages/second, peak RSS,
+        output size, the resulting page map and accuracy figures
+    """
+    timings = {}
+
+    start = time.perf_counter()
+    reader = PdfReader(pdf_path)
+    total_pages = len(reader.pages)
+    timings['open'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    detected = pdf_page_filter.detect_page_numbers(reader, verbose=False, header_band=header_band,
+                                                   band_edges=band_edges, jobs=jobs,
+                                                   input_path=pdf_path)
+    timings['detect'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    page_mapping = pdf_page_filter.interpolate_missing_pages(detected, total_pages, verbose=False)
+    timings['interpolate'] = time.perf_counter() - start
+
+    # Select every mapped page, as a full-volume filter run would
+    start = time.perf_counter()
+    requested = pdf_page_filter.parse_page_ranges('1-')
+    selected, _ = pdf_page_filter.select_printed_pages(
+        requested, pdf_page_filter.build_printed_to_physical(page_mapping))
+    writer = PdfWriter()
+    for _, phys_idx in selected:
+        writer.add_page(reader.pages[phys_idx])
+    timings['select'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output = io.BytesIO()
+    writer.write(output)
+    timings['write'] = time.perf_counter() - start
+
+    total_seconds = sum(timings.values())
+    result = {
+        'pdf': Path(pdf_path).name,
+        'pages': total_pages,
+        'pages_detected': len(detected),
+        'pages_mapped': len(page_mapping),
+        'pages_selected': len(selected),
+        'output_bytes': output.tell(),
+        'seconds': timings,
+        'total_seconds': total_seconds,
+        'detect_pages_per_second': total_pages / timings['detect'] if timings['detect'] else None,
+        'peak_rss_mb': _peak_rss_mb(),
+        'page_map': {str(phys_idx + 1): page_mapping.get(phys_idx) for phys_idx in range(total_pages)},
+    }
+    if truth is not None:
+        result['accuracy'] = score_page_map(page_mapping, truth, total_pages)
+    return result
+
+
+def score_page_map(page_mapping, truth, total_pages):
+    """
+    Compare a page mapping with the ground truth.
+
+    Args:
+        page_mapping: Dictionary of physical index -> printed number
+        truth: Dictionary of 1-based physical page (string) -> printed number or None
+        total_pages: Number of physical pages
+
+    Returns:
+        Dictionary with correct/wrong/missed/spurious counts, accuracy and
+        the 1-based physical pages that differ
+    """
+    counts = {'correct': 0, 'wrong': 0, 'missed': 0, 'spurious': 0}
+    errors = []
+    for phys_idx in range(total_pages):
+        expected = truth.get(str(phys_idx + 1))
+        actual = page_mapping.get(phys_idx)
+        if actual == expected:
+            counts['correct'] += 1
+            continue
+        if expected is None:
+            counts['spurious'] += 1
+        elif actual is None:
+            counts['missed'] += 1
+        else:
+            counts['wrong'] += 1
+        errors.append({'page': phys_idx + 1, 'expected': expected, 'actual': actual})
+    counts['accuracy'] = counts['correct'] / total_pages if total_pages else 1.0
+    counts['errors'] = errors
+    return counts
+
+
+def _spread(samples):
+    """Standard deviation of timing samples (0.0 for a single sample)."""
+    return statistics.stdev(samples) if len(samples) > 1 else 0.0
+
+
+def combine_runs(runs):
+    """
+    Merge repeated benchmark_volume() results for one volume.
+
+    Args:
+        runs: Non-empty list of results from benchmark_volume()
+
+    Returns:
+        The first run's result with seconds and total_seconds replaced by
+        medians, seconds_spread and total_spread holding the standard
+        deviation, detect_pages_per_second recomputed from the median and
+        peak_rss_mb the largest of the runs
+    """
+    result = dict(runs[0])
+    result['repeat'] = len(runs)
+    result['seconds'] = {stage: statistics.median(run['seconds'][stage] for run in runs)
+                         for stage in STAGES}
+    result['seconds_spread'] = {stage: _spread([run['seconds'][stage] for run in runs])
+                                for stage in STAGES}
+    result['total_seconds'] = statistics.median(run['total_seconds'] for run in runs)
+    result['total_spread'] = _spread([run['total_seconds'] for run in runs])
+    detect = result['seconds']['detect']
+    result['detect_pages_per_second'] = result['pages'] / detect if detect else None
+    rss = [run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None]
+    result['peak_rss_mb'] = max(rss) if rss else None
+    return result
+
+
+def run_benchmarks(pdf_paths, header_band=None, band_edges=('top',), jobs=1,
+                   ground_truth=None, verbose=True, repeat=DEFAULT_REPEAT):
+    """
+    Benchmark each PDF in its own process, repeat times.
+
+    Args:
+        pdf_paths: List of PDF paths
+        header_band: Header/footer band height for detection
+        band_edges: Which strips to scan in band mode
+        jobs: Worker processes for detection
+        ground_truth: Dictionary of PDF name -> truth mapping
+        verbose: Print one line per volume
+        repeat: Runs per volume, each in a fresh process
+
+    Returns:
+        Dictionary of PDF name -> result from combine_runs()
+    """
+    ground_truth = ground_truth or {}
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for pdf_path in pdf_paths:
+        name = Path(pdf_path).name
+        runs = []
+        for _ in range(max(1, repeat)):
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(benchmark_volume, str(pdf_path), header_band,
+                                            band_edges, jobs, ground_truth.get(name)).result())
+        result = combine_runs(runs)
+        results[name] = result
+
+        if verbose:
+            stages = ' '.join(f"{stage}={result['seconds'][stage]:.3f}s" for stage in STAGES)
+            accuracy = result.get('accuracy', {}).get('accuracy')
+            accuracy = f"{accuracy:.1%}" if accuracy is not None else 'n/a'
+            rss = f"{result['peak_rss_mb']:.0f}MB" if result['peak_rss_mb'] is not None else 'n/a'
+            print(f"{name:<22} {result['pages']:4d} pages  {stages}  "
+                  f"detect {result['detect_pages_per_second']:.1f} pages/s  rss={rss}  "
+                  f"accuracy={accuracy}")
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD, options=None):
+    """
+    Diff benchmark results against a baseline.
+
+    A stage is flagged when it takes at least MIN_COMPARABLE_SECONDS in
+    either run and its median slowed down by more than threshold and by more
+    than NOISE_FACTOR times the larger run-to-run spread of the two runs.
+    Baselines recorded without spreads count as noise-free. When the
+    baseline was recorded with other options, page maps and timings are not
+    comparable and only accuracy (scored against the ground truth) is
+    checked.
+
+    Args:
+        results: Dictionary from run_benchmarks()
+        baseline: Previously saved benchmark document
+        threshold: Relative slowdown reported as a regression
+        options: Options of this run (default: assume the baseline's)
+
+    Returns:
+        List of regression messages (empty if none)
+    """
+    regressions = []
+    previous = baseline.get('volumes', {})
+    same_options = options is None or baseline.get('options') == options
+    timed_stages = STAGES + ['total'] if same_options else []
+    for name, result in results.items():
+        old = previous.get(name)
+        if old is None:
+            continue
+
+        for stage in timed_stages:
+            if stage == 'total':
+                new_seconds, old_seconds = result['total_seconds'], old['total_seconds']
+                noise = max(result.get('total_spread', 0.0), old.get('total_spread', 0.0))
+            else:
+                new_seconds, old_seconds = result['seconds'][stage], old['seconds'].get(stage)
+                noise = max(result.get('seconds_spread', {}).get(stage, 0.0),
+                            old.get('seconds_spread', {}).get(stage, 0.0))
+            if not old_seconds or max(new_seconds, old_seconds) < MIN_COMPARABLE_SECONDS:
+                continue
+            slowdown = new_seconds - old_seconds
+            if slowdown > max(threshold * old_seconds, NOISE_FACTOR * noise):
+                regressions.append(f"{name}: {stage} {old_seconds:.3f}s -> {new_seconds:.3f}s "
+                                   f"(+{slowdown / old_seconds:.0%}, spread {noise:.3f}s)")
+
+        old_accuracy = old.get('accuracy', {}).get('accuracy')
+        new_accuracy = result.get('accuracy', {}).get('accuracy')
+        if old_accuracy is not None and new_accuracy is not None and new_accuracy < old_accuracy:
+            regressions.append(f"{name}: accuracy {old_accuracy:.1%} -> {new_accuracy:.1%}")
+
+        if not same_options:
+            continue
+        old_map, new_map = old.get('page_map', {}), result['page_map']
+        changed = sorted((int(page) for page in set(old_map) | set(new_map)
+                          if old_map.get(page) != new_map.get(page)))
+        if changed:
+            regressions.append(f"{name}: page map changed on physical pages {changed}")
+    return regressions
+
+
+def _load_json(path):
+    """Load a JSON document, or None if the file is missing, empty or not JSON."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        print(f"Note: '{path}' is not a JSON document, ignoring it")
+        return None
+
+
+def _write_json(path, data):
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark pdf_page_filter.py on SDS volumes.")
+    parser.add_argument('pdfs', nargs='*',
+                        help="PDFs to benchmark (default: SDS-*_filtered.pdf next to this script)")
+    parser.add_argument('--json', default=None, metavar='PATH', help="Write results to PATH")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE),
+                        help="Baseline results to compare against")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Overwrite the baseline with these results")
+    parser.add_argument('--ground-truth', default=str(DEFAULT_GROUND_TRUTH),
+                        help="Ground-truth page maps used to score detection accuracy")
+    parser.add_argument('--write-ground-truth', action='store_true',
+                        help="Seed the ground-truth file from this run's page maps "
+                             "(review the result by hand before committing it)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, metavar='N',
+                        help=f"Runs per volume; stage medians are compared (default {DEFAULT_REPEAT})")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Relative slowdown reported as a regression (default {DEFAULT_THRESHOLD})")
+    parser.add_argument('--header-band', type=float, nargs='?',
+                        const=pdf_page_filter.DEFAULT_HEADER_BAND, default=None, metavar='FRACTION',
+                        help="Benchmark header-band detection")
+    parser.add_argument('--band-edge', choices=['top', 'bottom', 'both'], default='top')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help="Detection worker processes")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function to run the benchmark suite."""
+    args = parse_args()
+    band_edges = ('top', 'bottom') if args.band_edge == 'both' else (args.band_edge,)
+    pdf_paths = args.pdfs or sorted(Path(__file__).resolve().parent.glob('SDS-*_filtered.pdf'))
+    if not pdf_paths:
+        print("Error: No PDFs to benchmark")
+        sys.exit(1)
+
+    ground_truth = _load_json(args.ground_truth) or {}
+    options = {'header_band': args.header_band, 'band_edges': list(band_edges), 'jobs': args.jobs}
+
+    print(f"Benchmarking {len(pdf_paths)} PDF(s) x {args.repeat} run(s) with {options}")
+    print("-" * 60)
+    results = run_benchmarks(pdf_paths, args.header_band, band_edges, args.jobs, ground_truth,
+                             repeat=args.repeat)
+    print("-" * 60)
+
+    total_pages = sum(result['pages'] for result in results.values())
+    total_seconds = sum(result['total_seconds'] for result in results.values())
+    correct = sum(result['accuracy']['correct'] for result in results.values() if 'accuracy' in result)
+    scored = sum(result['pages'] for result in results.values() if 'accuracy' in result)
+    print(f"Total: {total_pages} pages in {total_seconds:.2f}s "
+          f"({total_pages / total_seconds:.1f} pages/s end to end)")
+    if scored:
+        print(f"Detection accuracy: {correct}/{scored} pages ({correct / scored:.1%})")
+
+    document = {
+        'options': options,
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'volumes': results,
+    }
+
+    if args.json:
+        _write_json(args.json, document)
+        print(f"Results written to '{args.json}'")
+
+    if args.write_ground_truth:
+        truth = {name: result['page_map'] for name, result in results.items()}
+        _write_json(args.ground_truth, truth)
+        print(f"Ground truth written to '{args.ground_truth}'")
+
+    regressions = []
+    baseline = _load_json(args.baseline)
+    if args.update_baseline:
+        _write_json(args.baseline, document)
+        print(f"Baseline written to '{args.baseline}'")
+    elif baseline is not None:
+        if baseline.get('options') != options:
+            print(f"Note: baseline was recorded with {baseline.get('options')}; "
+                  f"comparing accuracy only, not page maps or timings")
+        regressions = compare_to_baseline(results, baseline, args.threshold, options)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against '{args.baseline}':")
+            for message in regressions:
+                print(f"  {message}")
+        else:
+            print(f"No regressions against '{args.baseline}'")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,15 +12,47 @@ Includes:
 The PDF uses two different reporting formats:
 1. Full experimental data with g(l)/100 g(2) - needs conversion to mass%
 2. Direct mass % reporting - use as-is
+
+With PDF arguments, records are extracted automatically by
+solubility_extractor instead of using the hand-typed all_data_raw:
+
+    python extract_solubility_complete.py SDS-14_filtered.pdf SDS-30_filtered.pdf
 """
 
 import csv
+import sys
+import argparse
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+
+from molar_mass import molar_masses
+from solubility_store import SolubilityStore
+from solubility_columns import ColumnWriter, write_columns
+from solubility_units import to_array, to_values, derive_columns, mass_percent_from_g_per_100g
+
+FIELDNAMES = ['Salt', 'CAS_Number', 'Temperature_C',
+              'Mass_Saturated_Solution_g', 'Mass_Oxide_g',
+              'Solubility_g_per_100g_H2O_old_masses', 'Solubility_g_per_100g_H2O_new_masses',
+              'Solubility_mass_percent', 'Solubility_mol_per_kg',
+              'Solid_Phase', 'Reference', 'Journal', 'Year', 'Additional_Conditions']
+
+# Records converted per batch when extracting from PDFs
+BATCH_SIZE = 1000
+
+# Data extracted from PDFs goes to <volume>_extracted.csv and is stored under
+# '<volume>_extracted', apart from the hand-curated CSVs and their store rows
+EXTRACTED_SUFFIX = '_extracted'
+
+# Hand-curated CSVs that extraction must never overwrite
+CURATED_SUFFIXES = ('_solubility_data.csv', '_solubility_data_COMPLETE.csv')
 
 def convert_g_per_100g_to_mass_percent(g):
     """Convert g solute / 100g water to mass%"""
     if g == "":
         return ""
-    return round((g / (g + 100)) * 100, 2)
+    return to_values(mass_percent_from_g_per_100g([g]), decimals=2)[0]
 
 # Complete data extracted from PDF
 # Format: (Salt, CAS, Temp, mass_satd_sln, mass_oxide, g_per_100g_old, g_per_100g_new, molality,
@@ -143,30 +175,62 @@ all_data_raw = [
      "Brunisholz, G.; Quinche, J.P.; Kalo, A.M.", "Helv. Chim. Acta", "1964", "mass_percent", ""),
 ]
 
-def main():
-    output_csv = "SDS-13_solubility_data.csv"
+def build_rows(entries, verbose=True, derive=False, extracted=False):
+    """
+    Turn 14-field data tuples into CSV rows with the mass% column filled in.
+
+    The g/100g H2O -> mass% conversion runs over the whole batch at once.
 
-    all_data = []
+    Args:
+        entries: Tuples in the all_data_raw layout (or SolubilityRecords)
+        verbose: Print each g/100g H2O -> mass% conversion
+        derive: Fill blank mass% and molality cells from each other using the
+            salt's molar mass (1977 atomic masses)
+        extracted: Rows come from the PDF extractor; 'mass_percent' records
+            leave the g/100g H2O column blank instead of repeating the
+            mass% there, as the hand-typed data does
 
-    for entry in all_data_raw:
+    Returns:
+        List of dictionaries keyed by FIELDNAMES
+    """
+    entries = list(entries)
+    g_new = to_array([entry[6] for entry in entries])
+    experimental = np.array([entry[12] == "experimental" for entry in entries], dtype=bool)
+    mass_percent = np.where(experimental, mass_percent_from_g_per_100g(g_new), np.nan)
+    converted = to_values(mass_percent, decimals=2)
+
+    if derive:
+        reported = np.where(experimental, mass_percent, np.where(
+            np.array([entry[12] == "mass_percent" for entry in entries], dtype=bool), g_new, np.nan))
+        molality = to_array([entry[7] for entry in entries])
+        derived = derive_columns(mass_percent=reported, molality=molality,
+                                 molar_mass=molar_masses(entry[0] for entry in entries))
+        derived_percent = to_values(np.where(np.isnan(reported), derived['mass_percent'], np.nan), decimals=2)
+        derived_molality = to_values(np.where(np.isnan(molality), derived['molality'], np.nan), decimals=3)
+
+    rows = []
+    for i, (entry, converted_percent) in enumerate(zip(entries, converted)):
         (salt, cas, temp, mass_satd, mass_oxide, g_per_100g_old, g_per_100g_new,
          molal, solid, ref, journal, year, format_type, notes) = entry
 
-        # Determine mass percent
         if format_type == "experimental":
-            # Has g/100g water data - convert to mass%
-            mass_percent = convert_g_per_100g_to_mass_percent(g_per_100g_new)
-            print(f"{salt} {temp}°C: {g_per_100g_new} g/100g H2O → {mass_percent}% mass")
+            # Has g/100g water data - converted to mass% above
+            mass_percent = converted_percent
+            if verbose:
+                print(f"{salt} {temp}°C: {g_per_100g_new} g/100g H2O → {mass_percent}% mass")
         elif format_type == "mass_percent":
-            # Already in mass%
-            if g_per_100g_new == "":
-                mass_percent = ""
-            else:
-                mass_percent = g_per_100g_new
+            # Already in mass% (carried in the g/100g column of the tuple)
+            mass_percent = g_per_100g_new
+            if extracted:
+                g_per_100g_new = ''
         else:
             mass_percent = ""
 
-        row = {
+        if derive:
+            mass_percent = mass_percent if mass_percent != '' else derived_percent[i]
+            molal = molal if molal != '' else derived_molality[i]
+
+        rows.append({
             'Salt': salt,
             'CAS_Number': cas,
             'Temperature_C': temp,
@@ -181,23 +245,226 @@ def main():
             'Journal': journal,
             'Year': year,
             'Additional_Conditions': notes
-        }
-        all_data.append(row)
+        })
+    return rows
 
-    # Write to CSV
-    fieldnames = ['Salt', 'CAS_Number', 'Temperature_C',
-                 'Mass_Saturated_Solution_g', 'Mass_Oxide_g',
-                 'Solubility_g_per_100g_H2O_old_masses', 'Solubility_g_per_100g_H2O_new_masses',
-                 'Solubility_mass_percent', 'Solubility_mol_per_kg',
-                 'Solid_Phase', 'Reference', 'Journal', 'Year', 'Additional_Conditions']
 
+def volume_paths(pdf_path, output_dir=None):
+    """
+    Volume name and output CSV path for an SDS PDF.
+
+    The CSV name differs from the hand-curated <volume>_solubility_data.csv,
+    so extracting a volume never replaces curated data.
+
+    Args:
+        pdf_path: Path to a (filtered) SDS PDF, e.g. 'SDS-13_filtered.pdf'
+        output_dir: Directory for the CSV (default: next to the PDF)
+
+    Returns:
+        Tuple (volume, output CSV path), e.g. ('SDS-13', 'SDS-13_extracted.csv')
+    """
+    pdf_path = Path(pdf_path)
+    volume = pdf_path.stem.replace('_filtered', '')
+    return volume, Path(output_dir or pdf_path.parent) / f"{volume}{EXTRACTED_SUFFIX}.csv"
+
+
+def store_volume(volume):
+    """Store key for a volume's extracted rows, e.g. 'SDS-13_extracted' (curated rows use 'SDS-13')."""
+    return f"{volume}{EXTRACTED_SUFFIX}"
+
+
+def check_output_csv(output_csv):
+    """
+    Refuse to overwrite a hand-curated CSV and create the CSV's directory.
+
+    Raises:
+        ValueError: If output_csv is an existing curated CSV
+    """
+    output_csv = Path(output_csv)
+    if output_csv.name.endswith(CURATED_SUFFIXES) and output_csv.exists():
+        raise ValueError(f"'{output_csv}' holds hand-curated data and is not overwritten by extraction")
+    output_csv.parent.mkdir(parents=True, exist_ok=True)
+
+
+def extract_volume(pdf_path, output_csv, volume, derive=False, store=None, columns=None,
+                   fingerprints=None, skip_duplicates=False, stats=None):
+    """
+    Extract one SDS PDF into a CSV, streaming the rows.
+
+    Args:
+        pdf_path: Path to the (filtered) SDS PDF
+        output_csv: CSV path to write (see check_output_csv())
+        volume: Volume name; rows are stored under store_volume(volume)
+        derive: Fill blank mass% and molality cells (see build_rows())
+        store: Optional SolubilityStore; the volume's rows are merged into it
+            by stable row key in one transaction
+        columns: Optional ColumnWriter that also receives every row
+        fingerprints: Optional page fingerprint index path; pages already
+            extracted (from any volume) are reused instead of extracted again
+        skip_duplicates: With fingerprints, leave out pages already extracted
+            from another volume
+        stats: Optional dict that receives the fingerprint page counts (see
+            page_fingerprints.VolumeFingerprints.page_records())
+
+    Returns:
+        Tuple (rows written, rows with mass% > 100)
+
+    Raises:
+        ValueError: If output_csv is a hand-curated CSV
+    """
+    from solubility_extractor import extract_records
+
+    check_output_csv(output_csv)
+    count = 0
+    invalid = 0
+    with open(output_csv, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+
+        def converted():
+            nonlocal count, invalid
+            if fingerprints:
+                import page_fingerprints
+
+                records = page_fingerprints.volume_records(pdf_path, fingerprints,
+                                                           skip_duplicates=skip_duplicates,
+                                                           stats=stats)
+            else:
+                records = extract_records(pdf_path)
+            # Convert in fixed-size batches so memory stays bounded
+            for batch in iter(lambda: list(islice(records, BATCH_SIZE)), []):
+                rows = build_rows(batch, verbose=False, derive=derive, extracted=True)
+                writer.writerows(rows)
+                if columns is not None:
+                    columns.append(rows)
+                count += len(rows)
+                invalid += sum(1 for row in rows if row['Solubility_mass_percent'] != '' and
+                               float(row['Solubility_mass_percent']) > 100)
+                yield from rows
+
+        if store is not None:
+            store.merge_volume(converted(), store_volume(volume))
+        else:
+            for _ in converted():
+                pass
+    return count, invalid
+
+
+def extract_pdfs(pdf_paths, output_dir=None, derive=False, store=None, columns=None,
+                 fingerprints=None, skip_duplicates=False):
+    """
+    Extract every binary solubility table from SDS PDFs into one CSV per volume.
+
+    Rows are written as they are extracted, so memory stays bounded however
+    large the volume is.
+
+    Args:
+        pdf_paths: Paths to (filtered) SDS PDFs
+        output_dir: Directory for the <volume>_extracted.csv files (created
+            if needed; default: next to each PDF)
+        derive: Fill blank mass% and molality cells (see build_rows())
+        store: Optional SolubilityStore; each volume's rows are merged into
+            it by stable row key in one transaction
+        columns: Optional ColumnWriter that also receives every row
+        fingerprints: Optional page fingerprint index path (see extract_volume())
+        skip_duplicates: With fingerprints, leave out pages already extracted
+            from another volume
+
+    Returns:
+        Dictionary of output CSV path -> number of rows written
+    """
+    written = {}
+    for pdf_path in pdf_paths:
+        volume, output_csv = volume_paths(pdf_path, output_dir)
+        stats = {}
+        count, invalid = extract_volume(pdf_path, output_csv, volume, derive=derive,
+                                        store=store, columns=columns, fingerprints=fingerprints,
+                                        skip_duplicates=skip_duplicates, stats=stats)
+
+        print(f"✓ Extracted {count} data points from {pdf_path} to {output_csv}")
+        if stats.get('linked') or stats.get('skipped'):
+            print(f"  {stats['linked']} pages reused, {stats['skipped']} duplicate pages skipped")
+        if invalid:
+            print(f"  ⚠ WARNING: {invalid} entries with mass% > 100!")
+        written[str(output_csv)] = count
+    return written
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Write SDS binary solubility data to CSV."
+    )
+    parser.add_argument('pdfs', nargs='*',
+                        help="SDS PDFs to extract automatically (default: the built-in SDS-13 data)")
+    parser.add_argument('--output-dir', default=None,
+                        help="Directory for the <volume>_extracted.csv files extracted from PDFs "
+                             "(default: next to each PDF)")
+    parser.add_argument('--derive', action='store_true',
+                        help="Fill blank mass%% and molality cells from the salt's molar mass")
+    parser.add_argument('--columns', default=None, metavar='DIR',
+                        help="Also write every row to one columnar table (see solubility_columns.py)")
+    parser.add_argument('--db', default=None, metavar='PATH',
+                        help="Also load the rows into a SQLite database (see solubility_store.py)")
+    parser.add_argument('--fingerprints', default=None, metavar='PATH',
+                        help="Page fingerprint index: reuse pages already extracted from any volume "
+                             "(see page_fingerprints.py)")
+    parser.add_argument('--skip-duplicate-pages', action='store_true',
+                        help="With --fingerprints, leave out pages already extracted from another volume")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.skip_duplicate_pages and not args.fingerprints:
+        print("Error: --skip-duplicate-pages needs --fingerprints")
+        sys.exit(2)
+    if args.pdfs:
+        fingerprint_options = {'fingerprints': args.fingerprints,
+                               'skip_duplicates': args.skip_duplicate_pages}
+        try:
+            columns = ColumnWriter(args.columns) if args.columns else None
+            if args.db:
+                with SolubilityStore(args.db) as store:
+                    extract_pdfs(args.pdfs, args.output_dir, derive=args.derive, store=store,
+                                 columns=columns, **fingerprint_options)
+                print(f"✓ Loaded into {args.db}")
+            else:
+                extract_pdfs(args.pdfs, args.output_dir, derive=args.derive, columns=columns,
+                             **fingerprint_options)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+        if columns is not None:
+            columns.close()
+            print(f"✓ Wrote {columns.rows} rows to columnar table {args.columns}")
+        return
+
+    output_csv = "SDS-13_solubility_data.csv"
+
+    all_data = build_rows(all_data_raw, derive=args.derive)
+
+    # Write to CSV
     with open(output_csv, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
         writer.writerows(all_data)
 
     print(f"\n✓ Extracted {len(all_data)} data points to {output_csv}")
 
+    if args.db:
+        with SolubilityStore(args.db) as store:
+            store.merge_volume(all_data, "SDS-13")
+        print(f"✓ Loaded into {args.db}")
+
+    if args.columns:
+        try:
+            write_columns(all_data, args.columns)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(2)
+        print(f"✓ Wrote columnar table {args.columns}")
+
     # Verify no mass% > 100
     invalid = [d for d in all_data if d['Solubility_mass_percent'] != '' and
                float(d['Solubility_mass_percent']) > 100]
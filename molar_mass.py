@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Chemical formula parser and molar-mass table.
+
+Handles the formulas that appear in the Salt and Solid_Phase columns:
+
+    Y(NO3)3                 parentheses (nested, or with square brackets)
+    Y(NO3)3·6H2O            hydrates joined by ·, •, * or .
+    α-La(NO3)3·6H2O         polymorph prefixes (α-, β-, ...) are ignored
+    CaSO4·0.5H2O            fractional hydrate counts
+
+Two atomic-mass sets are provided, matching the g/100 g H2O columns of the
+SDS volumes: '1925' (the International atomic weights the original authors
+used, the *_old_masses column) and '1977' (the IUPAC recommended values the
+compilers used, the *_new_masses column).
+
+Parsed formulas and molar masses are memoised, so repeated lookups of the
+same salt cost a dictionary hit, and molar_masses() resolves each distinct
+formula of a column only once.
+"""
+
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# IUPAC 1977 recommended atomic weights
+ATOMIC_MASSES_1977 = {
+    'H': 1.0079, 'Li': 6.941, 'Be': 9.01218, 'B': 10.81, 'C': 12.011, 'N': 14.0067,
+    'O': 15.9994, 'F': 18.998403, 'Na': 22.98977, 'Mg': 24.305, 'Al': 26.98154,
+    'Si': 28.0855, 'P': 30.97376, 'S': 32.06, 'Cl': 35.453, 'K': 39.0983,
+    'Ca': 40.08, 'Sc': 44.9559, 'Ti': 47.90, 'V': 50.9415, 'Cr': 51.996,
+    'Mn': 54.9380, 'Fe': 55.847, 'Co': 58.9332, 'Ni': 58.70, 'Cu': 63.546,
+    'Zn': 65.38, 'Ga': 69.72, 'Ge': 72.59, 'As': 74.9216, 'Se': 78.96,
+    'Br': 79.904, 'Rb': 85.4678, 'Sr': 87.62, 'Y': 88.9059, 'Zr': 91.22,
+    'Nb': 92.9064, 'Mo': 95.94, 'Ru': 101.07, 'Rh': 102.9055, 'Pd': 106.4,
+    'Ag': 107.868, 'Cd': 112.41, 'In': 114.82, 'Sn': 118.69, 'Sb': 121.75,
+    'Te': 127.60, 'I': 126.9045, 'Cs': 132.9054, 'Ba': 137.33, 'La': 138.9055,
+    'Ce': 140.12, 'Pr': 140.9077, 'Nd': 144.24, 'Sm': 150.4, 'Eu': 151.96,
+    'Gd': 157.25, 'Tb': 158.9254, 'Dy': 162.50, 'Ho': 164.9304, 'Er': 167.26,
+    'Tm': 168.9342, 'Yb': 173.04, 'Lu': 174.967, 'Hf': 178.49, 'Ta': 180.9479,
+    'W': 183.85, 'Re': 186.207, 'Os': 190.2, 'Ir': 192.22, 'Pt': 195.09,
+    'Au': 196.9665, 'Hg': 200.59, 'Tl': 204.37, 'Pb': 207.2, 'Bi': 208.9804,
+    'Th': 232.0381, 'U': 238.029,
+}
+
+# International atomic weights of 1925
+ATOMIC_MASSES_1925 = {
+    'H': 1.008, 'Li': 6.940, 'Be': 9.02, 'B': 10.82, 'C': 12.000, 'N': 14.008,
+    'O': 16.000, 'F': 19.00, 'Na': 22.997, 'Mg': 24.32, 'Al': 26.97,
+    'Si': 28.06, 'P': 31.027, 'S': 32.064, 'Cl': 35.457, 'K': 39.096,
+    'Ca': 40.07, 'Sc': 45.10, 'Ti': 48.1, 'V': 50.96, 'Cr': 52.01,
+    'Mn': 54.93, 'Fe': 55.84, 'Co': 58.94, 'Ni': 58.69, 'Cu': 63.57,
+    'Zn': 65.38, 'Ga': 69.72, 'Ge': 72.60, 'As': 74.96, 'Se': 79.2,
+    'Br': 79.916, 'Rb': 85.44, 'Sr': 87.63, 'Y': 89.33, 'Zr': 91.22,
+    'Nb': 93.1, 'Mo': 96.0, 'Ru': 101.7, 'Rh': 102.91, 'Pd': 106.7,
+    'Ag': 107.880, 'Cd': 112.41, 'In': 114.8, 'Sn': 118.70, 'Sb': 121.77,
+    'Te': 127.5, 'I': 126.932, 'Cs': 132.81, 'Ba': 137.37, 'La': 138.90,
+    'Ce': 140.25, 'Pr': 140.92, 'Nd': 144.27, 'Sm': 150.43, 'Eu': 152.0,
+    'Gd': 157.26, 'Tb': 159.2, 'Dy': 162.52, 'Ho': 163.4, 'Er': 167.7,
+    'Tm': 169.4, 'Yb': 173.6, 'Lu': 175.0, 'Hf': 178.6, 'Ta': 181.5,
+    'W': 184.0, 'Re': 188.7, 'Os': 190.8, 'Ir': 193.1, 'Pt': 195.23,
+    'Au': 197.2, 'Hg': 200.61, 'Tl': 204.39, 'Pb': 207.20, 'Bi': 209.00,
+    'Th': 232.15, 'U': 238.17,
+}
+
+MASS_SETS = {'1977': ATOMIC_MASSES_1977, '1925': ATOMIC_MASSES_1925}
+DEFAULT_MASS_SET = '1977'
+
+# Polymorph prefix such as "α-", "β-" or "a-"
+_POLYMORPH = re.compile(r'^\s*(?:[αβγδε]|[a-z])\s*-\s*')
+
+# Hydrate separators; "." is only read as one when none of the others is used
+_HYDRATE_SEPARATOR = re.compile(r'\s*[·•∙*]\s*')
+_HYDRATE_DOT = re.compile(r'\.(?=\d*\s*[A-Z(\[])')
+
+_TOKEN = re.compile(r'([A-Z][a-z]?)|(\d+(?:\.\d+)?)|([(\[])|([)\]])|(\s+)')
+_COEFFICIENT = re.compile(r'^\s*(\d+(?:\.\d+)?|\d+/\d+)?\s*(.+?)\s*$')
+
+_CLOSING = {'(': ')', '[': ']'}
+
+
+def _parse_part(part):
+    """Parse one formula part without hydrate dots into element counts."""
+    stack = [({}, None)]
+    tokens = _TOKEN.finditer(part)
+    position = 0
+    pending = None
+
+    def merge(counts, element_counts, multiplier):
+        for element, count in element_counts.items():
+            counts[element] = counts.get(element, 0) + count * multiplier
+
+    for token in tokens:
+        if token.start() != position:
+            raise ValueError(f"Unexpected '{part[position:token.start()]}' in formula '{part}'")
+        position = token.end()
+        element, number, opening, closing, space = token.groups()
+        if space:
+            continue
+
+        if number is not None:
+            if pending is None:
+                raise ValueError(f"Count without an element or group in formula '{part}'")
+            value = float(number) if '.' in number else int(number)
+            merge(stack[-1][0], pending, value - 1)
+            pending = None
+            continue
+
+        pending = None
+        if element:
+            pending = {element: 1}
+            merge(stack[-1][0], pending, 1)
+        elif opening:
+            stack.append(({}, opening))
+        else:
+            counts, bracket = stack.pop() if len(stack) > 1 else (None, None)
+            if bracket is None or _CLOSING[bracket] != closing:
+                raise ValueError(f"Unbalanced '{closing}' in formula '{part}'")
+            merge(stack[-1][0], counts, 1)
+            pending = counts
+
+    if position != len(part):
+        raise ValueError(f"Unexpected '{part[position:]}' in formula '{part}'")
+    if len(stack) > 1:
+        raise ValueError(f"Unclosed '{stack[-1][1]}' in formula '{part}'")
+    if not stack[0][0]:
+        raise ValueError(f"No elements in formula '{part}'")
+    return stack[0][0]
+
+
+def _split_parts(formula):
+    """
+    Split a formula at its hydrate dots, dropping any polymorph prefix.
+
+    Returns:
+        List of (multiplier, part) tuples, e.g. [(1, 'Y(NO3)3'), (6, 'H2O')]
+    """
+    body = _POLYMORPH.sub('', formula, count=1)
+    separator = _HYDRATE_SEPARATOR if _HYDRATE_SEPARATOR.search(body) else _HYDRATE_DOT
+    parts = []
+    for part in separator.split(body):
+        match = _COEFFICIENT.match(part)
+        if not match:
+            raise ValueError(f"Empty part in formula '{formula}'")
+        coefficient, part = match.groups()
+        if coefficient is None:
+            multiplier = 1
+        elif '/' in coefficient:
+            numerator, denominator = coefficient.split('/')
+            multiplier = int(numerator) / int(denominator)
+        else:
+            multiplier = float(coefficient) if '.' in coefficient else int(coefficient)
+        parts.append((multiplier, part))
+    return parts
+
+
+@lru_cache(maxsize=4096)
+def _parse_formula(formula):
+    counts = {}
+    for multiplier, part in _split_parts(formula):
+        for element, count in _parse_part(part).items():
+            counts[element] = counts.get(element, 0) + count * multiplier
+    return tuple(sorted(counts.items()))
+
+
+def parse_formula(formula):
+    """
+    Count the atoms of each element in a formula.
+
+    Args:
+        formula: Formula such as "α-La(NO3)3·6H2O"
+
+    Returns:
+        Dictionary of element symbol -> count
+
+    Raises:
+        ValueError: If the formula cannot be parsed
+    """
+    return dict(_parse_formula(formula.strip()))
+
+
+@lru_cache(maxsize=4096)
+def _molar_mass(formula, mass_set):
+    try:
+        masses = MASS_SETS[mass_set]
+    except KeyError:
+        raise ValueError(f"Unknown atomic-mass set '{mass_set}' (use {', '.join(MASS_SETS)})")
+    total = 0.0
+    for element, count in _parse_formula(formula):
+        if element not in masses:
+            raise ValueError(f"Unknown element '{element}' in formula '{formula}'")
+        total += masses[element] * count
+    return total
+
+
+def molar_mass(formula, mass_set=DEFAULT_MASS_SET):
+    """
+    Molar mass of a formula in g/mol.
+
+    Args:
+        formula: Formula such as "Y(NO3)3·6H2O"
+        mass_set: Atomic-mass set, '1977' or '1925'
+
+    Returns:
+        Molar mass as a float
+
+    Raises:
+        ValueError: If the formula cannot be parsed, has an unknown element
+            or the mass set is unknown
+    """
+    return _molar_mass(formula.strip(), str(mass_set))
+
+
+def molar_masses(formulas, mass_set=DEFAULT_MASS_SET):
+    """
+    Molar masses of a column of formulas.
+
+    Each distinct formula is resolved once however often it repeats.
+    Formulas that cannot be parsed (OCR damage, mixtures such as "Ice + A")
+    give NaN instead of raising.
+
+    Args:
+        formulas: Iterable of formula strings
+        mass_set: Atomic-mass set, '1977' or '1925'
+
+    Returns:
+        1-D float64 array of molar masses in g/mol
+    """
+    if str(mass_set) not in MASS_SETS:
+        raise ValueError(f"Unknown atomic-mass set '{mass_set}' (use {', '.join(MASS_SETS)})")
+    distinct, inverse = np.unique(np.asarray(list(formulas), dtype=str), return_inverse=True)
+    resolved = np.empty(len(distinct), dtype=float)
+    for i, formula in enumerate(distinct):
+        try:
+            resolved[i] = molar_mass(formula, mass_set)
+        except ValueError:
+            resolved[i] = np.nan
+    return resolved[inverse.reshape(-1)] if len(distinct) else np.empty(0, dtype=float)
+
+
+def split_hydrate(formula):
+    """
+    Split a solid phase into its anhydrous salt and number of waters.
+
+    Args:
+        formula: Formula such as "α-La(NO3)3·6H2O"
+
+    Returns:
+        Tuple (salt formula without polymorph prefix, water count)
+
+    Raises:
+        ValueError: If a part of the formula is empty
+    """
+    waters = 0
+    salt = []
+    for multiplier, part in _split_parts(formula.strip()):
+        if part == 'H2O':
+            waters += multiplier
+        else:
+            salt.append(part if multiplier == 1 else f"{multiplier}{part}")
+    return '·'.join(salt), waters
+
+
+def clear_cache():
+    """Forget every memoised formula and molar mass."""
+    _parse_formula.cache_clear()
+    _molar_mass.cache_clear()
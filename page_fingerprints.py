@@ -0,0 +1,705 @@
+#!/usr/bin/env python3
+"""
+Persistent index of page fingerprints across SDS volumes.
+
+Volumes overlap: errata, reprinted evaluations and compounds compiled in
+more than one volume repeat the same pages. Every page gets two fingerprints:
+
+    content   SHA-256 over the page's content streams and everything they
+              draw with (fonts, images, forms), compared by their encoded
+              bytes, so scanned pages are never decoded
+    text      SHA-256 of the page text with the running header (which holds
+              the printed page number) and all whitespace removed; None for
+              pages with too little text to tell apart
+
+and both are kept in a SQLite index with the printed page number found for
+the page. Volumes are keyed by the resolved path of their PDF. Runs that are given the index (--fingerprints) reuse earlier work:
+
+- page number detection takes the printed number of a page identical to a
+  page of another volume instead of scanning it,
+- extraction reuses the records of a page it has already extracted with the
+  same carried-over sheet context, without extracting its text, and
+- extraction with --skip-duplicate-pages leaves out pages already extracted
+  from another volume, so the dataset holds each page's rows once.
+
+Usage:
+    python page_fingerprints.py SDS-13.pdf SDS-14.pdf --index sds_fingerprints.db
+    python page_fingerprints.py --index sds_fingerprints.db --duplicates
+"""
+
+import re
+import sys
+import json
+import hashlib
+import sqlite3
+import argparse
+from pathlib import Path
+
+import pdf_page_filter
+import solubility_extractor
+from pdf_page_filter import PdfReader
+from page_map_cache import file_digest, source_state
+from extract_solubility_complete import volume_paths
+from solubility_extractor import SolubilityRecord, iter_page_texts, extract_page_records
+
+try:
+    from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+except ImportError:
+    from PyPDF2.generic import ArrayObject, DictionaryObject, IndirectObject, StreamObject
+
+# Bump when fingerprinting changes so volumes are re-fingerprinted
+FINGERPRINT_VERSION = 1
+
+# Bump when the tables change; older volumes and pages are dropped (records stay)
+SCHEMA_VERSION = 2
+
+DEFAULT_INDEX = 'sds_fingerprints.db'
+
+# Normalised text shorter than this (blank and near-blank pages) gets no text fingerprint
+MIN_TEXT_CHARS = 100
+
+# Pages recorded between commits, so concurrent workers do not wait on each other long
+COMMIT_EVERY = 64
+
+# Page attributes besides /Contents and /Resources that change what a page shows
+_PAGE_KEYS = ('/MediaBox', '/CropBox', '/Rotate')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS volumes (
+    id INTEGER PRIMARY KEY,
+    volume TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    volume_id INTEGER NOT NULL REFERENCES volumes (id) ON DELETE CASCADE,
+    physical INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    text TEXT,
+    printed INTEGER,
+    extracted INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (volume_id, physical)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS records (
+    content TEXT NOT NULL,
+    context TEXT NOT NULL,
+    rules TEXT NOT NULL,
+    text TEXT,
+    records TEXT NOT NULL,
+    next_context TEXT NOT NULL,
+    PRIMARY KEY (content, context, rules)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS pages_content ON pages (content);
+CREATE INDEX IF NOT EXISTS pages_text ON pages (text);
+"""
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalise_text(text):
+    """
+    Page text reduced to what stays the same when a page is reprinted.
+
+    The first line (the running header with the printed page number and the
+    section title) and a bare page number on the last line are dropped, and
+    case and whitespace are ignored.
+
+    Args:
+        text: Extracted page text
+
+    Returns:
+        Normalised text string
+    """
+    lines = [line for line in (text or '').splitlines() if line.strip()]
+    if lines:
+        lines = lines[1:]
+    if lines and lines[-1].strip().isdigit():
+        lines = lines[:-1]
+    return _WHITESPACE.sub('', ''.join(lines)).casefold()
+
+
+def text_fingerprint(text):
+    """
+    Fingerprint of a page's normalised text.
+
+    Args:
+        text: Extracted page text
+
+    Returns:
+        Hex digest, or None if the page has too little text to fingerprint
+    """
+    normalised = normalise_text(text)
+    if len(normalised) < MIN_TEXT_CHARS:
+        return None
+    return hashlib.sha256(normalised.encode('utf-8')).hexdigest()
+
+
+def _object_digest(obj, memo, active=()):
+    """
+    Digest of a PDF object and everything it references, by encoded bytes.
+
+    Indirect objects are memoised by object number, so resources shared by
+    many pages are hashed once per reader.
+    """
+    if isinstance(obj, IndirectObject):
+        if obj.idnum in memo:
+            return memo[obj.idnum]
+        if obj.idnum in active:
+            # Reference cycle (e.g. /Parent): the structure alone identifies it
+            return b'cycle'
+        digest = _object_digest(obj.get_object(), memo, active + (obj.idnum,))
+        memo[obj.idnum] = digest
+        return digest
+
+    hasher = hashlib.sha256()
+    if isinstance(obj, DictionaryObject):
+        hasher.update(b'<<')
+        for key in sorted(obj):
+            if key in ('/Parent', '/Length'):
+                continue
+            hasher.update(key.encode('utf-8'))
+            hasher.update(_object_digest(obj.raw_get(key), memo, active))
+        if isinstance(obj, StreamObject):
+            hasher.update(b'stream')
+            data = getattr(obj, '_data', None)
+            hasher.update(data if data is not None else obj.get_data())
+    elif isinstance(obj, ArrayObject):
+        hasher.update(b'[')
+        for item in obj:
+            hasher.update(_object_digest(item, memo, active))
+    else:
+        hasher.update(type(obj).__name__.encode('ascii'))
+        hasher.update(repr(obj).encode('utf-8', 'backslashreplace'))
+    return hasher.digest()
+
+
+def content_fingerprint(page, memo=None):
+    """
+    Fingerprint of what a page draws: its content streams and resources.
+
+    Args:
+        page: PageObject
+        memo: Optional dict shared across pages of one reader, so shared
+            fonts and images are hashed once
+
+    Returns:
+        Hex digest
+    """
+    memo = {} if memo is None else memo
+    hasher = hashlib.sha256()
+    for key in ('/Contents', '/Resources') + _PAGE_KEYS:
+        if key in page:
+            hasher.update(key.encode('ascii'))
+            hasher.update(_object_digest(page.raw_get(key), memo))
+    return hasher.hexdigest()
+
+
+def rules_digest():
+    """Digest of the extraction rules; stored records are only reused under the same rules."""
+    return file_digest(solubility_extractor.__file__)
+
+
+def _context_key(context):
+    """Sheet context as a JSON string key ('null' when there is none)."""
+    return json.dumps(list(context) if context is not None else None)
+
+
+class FingerprintIndex:
+    """
+    Page fingerprints of SDS volumes in a SQLite database.
+
+    Usable as a context manager; pending writes are committed and the
+    connection closed on exit.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX):
+        """
+        Open (and create if needed) an index.
+
+        Args:
+            path: Database file path, or ':memory:'
+        """
+        self.path = str(path)
+        # Pipeline workers share the file; wait for each other's short transactions
+        self._conn = sqlite3.connect(self.path, timeout=60)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        # Under a write lock, so concurrent workers do not migrate twice
+        self._conn.execute('BEGIN IMMEDIATE')
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            # Version 1 keyed volumes by file stem, so copies of a volume collided
+            self._conn.execute('DROP TABLE IF EXISTS pages')
+            self._conn.execute('DROP TABLE IF EXISTS volumes')
+            for statement in SCHEMA.split(';'):
+                if statement.strip():
+                    self._conn.execute(statement)
+            self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self._conn.commit()
+        self._pending = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Commit pending writes and close the database connection."""
+        self._conn.commit()
+        self._conn.close()
+
+    def commit(self):
+        """Commit pending writes."""
+        self._conn.commit()
+        self._pending = 0
+
+    def volume_entry(self, pdf_path):
+        """Stored id, size, mtime_ns, digest and version of a PDF's volume, or None."""
+        row = self._conn.execute('SELECT id, size, mtime_ns, digest, version FROM volumes '
+                                 'WHERE path = ?', (str(Path(pdf_path).resolve()),)).fetchone()
+        return dict(zip(('id', 'size', 'mtime_ns', 'digest', 'version'), row)) if row else None
+
+    def register_volume(self, volume, pdf_path, state):
+        """
+        Add a volume, or forget its pages if its PDF changed.
+
+        A PDF without an entry takes over the entry of a PDF with the same
+        digest that no longer exists, so a renamed or moved volume keeps its
+        pages.
+
+        Args:
+            volume: Volume name, e.g. 'SDS-13'
+            pdf_path: Path to its PDF
+            state: source_state() of the PDF
+
+        Returns:
+            Tuple (volume id, whether its pages must be fingerprinted)
+        """
+        path = str(Path(pdf_path).resolve())
+        entry = self.volume_entry(pdf_path)
+        if entry is None:
+            rows = self._conn.execute('SELECT id, path FROM volumes WHERE digest = ?',
+                                      (state['digest'],)).fetchall()
+            moved = next((volume_id for volume_id, old in rows if not Path(old).exists()), None)
+            if moved is not None:
+                entry = self._conn.execute('SELECT id, size, mtime_ns, digest, version FROM volumes '
+                                           'WHERE id = ?', (moved,)).fetchone()
+                entry = dict(zip(('id', 'size', 'mtime_ns', 'digest', 'version'), entry))
+        with self._conn:
+            if (entry is not None and entry['digest'] == state['digest']
+                    and entry['version'] == FINGERPRINT_VERSION):
+                self._conn.execute('UPDATE volumes SET volume = ?, path = ?, size = ?, mtime_ns = ? '
+                                   'WHERE id = ?',
+                                   (volume, path, state['size'], state['mtime_ns'], entry['id']))
+                count = self._conn.execute('SELECT COUNT(*) FROM pages WHERE volume_id = ?',
+                                           (entry['id'],)).fetchone()[0]
+                return entry['id'], count == 0
+            self._conn.execute('DELETE FROM volumes WHERE path = ? OR id = ?',
+                               (path, entry['id'] if entry is not None else None))
+            volume_id = self._conn.execute(
+                'INSERT INTO volumes (volume, path, size, mtime_ns, digest, version) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (volume, path, state['size'], state['mtime_ns'], state['digest'],
+                 FINGERPRINT_VERSION)).lastrowid
+        return volume_id, True
+
+    def remove_volume(self, pdf_path):
+        """Forget a PDF's volume and its pages (records stay, they are keyed by content)."""
+        with self._conn:
+            self._conn.execute('DELETE FROM volumes WHERE path = ?', (str(Path(pdf_path).resolve()),))
+
+    def record_page(self, volume_id, physical_idx, content, text=None, printed=None,
+                    extracted=None):
+        """
+        Store one page's content fingerprint and update its other fields.
+
+        Text, printed and extracted values of None leave the stored ones as
+        they were. Writes are committed every COMMIT_EVERY pages and by
+        commit() or close().
+        """
+        self._conn.execute('INSERT INTO pages (volume_id, physical, content) VALUES (?, ?, ?) '
+                           'ON CONFLICT (volume_id, physical) DO UPDATE SET content = excluded.content',
+                           (volume_id, physical_idx, content))
+        updates = {'text': text, 'printed': printed,
+                   'extracted': None if extracted is None else int(extracted)}
+        updates = {column: value for column, value in updates.items() if value is not None}
+        if updates:
+            self._conn.execute(
+                f"UPDATE pages SET {', '.join(f'{column} = ?' for column in updates)} "
+                'WHERE volume_id = ? AND physical = ?',
+                list(updates.values()) + [volume_id, physical_idx])
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.commit()
+
+    def known_numbers(self, volume_id, contents):
+        """
+        Printed numbers of pages identical to pages of other volumes.
+
+        Args:
+            volume_id: The volume being detected
+            contents: List of content fingerprints, one per physical page
+
+        Returns:
+            Dictionary of physical index -> printed number
+        """
+        known = {}
+        wanted = {}
+        for physical_idx, content in enumerate(contents):
+            wanted.setdefault(content, []).append(physical_idx)
+        items = list(wanted)
+        for offset in range(0, len(items), 500):
+            chunk = items[offset:offset + 500]
+            rows = self._conn.execute(
+                'SELECT content, MIN(printed) FROM pages WHERE volume_id != ? AND printed IS NOT NULL '
+                f"AND content IN ({', '.join('?' * len(chunk))}) GROUP BY content",
+                [volume_id] + chunk).fetchall()
+            for content, printed in rows:
+                for physical_idx in wanted[content]:
+                    known[physical_idx] = printed
+        return known
+
+    def original(self, volume_id, content, text=None):
+        """
+        The first-indexed page of another volume already extracted with the same
+        content or text, or None.
+
+        Returns:
+            Tuple (volume, physical index, printed number) or None
+        """
+        clauses = ['p.content = ?']
+        params = [content]
+        if text is not None:
+            clauses.append('p.text = ?')
+            params.append(text)
+        return self._conn.execute(
+            'SELECT v.volume, p.physical, p.printed FROM pages p JOIN volumes v ON v.id = p.volume_id '
+            f"WHERE p.volume_id != ? AND p.extracted = 1 AND ({' OR '.join(clauses)}) "
+            'ORDER BY v.id, p.physical LIMIT 1', [volume_id] + params).fetchone()
+
+    def cached_records(self, content, context, rules):
+        """
+        Records extracted earlier from an identical page under the same context and rules.
+
+        Returns:
+            Tuple (list of SolubilityRecord, next context, text fingerprint)
+            or None
+        """
+        row = self._conn.execute('SELECT records, next_context, text FROM records '
+                                 'WHERE content = ? AND context = ? AND rules = ?',
+                                 (content, _context_key(context), rules)).fetchone()
+        if row is None:
+            return None
+        next_context = json.loads(row[1])
+        return ([SolubilityRecord(*record) for record in json.loads(row[0])],
+                tuple(next_context) if next_context is not None else None, row[2])
+
+    def store_records(self, content, context, rules, text, records, next_context):
+        """Remember the records and next context extracted from a page."""
+        self._conn.execute('INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?)',
+                           (content, _context_key(context), rules, text,
+                            json.dumps([list(record) for record in records]),
+                            _context_key(next_context)))
+
+    def duplicates(self):
+        """
+        Pages that repeat a page of an earlier-indexed volume.
+
+        Returns:
+            List of (path, physical index, printed number, original path,
+            original physical index, original printed number), ordered by
+            path and page
+        """
+        first = {}
+        duplicates = []
+        rows = self._conn.execute('SELECT v.id, v.path, p.physical, p.printed, p.content, p.text '
+                                  'FROM pages p JOIN volumes v ON v.id = p.volume_id '
+                                  'ORDER BY v.id, p.physical')
+        for volume_id, path, physical_idx, printed_num, content, text in rows:
+            page = (volume_id, path, physical_idx, printed_num)
+            keys = [('content', content)] + ([('text', text)] if text is not None else [])
+            original = next((first[key] for key in keys
+                             if key in first and first[key][0] != volume_id), None)
+            if original is not None:
+                duplicates.append(page[1:] + original[1:])
+            for key in keys:
+                first.setdefault(key, page)
+        return sorted(duplicates)
+
+    def volumes(self):
+        """List of (volume, path, pages fingerprinted), ordered by volume and path."""
+        return self._conn.execute(
+            'SELECT v.volume, v.path, COUNT(p.physical) FROM volumes v '
+            'LEFT JOIN pages p ON p.volume_id = v.id GROUP BY v.id ORDER BY v.volume, v.path').fetchall()
+
+
+class VolumeFingerprints:
+    """
+    One volume's pages in a fingerprint index, for a detection or extraction run.
+
+    Content fingerprints are computed on first use and kept for the run.
+    Usable as a context manager; the index is closed on exit.
+    """
+
+    def __init__(self, index_path, pdf_path, reader=None):
+        """
+        Open the index and register the volume.
+
+        Args:
+            index_path: Fingerprint index path
+            pdf_path: Path to the volume's PDF
+            reader: PdfReader already opened from pdf_path
+        """
+        self.pdf_path = pdf_path
+        self.reader = reader if reader is not None else PdfReader(pdf_path)
+        self.index = FingerprintIndex(index_path)
+        self.volume, _ = volume_paths(pdf_path)
+        state = source_state(pdf_path, self.index.volume_entry(pdf_path))
+        # fresh: no pages recorded for this version of the PDF yet
+        self.volume_id, self.fresh = self.index.register_volume(self.volume, pdf_path, state)
+        self._memo = {}
+        self._contents = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Commit and close the index."""
+        self.index.close()
+
+    def content(self, physical_idx):
+        """Content fingerprint of a physical page."""
+        if physical_idx not in self._contents:
+            self._contents[physical_idx] = content_fingerprint(self.reader.pages[physical_idx],
+                                                               self._memo)
+        return self._contents[physical_idx]
+
+    def known_numbers(self):
+        """Printed numbers of this volume's pages that repeat pages of other volumes."""
+        contents = [self.content(physical_idx) for physical_idx in range(len(self.reader.pages))]
+        return self.index.known_numbers(self.volume_id, contents)
+
+    def record_numbers(self, detected):
+        """
+        Record every page's content fingerprint with its detected printed number.
+
+        Args:
+            detected: Dictionary of physical index -> detected printed number
+        """
+        for physical_idx in range(len(self.reader.pages)):
+            self.index.record_page(self.volume_id, physical_idx, self.content(physical_idx),
+                                   printed=detected.get(physical_idx))
+        self.index.commit()
+        self.fresh = False
+
+    def record_texts(self):
+        """Extract every page's text and record its text fingerprint."""
+        for physical_idx, page_text in iter_page_texts(self.pdf_path, reader=self.reader):
+            self.index.record_page(self.volume_id, physical_idx, self.content(physical_idx),
+                                   text=text_fingerprint(page_text))
+        self.index.commit()
+
+    def page_records(self, physical_indices=None, skip_duplicates=False, stats=None):
+        """
+        Extract stage that reuses records of pages already extracted.
+
+        A page whose content fingerprint was extracted before under the same
+        carried-over sheet context and extraction rules takes the stored
+        records without extracting its text, so the records are the same as
+        a fresh extraction gives.
+
+        Args:
+            physical_indices: Pages to extract, in order (default: every page)
+            skip_duplicates: Leave out the records of pages already extracted
+                from another volume (by content or text fingerprint)
+            stats: Optional dict that receives 'extracted', 'linked' and
+                'skipped' page counts
+
+        Yields:
+            SolubilityRecord tuples
+        """
+        stats = stats if stats is not None else {}
+        for name in ('extracted', 'linked', 'skipped'):
+            stats.setdefault(name, 0)
+        if physical_indices is None:
+            physical_indices = range(len(self.reader.pages))
+        rules = rules_digest()
+        context = None
+        try:
+            for physical_idx in physical_indices:
+                content = self.content(physical_idx)
+                cached = self.index.cached_records(content, context, rules)
+                if cached is not None:
+                    records, next_context, text = cached
+                    stats['linked'] += 1
+                else:
+                    _, page_text = next(iter_page_texts(self.pdf_path, [physical_idx],
+                                                        reader=self.reader))
+                    text = text_fingerprint(page_text)
+                    records, next_context = extract_page_records(page_text, context)
+                    self.index.store_records(content, context, rules, text, records, next_context)
+                    stats['extracted'] += 1
+                context = next_context
+
+                original = self.index.original(self.volume_id, content, text) if skip_duplicates else None
+                self.index.record_page(self.volume_id, physical_idx, content, text=text,
+                                       extracted=original is None)
+                if original is not None:
+                    stats['skipped'] += 1
+                    continue
+                yield from records
+        finally:
+            self.index.commit()
+
+
+def volume_records(pdf_path, index_path, physical_indices=None, reader=None,
+                   skip_duplicates=False, stats=None):
+    """
+    Stream a volume's records, reusing those of pages already extracted.
+
+    Args:
+        pdf_path: Path to the PDF
+        index_path: Fingerprint index path
+        physical_indices: Pages to extract, in order (default: every page)
+        reader: PdfReader already opened from pdf_path
+        skip_duplicates: Leave out pages already extracted from another volume
+        stats: Optional dict that receives page counts (see
+            VolumeFingerprints.page_records())
+
+    Yields:
+        SolubilityRecord tuples in page order
+    """
+    with VolumeFingerprints(index_path, pdf_path, reader) as fingerprints:
+        yield from fingerprints.page_records(physical_indices, skip_duplicates, stats)
+
+
+def fingerprint_volumes(pdf_paths, index_path=DEFAULT_INDEX, options=None, text=False,
+                        force=False, verbose=True):
+    """
+    Fingerprint every page of the given volumes, skipping unchanged ones.
+
+    Content fingerprints are recorded by page number detection
+    (resolve_page_mapping() with fingerprints=index_path), so the page map
+    cache is used and pages identical to already indexed pages are not
+    scanned.
+
+    Args:
+        pdf_paths: Paths to SDS PDFs
+        index_path: Fingerprint index path
+        options: Detection options (header_band, band_edges, use_cache,
+            cache_dir, use_page_labels), as in pdf_batch
+        text: Also extract each page's text for its text fingerprint
+        force: Fingerprint volumes that are already indexed again
+        verbose: Print one line per volume
+
+    Returns:
+        Dictionary of PDF path -> 'indexed' or 'unchanged'
+    """
+    options = options or {}
+    results = {}
+    for pdf_path in pdf_paths:
+        if force:
+            with FingerprintIndex(index_path) as index:
+                index.remove_volume(pdf_path)
+        reader = PdfReader(pdf_path)
+        with VolumeFingerprints(index_path, pdf_path, reader) as fingerprints:
+            fresh = fingerprints.fresh
+        if not (fresh or text):
+            results[str(pdf_path)] = 'unchanged'
+            if verbose:
+                print(f"[unchanged] {pdf_path}")
+            continue
+
+        detected, _ = pdf_page_filter.resolve_page_mapping(
+            reader, pdf_path, verbose=False,
+            header_band=options.get('header_band'),
+            band_edges=options.get('band_edges', ('top',)),
+            use_cache=options.get('use_cache', True),
+            cache_dir=options.get('cache_dir'),
+            use_page_labels=options.get('use_page_labels', True),
+            fingerprints=index_path,
+        )
+        if text:
+            with VolumeFingerprints(index_path, pdf_path, reader) as fingerprints:
+                fingerprints.record_texts()
+        results[str(pdf_path)] = 'indexed'
+        if verbose:
+            print(f"[  indexed] {pdf_path}: {len(reader.pages)} pages, "
+                  f"{len(detected)} printed numbers")
+    return results
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Fingerprint SDS pages and find pages repeated across volumes."
+    )
+    parser.add_argument('pdfs', nargs='*', help="SDS PDFs to fingerprint")
+    parser.add_argument('--index', default=DEFAULT_INDEX,
+                        help=f"Fingerprint index database (default: {DEFAULT_INDEX})")
+    parser.add_argument('--text', action='store_true',
+                        help="Also extract page text for text fingerprints (slower)")
+    parser.add_argument('--duplicates', action='store_true',
+                        help="Print the pages that repeat a page of an earlier volume")
+    parser.add_argument('--force', action='store_true', help="Fingerprint every volume again")
+    parser.add_argument('--header-band', type=float, nargs='?',
+                        const=pdf_page_filter.DEFAULT_HEADER_BAND, default=None,
+                        metavar='FRACTION', help="Detect page numbers from a header strip first")
+    parser.add_argument('--band-edge', choices=['top', 'bottom', 'both'], default='top',
+                        help="Which strip to scan in header-band mode (default: top)")
+    parser.add_argument('--no-page-labels', action='store_true',
+                        help="Ignore /PageLabels and always detect numbers from text")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Do not read or write the page map cache")
+    parser.add_argument('--cache-dir', default=None, help="Page map cache directory")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function to fingerprint volumes and report duplicate pages."""
+    args = parse_args()
+    if not args.pdfs and not args.duplicates:
+        print("Error: Give PDFs to fingerprint and/or --duplicates")
+        sys.exit(2)
+    missing = [pdf for pdf in args.pdfs if not Path(pdf).exists()]
+    if missing:
+        print(f"Error: File(s) not found: {', '.join(missing)}")
+        sys.exit(2)
+
+    if args.pdfs:
+        options = {
+            'header_band': args.header_band,
+            'band_edges': ('top', 'bottom') if args.band_edge == 'both' else (args.band_edge,),
+            'use_cache': not args.no_cache,
+            'cache_dir': args.cache_dir,
+            'use_page_labels': not args.no_page_labels,
+        }
+        fingerprint_volumes(args.pdfs, args.index, options=options, text=args.text,
+                            force=args.force)
+
+    if args.duplicates:
+        with FingerprintIndex(args.index) as index:
+            duplicates = index.duplicates()
+            volumes = index.volumes()
+        # Copies of a volume share its name; tell them apart by path
+        names = [volume for volume, _, _ in volumes]
+        labels = {path: volume if names.count(volume) == 1 else path for volume, path, _ in volumes}
+        by_path = {}
+        for path, physical_idx, printed_num, original, original_idx, original_num in duplicates:
+            by_path.setdefault(path, []).append(
+                f"  physical {physical_idx + 1} (printed {printed_num or '-'}) = "
+                f"{labels[original]} physical {original_idx + 1} (printed {original_num or '-'})")
+        for volume, path, pages in volumes:
+            lines = by_path.get(path, [])
+            print(f"{labels[path]}: {len(lines)} of {pages} pages repeat an earlier volume")
+            for line in lines:
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
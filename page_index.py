@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Persistent full-text page index over SDS volumes.
+
+Text is extracted from every page of every volume once, and each page's
+terms are stored in a SQLite inverted index:
+
+    cas       CAS numbers, e.g. '[10361-93-0]'
+    formula   chemical formulas, OCR-normalised ('Y(N03)3' -> 'Y(NO3)3'), each
+              hydrate also under its anhydrous salt ('La(NO3)3·6H2O' ->
+              'La(NO3)3')
+    word      lower-case words of three or more letters
+
+A compilation sheet that continues onto pages without its own COMPONENTS
+box passes its salt and CAS number on to those pages, so a compound query
+finds whole tables, not just their first page. Every page is stored with
+its physical index and printed page number. The page map cache and
+/PageLabels are used as by resolve_page_mapping(); otherwise the printed
+numbers are detected from the same text pass that yields the terms, so each
+page's text is extracted once, and the result is cached for the filter.
+
+Volumes are keyed by the resolved path of their PDF, so copies of a volume
+(e.g. SDS-13.pdf and SDS-13_filtered.pdf) keep separate entries.
+Re-indexing skips volumes whose PDF is unchanged. pdf_page_filter.py
+--compound resolves a compound to the matching pages from the index
+without opening any PDF for text.
+
+Usage:
+    python page_index.py SDS-13.pdf SDS-14.pdf --index sds_pages.db
+    python page_index.py --index sds_pages.db --query "La(NO3)3"
+"""
+
+import re
+import sys
+import sqlite3
+import argparse
+from pathlib import Path
+
+import pdf_page_filter
+from pdf_page_filter import PdfReader
+from page_map_cache import DEFAULT_MAX_BYTES, source_state
+from page_ranges import PageRanges
+from molar_mass import molar_mass, split_hydrate
+from extract_solubility_complete import volume_paths
+from solubility_extractor import iter_page_texts, extract_page_records, normalise_formula
+
+# Bump when tokenisation changes so volumes are re-indexed
+INDEX_VERSION = 1
+
+# Bump when the tables change; older tables are dropped and volumes re-indexed
+SCHEMA_VERSION = 2
+
+DEFAULT_INDEX = 'sds_page_index.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS volumes (
+    id INTEGER PRIMARY KEY,
+    volume TEXT NOT NULL,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    pages INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pages (
+    volume_id INTEGER NOT NULL REFERENCES volumes (id) ON DELETE CASCADE,
+    physical INTEGER NOT NULL,
+    printed INTEGER,
+    PRIMARY KEY (volume_id, physical)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    volume_id INTEGER NOT NULL REFERENCES volumes (id) ON DELETE CASCADE,
+    physical INTEGER NOT NULL,
+    PRIMARY KEY (term, volume_id, physical)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS volumes_digest ON volumes (digest);
+CREATE INDEX IF NOT EXISTS postings_volume ON postings (volume_id);
+"""
+
+_CAS = re.compile(r'\[?\s*(\d{2,7})\s*-\s*(\d{2})\s*-\s*(\d)\s*\]?')
+_WORD = re.compile(r'[A-Za-z]{3,}')
+# Formula candidates: start with a capital, contain a digit or a bracket
+_FORMULA = re.compile(r"[A-Z][A-Za-z0-9()\[\]]*(?:['·.]\s?\d*\s?H\s?2\s?[O0])?")
+
+
+def _formula_terms(candidate, require_group=True):
+    """
+    Normalised formula terms for one candidate token (empty if not a formula).
+
+    Short capitalised words of running text can parse as formulas ('In',
+    'No', 'Co'), so with require_group only tokens holding a digit or a
+    bracket are taken as formulas.
+    """
+    if require_group and not re.search(r'[\d()\[\]]', candidate):
+        return set()
+    formula = normalise_formula(candidate)
+    try:
+        molar_mass(formula)
+        salt, waters = split_hydrate(formula)
+    except ValueError:
+        return set()
+    return {formula, salt} if waters else {formula}
+
+
+def page_terms(text, sheet=None):
+    """
+    Index terms of one page.
+
+    Args:
+        text: Page text
+        sheet: Optional (salt, CAS number) of the compilation sheet the page
+            belongs to
+
+    Returns:
+        Set of (term, kind) tuples, kind being 'cas', 'formula' or 'word'
+    """
+    terms = {(f"[{a}-{b}-{c}]", 'cas') for a, b, c in _CAS.findall(text)}
+    for candidate in _FORMULA.findall(text):
+        terms.update((formula, 'formula') for formula in _formula_terms(candidate))
+    terms.update((word.lower(), 'word') for word in _WORD.findall(text))
+    if sheet:
+        salt, cas = sheet
+        terms.update((formula, 'formula') for formula in _formula_terms(salt, require_group=False))
+        if cas:
+            terms.add((cas, 'cas'))
+    return terms
+
+
+def query_terms(query):
+    """
+    Index terms for a query: a CAS number, a formula or words.
+
+    Args:
+        query: e.g. '[10361-93-0]', 'La(NO3)3' or 'yttrium nitrate'
+
+    Returns:
+        List of (term, kind) tuples that must all occur on a page
+    """
+    query = query.strip()
+    cas = _CAS.fullmatch(query)
+    if cas:
+        return [(f"[{cas.group(1)}-{cas.group(2)}-{cas.group(3)}]", 'cas')]
+    if _formula_terms(query, require_group=False):
+        return [(normalise_formula(query), 'formula')]
+    return [(word.lower(), 'word') for word in _WORD.findall(query)]
+
+
+class PageIndex:
+    """
+    Inverted index of SDS pages in a SQLite database.
+
+    Usable as a context manager; the connection is closed on exit.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX):
+        """
+        Open (and create if needed) an index.
+
+        Args:
+            path: Database file path, or ':memory:'
+        """
+        self.path = str(path)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        if self._conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            # Version 1 keyed volumes by file stem, so copies of a volume collided
+            self._conn.executescript('DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS pages; '
+                                     'DROP TABLE IF EXISTS volumes;')
+        self._conn.executescript(SCHEMA)
+        self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    def volume_entry(self, pdf_path):
+        """Stored size, mtime_ns, digest and version of a PDF's volume, or None."""
+        row = self._conn.execute('SELECT size, mtime_ns, digest, version FROM volumes WHERE path = ?',
+                                 (str(Path(pdf_path).resolve()),)).fetchone()
+        return dict(zip(('size', 'mtime_ns', 'digest', 'version'), row)) if row else None
+
+    def adopt_moved(self, volume, pdf_path, digest):
+        """
+        Move the entry of a PDF that no longer exists to pdf_path.
+
+        Args:
+            volume: Volume name of pdf_path
+            pdf_path: Path to a PDF without an entry
+            digest: Its digest; only an entry with the same digest is moved
+
+        Returns:
+            The moved entry, as volume_entry() returns it, or None
+        """
+        rows = self._conn.execute('SELECT id, path FROM volumes WHERE digest = ?', (digest,)).fetchall()
+        moved = next((volume_id for volume_id, path in rows if not Path(path).exists()), None)
+        if moved is None:
+            return None
+        with self._conn:
+            self._conn.execute('UPDATE volumes SET volume = ?, path = ? WHERE id = ?',
+                               (volume, str(Path(pdf_path).resolve()), moved))
+        return self.volume_entry(pdf_path)
+
+    def add_volume(self, volume, pdf_path, state, pages):
+        """
+        Replace a volume's pages and postings in one transaction.
+
+        Args:
+            volume: Volume name, e.g. 'SDS-13'
+            pdf_path: Path to its PDF
+            state: source_state() of the PDF
+            pages: Iterable of (physical index, printed number or None, set of
+                (term, kind)) tuples
+
+        Returns:
+            Number of pages indexed
+        """
+        count = 0
+        with self._conn:
+            path = str(Path(pdf_path).resolve())
+            self._conn.execute('DELETE FROM volumes WHERE path = ?', (path,))
+            volume_id = self._conn.execute(
+                'INSERT INTO volumes (volume, path, size, mtime_ns, digest, version, pages) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                (volume, path, state['size'], state['mtime_ns'], state['digest'],
+                 INDEX_VERSION)).lastrowid
+            for physical_idx, printed_num, terms in pages:
+                self._conn.execute('INSERT INTO pages VALUES (?, ?, ?)',
+                                   (volume_id, physical_idx, printed_num))
+                self._conn.executemany('INSERT OR IGNORE INTO postings VALUES (?, ?, ?, ?)',
+                                       ((term, kind, volume_id, physical_idx) for term, kind in terms))
+                count += 1
+            self._conn.execute('UPDATE volumes SET pages = ? WHERE id = ?', (count, volume_id))
+        return count
+
+    def touch_volume(self, pdf_path, state):
+        """Record a new size and mtime for an unchanged volume."""
+        with self._conn:
+            self._conn.execute('UPDATE volumes SET size = ?, mtime_ns = ? WHERE path = ?',
+                               (state['size'], state['mtime_ns'], str(Path(pdf_path).resolve())))
+
+    def volumes(self):
+        """List of (volume, path, pages, digest), ordered by volume and path."""
+        return self._conn.execute('SELECT volume, path, pages, digest FROM volumes '
+                                  'ORDER BY volume, path').fetchall()
+
+    def latest_path(self, digest):
+        """Path of the most recently indexed volume with this PDF digest, or None."""
+        row = self._conn.execute('SELECT path FROM volumes WHERE digest = ? ORDER BY id DESC LIMIT 1',
+                                 (digest,)).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, query, volume=None, digest=None, path=None):
+        """
+        Pages matching a query.
+
+        Args:
+            query: CAS number, formula or words (see query_terms())
+            volume: Only pages of this volume
+            digest: Only pages of the volumes with this PDF digest
+            path: Only pages of the volume indexed from this resolved PDF path
+
+        Returns:
+            List of (volume, path, physical index, printed number or None),
+            ordered by volume, path and physical index
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        clauses = []
+        params = []
+        for term, kind in terms:
+            clauses.append('EXISTS (SELECT 1 FROM postings t WHERE t.term = ? AND t.kind = ? '
+                           'AND t.volume_id = p.volume_id AND t.physical = p.physical)')
+            params.extend((term, kind))
+        for clause, value in (('v.volume = ?', volume), ('v.digest = ?', digest), ('v.path = ?', path)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return self._conn.execute(
+            'SELECT v.volume, v.path, p.physical, p.printed FROM pages p '
+            'JOIN volumes v ON v.id = p.volume_id '
+            f"WHERE {' AND '.join(clauses)} ORDER BY v.volume, v.path, p.physical",
+            params).fetchall()
+
+
+def _volume_pages(pdf_path, options, digest=None):
+    """
+    Yield (physical index, printed number, terms) for every page of a PDF.
+
+    Each page's text is extracted once. A cached or /PageLabels page mapping
+    is used when there is one; otherwise printed numbers are detected from
+    the same text the terms come from (after the header band, if one is
+    set), interpolated and cached as resolve_page_mapping() would.
+    """
+    reader = PdfReader(pdf_path)
+    total_pages = len(reader.pages)
+    header_band = options.get('header_band')
+    band_edges = options.get('band_edges', ('top',))
+    use_page_labels = options.get('use_page_labels', True)
+    use_cache = options.get('use_cache', True)
+    cache_dir = options.get('cache_dir')
+
+    mapping = None
+    key = None
+    if use_cache:
+        key = pdf_page_filter.page_map_cache_key(pdf_path, header_band, band_edges, use_page_labels,
+                                                 digest=digest)
+        cached = pdf_page_filter.load_cached_page_mapping(pdf_path, total_pages, cache_dir=cache_dir,
+                                                          key=key)
+        mapping = cached[1] if cached is not None else None
+    if mapping is None and use_page_labels:
+        mapping = pdf_page_filter.page_label_mapping(reader, header_band, band_edges, verbose=False)
+        if mapping is not None and key is not None:
+            pdf_page_filter.store_cached_page_mapping(
+                key, pdf_path, total_pages, mapping, mapping, 'page_labels', cache_dir,
+                options.get('cache_max_bytes', DEFAULT_MAX_BYTES), verbose=False)
+
+    def texts_and_terms():
+        context = None
+        for physical_idx, text in iter_page_texts(pdf_path, reader=reader):
+            _, context = extract_page_records(text, context)
+            sheet = (context[0], context[1]) if context else None
+            yield physical_idx, text, page_terms(text, sheet)
+
+    if mapping is not None:
+        for physical_idx, _, terms in texts_and_terms():
+            yield physical_idx, mapping.get(physical_idx), terms
+        return
+
+    # Numbers are only known once every page is scanned, so hold the terms until then
+    detected = {}
+    pages = []
+    for physical_idx, text, terms in texts_and_terms():
+        try:
+            printed_num = pdf_page_filter.detect_page_number(reader.pages[physical_idx], header_band,
+                                                             band_edges, text=text)
+        except Exception:
+            printed_num = None
+        if printed_num:
+            detected[physical_idx] = printed_num
+        pages.append((physical_idx, terms))
+    interpolated = pdf_page_filter.interpolate_missing_pages(detected, total_pages, verbose=False)
+    if key is not None:
+        pdf_page_filter.store_cached_page_mapping(
+            key, pdf_path, total_pages, detected, interpolated, 'text', cache_dir,
+            options.get('cache_max_bytes', DEFAULT_MAX_BYTES), verbose=False)
+    for physical_idx, terms in pages:
+        yield physical_idx, interpolated.get(physical_idx), terms
+
+
+def build_index(pdf_paths, index_path=DEFAULT_INDEX, options=None, force=False, verbose=True):
+    """
+    Index every page of the given volumes, skipping unchanged ones.
+
+    Args:
+        pdf_paths: Paths to SDS PDFs
+        index_path: Index database path
+        options: Detection options (header_band, band_edges, use_cache,
+            cache_dir, use_page_labels), as in pdf_batch
+        force: Re-index every volume
+        verbose: Print one line per volume
+
+    Returns:
+        Dictionary of PDF path -> 'indexed' or 'unchanged'
+    """
+    options = options or {}
+    results = {}
+    with PageIndex(index_path) as index:
+        for pdf_path in pdf_paths:
+            volume, _ = volume_paths(pdf_path)
+            entry = index.volume_entry(pdf_path)
+            state = source_state(pdf_path, entry)
+            if entry is None:
+                entry = index.adopt_moved(volume, pdf_path, state['digest'])
+            if (not force and entry is not None and entry['digest'] == state['digest']
+                    and entry['version'] == INDEX_VERSION):
+                if entry['mtime_ns'] != state['mtime_ns'] or entry['size'] != state['size']:
+                    index.touch_volume(pdf_path, state)
+                results[str(pdf_path)] = 'unchanged'
+                if verbose:
+                    print(f"[unchanged] {pdf_path}")
+                continue
+            count = index.add_volume(volume, pdf_path, state,
+                                     _volume_pages(pdf_path, options, state['digest']))
+            results[str(pdf_path)] = 'indexed'
+            if verbose:
+                print(f"[  indexed] {pdf_path}: {count} pages")
+    return results
+
+
+def compound_ranges(query, pdf_path, index_path=DEFAULT_INDEX):
+    """
+    Pages of a volume that match a query.
+
+    The volume is found by the entry for pdf_path, whose recorded digest is
+    reused while the file's size and modification time are unchanged, so an
+    indexed PDF is not read. A PDF without an up-to-date entry is found by
+    its digest, so a renamed or moved PDF still matches its index entry;
+    when several entries share the digest, the most recently indexed one is
+    used, so page maps from different entries are never mixed.
+
+    Args:
+        query: CAS number, formula or words (see query_terms())
+        pdf_path: PDF the ranges are for
+        index_path: Index database path
+
+    Returns:
+        Tuple (PageRanges of the printed numbers found on the matching pages,
+        PageRanges of their 1-based physical positions). Select pages by the
+        physical ranges: a printed number can also occur on pages outside
+        the match.
+
+    Raises:
+        ValueError: If the PDF is not in the index
+    """
+    with PageIndex(index_path) as index:
+        entry = index.volume_entry(pdf_path)
+        digest = source_state(pdf_path, entry)['digest']
+        if entry is not None and entry['digest'] == digest:
+            path = str(Path(pdf_path).resolve())
+        else:
+            path = index.latest_path(digest)
+        if path is None:
+            raise ValueError(f"'{pdf_path}' is not in the page index {index_path} "
+                             f"(run: python page_index.py {pdf_path} --index {index_path})")
+        matches = index.lookup(query, path=path)
+    printed = sorted({printed_num for _, _, _, printed_num in matches if printed_num is not None})
+    physical = sorted({physical_idx + 1 for _, _, physical_idx, _ in matches})
+    return PageRanges.from_numbers(printed), PageRanges.from_numbers(physical)
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Build or query a full-text page index over SDS volumes."
+    )
+    parser.add_argument('pdfs', nargs='*', help="SDS PDFs to index")
+    parser.add_argument('--index', default=DEFAULT_INDEX,
+                        help=f"Index database (default: {DEFAULT_INDEX})")
+    parser.add_argument('--query', '-q', default=None,
+                        help="Print the pages matching a compound, CAS number or words")
+    parser.add_argument('--volume', default=None, help="Only query this volume")
+    parser.add_argument('--force', action='store_true', help="Re-index every volume")
+    parser.add_argument('--header-band', type=float, nargs='?',
+                        const=pdf_page_filter.DEFAULT_HEADER_BAND, default=None,
+                        metavar='FRACTION', help="Detect page numbers from a header strip first")
+    parser.add_argument('--band-edge', choices=['top', 'bottom', 'both'], default='top',
+                        help="Which strip to scan in header-band mode (default: top)")
+    parser.add_argument('--no-page-labels', action='store_true',
+                        help="Ignore /PageLabels and always detect numbers from text")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Do not read or write the page map cache")
+    parser.add_argument('--cache-dir', default=None, help="Page map cache directory")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function to build or query the page index."""
+    args = parse_args()
+    if not args.pdfs and not args.query:
+        print("Error: Give PDFs to index and/or --query")
+        sys.exit(2)
+    missing = [pdf for pdf in args.pdfs if not Path(pdf).exists()]
+    if missing:
+        print(f"Error: File(s) not found: {', '.join(missing)}")
+        sys.exit(2)
+
+    if args.pdfs:
+        options = {
+            'header_band': args.header_band,
+            'band_edges': ('top', 'bottom') if args.band_edge == 'both' else (args.band_edge,),
+            'use_cache': not args.no_cache,
+            'cache_dir': args.cache_dir,
+            'use_page_labels': not args.no_page_labels,
+        }
+        build_index(args.pdfs, args.index, options=options, force=args.force)
+
+    if args.query:
+        with PageIndex(args.index) as index:
+            matches = index.lookup(args.query, volume=args.volume)
+        if not matches:
+            print(f"No pages match '{args.query}'")
+            sys.exit(1)
+        by_path = {}
+        for volume, path, physical_idx, printed_num in matches:
+            by_path.setdefault((volume, path), []).append((physical_idx, printed_num))
+        names = [volume for volume, _ in by_path]
+        for (volume, path), pages in by_path.items():
+            printed = sorted({printed_num for _, printed_num in pages if printed_num is not None})
+            ranges = PageRanges.from_numbers(printed) if printed else '-'
+            physical = ', '.join(str(physical_idx + 1) for physical_idx, _ in pages)
+            # Copies of a volume share its name; tell them apart by path
+            label = volume if names.count(volume) == 1 else path
+            print(f"{label}: printed pages {ranges} (physical {physical})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+On-disk cache of detected and interpolated page mappings.
+
+Entries are JSON files in a cache directory, keyed by the SHA-256 of the PDF
+bytes plus a hash of the detector version and detection options, so editing
+the PDF or changing the detector automatically misses the cache. The
+directory is kept under a size limit by evicting the least recently used
+entries.
+
+Long runs also keep a checkpoint next to the entry they will produce
+(<key>.checkpoint): the pages detected so far and the outputs already
+written, so an interrupted run can resume instead of starting over.
+"""
+
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+
+DEFAULT_CACHE_DIR = Path(os.environ.get(
+    'PDF_PAGE_FILTER_CACHE', Path.home() / '.cache' / 'pdf_page_filter'
+))
+
+# Upper bound on the total size of the cache entries
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Name of a cache key (see cache_key()); only files named after a key are ever
+# stored, evicted or cleared, so other files in a shared directory are safe
+_KEY = re.compile(r'[0-9a-f]{64}-[0-9a-f]{16}')
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """
+    Compute the SHA-256 hex digest of a file's contents.
+
+    Args:
+        path: Path to the file
+        chunk_size: Read size in bytes
+
+    Returns:
+        Hex digest string
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_state(pdf_path, previous=None):
+    """
+    Size, modification time and digest of a source PDF.
+
+    The digest is copied from previous when size and modification time are
+    unchanged, so unchanged files are not read.
+
+    Args:
+        pdf_path: Path to the PDF
+        previous: State recorded for the PDF earlier (a build manifest or
+            index entry with the same keys), if any
+
+    Returns:
+        Dictionary with 'size', 'mtime_ns' and 'digest' keys
+    """
+    stat = os.stat(pdf_path)
+    state = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if previous and all(previous.get(key) == value for key, value in state.items()):
+        state['digest'] = previous.get('digest')
+    else:
+        state['digest'] = file_digest(pdf_path)
+    return state
+
+
+def cache_key(digest, detector_version, options=None):
+    """
+    Build the cache key for a PDF digest, detector version and options.
+
+    Args:
+        digest: SHA-256 hex digest of the PDF bytes
+        detector_version: Version of the page number detector
+        options: JSON-serialisable dict of options that affect detection
+
+    Returns:
+        Cache key string (also used as the entry file name)
+    """
+    settings = json.dumps({'version': detector_version, 'options': options or {}},
+                          sort_keys=True)
+    return f"{digest}-{hashlib.sha256(settings.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _check_key(key):
+    if not _KEY.fullmatch(key):
+        raise ValueError(f"Not a page map cache key: '{key}'")
+    return key
+
+
+def _entries(cache_dir, suffix, digest=None):
+    """Paths of the files in cache_dir named <key><suffix>, optionally for one digest."""
+    for path in Path(cache_dir or DEFAULT_CACHE_DIR).glob(f"{digest or ''}*{suffix}"):
+        if _KEY.fullmatch(path.name[:-len(suffix)]):
+            yield path
+
+
+def _entry_path(cache_dir, key):
+    return Path(cache_dir) / f"{_check_key(key)}.json"
+
+
+def _int_keys(mapping):
+    return {int(physical_idx): printed_num for physical_idx, printed_num in mapping.items()}
+
+
+def load_page_map(key, cache_dir=None):
+    """
+    Load a cached entry.
+
+    Args:
+        key: Cache key from cache_key()
+        cache_dir: Cache directory (default: DEFAULT_CACHE_DIR)
+
+    Returns:
+        Entry dictionary with integer-keyed 'detected' and 'interpolated'
+        mappings, or None on a miss or unreadable entry
+    """
+    path = _entry_path(cache_dir or DEFAULT_CACHE_DIR, key)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        entry['detected'] = _int_keys(entry['detected'])
+        entry['interpolated'] = _int_keys(entry['interpolated'])
+    except (OSError, ValueError, KeyError, AttributeError):
+        return None
+
+    # Mark as recently used for eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return entry
+
+
+def store_page_map(key, entry, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Store an entry and evict old entries if the cache exceeds max_bytes.
+
+    Args:
+        key: Cache key from cache_key()
+        entry: JSON-serialisable dictionary ('detected' and 'interpolated'
+            mappings plus any metadata)
+        cache_dir: Cache directory (default: DEFAULT_CACHE_DIR)
+        max_bytes: Size limit for the cache entries
+    """
+    cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = _entry_path(cache_dir, key)
+
+    # Write atomically so concurrent readers never see a partial entry
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(tmp_path, path)
+
+    evict_page_maps(cache_dir, max_bytes, keep=path)
+
+
+def evict_page_maps(cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, keep=None):
+    """
+    Remove least recently used entries until the cache fits in max_bytes.
+
+    Only files named after a cache key count and are removed.
+
+    Args:
+        cache_dir: Cache directory (default: DEFAULT_CACHE_DIR)
+        max_bytes: Size limit for the cache entries
+        keep: Entry path that must not be evicted
+
+    Returns:
+        Number of entries removed
+    """
+    entries = []
+    for path in _entries(cache_dir, '.json'):
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep is not None and path == Path(keep):
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def clear_page_maps(cache_dir=None, digest=None):
+    """
+    Invalidate cached entries (and checkpoints).
+
+    Only files named after a cache key are removed.
+
+    Args:
+        cache_dir: Cache directory (default: DEFAULT_CACHE_DIR)
+        digest: Only remove entries for the PDF with this digest
+            (default: remove every entry)
+
+    Returns:
+        Number of entries removed
+    """
+    removed = 0
+    for suffix in ('.json', CHECKPOINT_SUFFIX):
+        for path in _entries(cache_dir, suffix, f"{digest}-" if digest else None):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+# Checkpoints are not .json files, so they are never evicted while a run is
+# in progress and never mistaken for complete entries
+CHECKPOINT_SUFFIX = '.checkpoint'
+
+
+def _checkpoint_path(cache_dir, key):
+    return Path(cache_dir or DEFAULT_CACHE_DIR) / f"{_check_key(key)}{CHECKPOINT_SUFFIX}"
+
+
+def load_checkpoint(key, cache_dir=None):
+    """
+    Load the checkpoint of an interrupted run.
+
+    Args:
+        key: Cache key from cache_key()
+        cache_dir: Cache directory (default: DEFAULT_CACHE_DIR)
+
+    Returns:
+        Checkpoint dictionary with an integer-keyed 'detected' mapping (if
+        present), or None if there is no readable checkpoint
+    """
+    try:
+        with open(_checkpoint_path(cache_dir, key), 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        if 'detected' in checkpoint:
+            checkpoint['detected'] = _int_keys(checkpoint['detected'])
+    except (OSError, ValueError, AttributeError):
+        return None
+    return checkpoint
+
+
+def store_checkpoint(key, checkpoint, cache_dir=None):
+    """
+    Write a checkpoint atomically.
+
+    Args:
+        key: Cache key from cache_key()
+        checkpoint: JSON-serialisable dictionary
+        cache_dir: Cache directory (default: DEFAULT_CACHE_DIR)
+    """
+    path = _checkpoint_path(cache_dir, key)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+def clear_checkpoint(key, cache_dir=None):
+    """Remove the checkpoint for key, if any."""
+    try:
+        _checkpoint_path(cache_dir, key).unlink()
+    except OSError:
+        pass
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Compact representation of requested page ranges.
+
+A range string such as "1-3, 5, 17-, 1-100:2, !50-60" is stored as a short
+list of disjoint segments instead of a materialised set of page numbers, so
+"1-999999" costs the same as "1-2" and membership is a binary search.
+
+Syntax (comma separated, in any order):
+
+    5          single page
+    2-5        inclusive range
+    17-        open-ended range (page 17 to the end)
+    -5         pages 1 to 5
+    1-20:2     every second page from 1 to 20 (1, 3, 5, ...)
+    !50-60     exclude pages (any of the forms above after '!')
+"""
+
+import math
+from bisect import bisect_right
+
+# Upper bound used for open-ended ranges
+OPEN_END = math.inf
+
+
+def _progression_hits(rule, n):
+    """True if n is covered by a segment rule (full, progressions)."""
+    full, progressions = rule
+    return full or any((n - phase) % step == 0 for step, phase in progressions)
+
+
+class PageRanges:
+    """
+    Set of page numbers stored as disjoint segments with step rules.
+
+    Each segment [start, stop] carries an include rule and an exclude rule.
+    A rule is (full, progressions): full covers every page of the segment,
+    and progressions is a frozenset of (step, phase) pairs covering pages
+    where (page - phase) % step == 0.
+    """
+
+    def __init__(self, specs=()):
+        """
+        Build the set from raw range specifications.
+
+        Args:
+            specs: Iterable of (start, stop, step, exclude) tuples, with
+                stop inclusive and OPEN_END for open-ended ranges
+        """
+        self._specs = tuple(specs)
+
+        bounds = set()
+        for start, stop, _, _ in self._specs:
+            bounds.add(start)
+            bounds.add(stop + 1)
+        bounds = sorted(bounds)
+
+        segments = []
+        for seg_start, next_start in zip(bounds, bounds[1:]):
+            seg_stop = next_start - 1
+            include = [False, set()]
+            exclude = [False, set()]
+            for start, stop, step, excluded in self._specs:
+                if start > seg_start or stop < seg_stop:
+                    continue
+                rule = exclude if excluded else include
+                if step == 1:
+                    rule[0] = True
+                else:
+                    rule[1].add((step, start % step))
+            if not include[0] and not include[1]:
+                continue
+            if exclude[0]:
+                continue
+            include = (include[0], frozenset() if include[0] else frozenset(include[1]))
+            exclude = (False, frozenset(exclude[1]))
+
+            # Merge with the previous segment when contiguous with equal rules
+            if segments and segments[-1][1] + 1 == seg_start and segments[-1][2:] == (include, exclude):
+                segments[-1] = (segments[-1][0], seg_stop, include, exclude)
+            else:
+                segments.append((seg_start, seg_stop, include, exclude))
+
+        self._segments = segments
+        self._starts = [segment[0] for segment in segments]
+
+    @classmethod
+    def parse(cls, range_string, warn=print):
+        """
+        Parse a range string (see module docstring for the syntax).
+
+        Args:
+            range_string: String containing page ranges
+            warn: Called with a message for each part that cannot be parsed
+
+        Returns:
+            PageRanges instance
+        """
+        specs = []
+        for part in range_string.split(','):
+            part = part.strip()
+            if not part:
+                continue
+
+            excluded = part.startswith('!')
+            body = part[1:].strip() if excluded else part
+            body, _, step_text = body.partition(':')
+
+            try:
+                step = int(step_text) if step_text.strip() else 1
+                if '-' in body:
+                    start_text, end_text = body.split('-', 1)
+                    start = int(start_text) if start_text.strip() else 1
+                    end = int(end_text) if end_text.strip() else OPEN_END
+                else:
+                    start = end = int(body)
+            except ValueError:
+                warn(f"Warning: Invalid range format '{part}', skipping")
+                continue
+
+            if step < 1:
+                warn(f"Warning: Invalid step in '{part}', skipping")
+                continue
+            if start > end:
+                warn(f"Warning: Invalid range {start}-{end}, skipping")
+                continue
+            specs.append((start, end, step, excluded))
+
+        return cls(specs)
+
+    @classmethod
+    def from_numbers(cls, numbers):
+        """
+        Build a set from page numbers, collapsing runs into intervals.
+
+        Args:
+            numbers: Iterable of integers
+
+        Returns:
+            PageRanges instance
+        """
+        specs = []
+        for n in sorted(set(numbers)):
+            if specs and specs[-1][1] + 1 == n:
+                specs[-1] = (specs[-1][0], n, 1, False)
+            else:
+                specs.append((n, n, 1, False))
+        return cls(specs)
+
+    def __contains__(self, n):
+        i = bisect_right(self._starts, n) - 1
+        if i < 0:
+            return False
+        start, stop, include, exclude = self._segments[i]
+        return n <= stop and _progression_hits(include, n) and not _progression_hits(exclude, n)
+
+    def __iter__(self):
+        if not self.is_bounded():
+            raise ValueError("Cannot enumerate an open-ended page range")
+        return self.iter_within(-OPEN_END, OPEN_END)
+
+    def __bool__(self):
+        return any(True for _ in self._iter_segments_nonempty())
+
+    def _iter_segments_nonempty(self):
+        for start, stop, include, exclude in self._segments:
+            if include[0] and not exclude[1]:
+                yield start
+                continue
+            # Only mixed step rules can leave a segment empty; probe one period
+            period = math.lcm(*(step for step, _ in include[1] | exclude[1])) if not include[0] \
+                else math.lcm(*(step for step, _ in exclude[1]))
+            limit = min(stop, start + period - 1)
+            n = start
+            while n <= limit:
+                if _progression_hits(include, n) and not _progression_hits(exclude, n):
+                    yield n
+                    break
+                n += 1
+
+    def iter_within(self, lower, upper):
+        """
+        Yield member pages between lower and upper (inclusive) in order.
+
+        Args:
+            lower: Smallest page to consider
+            upper: Largest page to consider
+
+        Yields:
+            Page numbers
+        """
+        first = max(0, bisect_right(self._starts, lower) - 1)
+        for start, stop, include, exclude in self._segments[first:]:
+            if start > upper:
+                break
+            lo = max(start, lower)
+            hi = min(stop, upper)
+            if lo > hi:
+                continue
+            if include[0] and not exclude[1]:
+                yield from range(int(lo), int(hi) + 1)
+            elif not include[0] and len(include[1]) == 1 and not exclude[1]:
+                step, phase = next(iter(include[1]))
+                yield from range(int(lo) + (phase - int(lo)) % step, int(hi) + 1, step)
+            else:
+                for n in range(int(lo), int(hi) + 1):
+                    if _progression_hits(include, n) and not _progression_hits(exclude, n):
+                        yield n
+
+    def is_bounded(self):
+        """True unless the set contains an open-ended range."""
+        return not self._segments or self._segments[-1][1] != OPEN_END
+
+    def first(self):
+        """Smallest member, or None if the set is empty."""
+        return next(iter(self._iter_segments_nonempty()), None)
+
+    def last(self):
+        """Largest member (OPEN_END for open-ended sets), or None if empty."""
+        if not self._segments:
+            return None
+        if not self.is_bounded():
+            return OPEN_END
+        for start, stop, include, exclude in reversed(self._segments):
+            for n in range(int(stop), int(start) - 1, -1):
+                if _progression_hits(include, n) and not _progression_hits(exclude, n):
+                    return n
+        return None
+
+    def count(self):
+        """
+        Number of member pages.
+
+        Plain ranges are counted arithmetically; only segments with step or
+        exclusion rules are enumerated.
+
+        Raises:
+            ValueError: If the set is open-ended
+        """
+        if not self.is_bounded():
+            raise ValueError("Cannot count an open-ended page range")
+        total = 0
+        for start, stop, include, exclude in self._segments:
+            if include[0] and not exclude[1]:
+                total += stop - start + 1
+            else:
+                total += sum(1 for _ in self.iter_within(start, stop))
+        return int(total)
+
+    def bounded(self, upper):
+        """
+        Return a copy with open-ended ranges closed at upper.
+
+        Args:
+            upper: Largest page number to keep for open-ended ranges
+
+        Returns:
+            PageRanges instance
+        """
+        specs = [(start, upper if stop == OPEN_END else stop, step, excluded)
+                 for start, stop, step, excluded in self._specs
+                 if start <= upper or stop != OPEN_END]
+        return PageRanges(specs)
+
+    def without(self, intervals):
+        """
+        Return a copy with the given plain intervals excluded.
+
+        The segments and the sorted intervals are walked together in one
+        merge pass, so the cost is linear in their number rather than
+        rebuilding the segments for every interval.
+
+        Args:
+            intervals: Iterable of (start, stop) inclusive tuples
+
+        Returns:
+            PageRanges instance
+        """
+        intervals = sorted(intervals)
+        segments = []
+        i = 0
+        for start, stop, include, exclude in self._segments:
+            lo = start
+            while i < len(intervals) and intervals[i][0] <= stop and lo <= stop:
+                cut_start, cut_stop = intervals[i]
+                if cut_start > lo:
+                    segments.append((lo, cut_start - 1, include, exclude))
+                lo = max(lo, cut_stop + 1)
+                if cut_stop <= stop:
+                    i += 1
+            if lo <= stop:
+                segments.append((lo, stop, include, exclude))
+        return PageRanges._from_segments(segments)
+
+    @classmethod
+    def _from_segments(cls, segments):
+        """Build a set from disjoint, sorted segments, with matching specs."""
+        specs = []
+        for start, stop, include, exclude in segments:
+            full, progressions = include
+            rules = [(1, start, False)] if full else [(step, phase, False) for step, phase in progressions]
+            rules += [(step, phase, True) for step, phase in exclude[1]]
+            for step, phase, excluded in rules:
+                first = start + (phase - start) % step
+                if first <= stop:
+                    specs.append((first, stop, step, excluded))
+        ranges = cls.__new__(cls)
+        ranges._specs = tuple(specs)
+        ranges._segments = list(segments)
+        ranges._starts = [segment[0] for segment in segments]
+        return ranges
+
+    def _pieces(self):
+        """Yield (start, stop, step) pieces covering the members, merging runs."""
+        run = None
+        for start, stop, include, exclude in self._segments:
+            if include[0] and not exclude[1]:
+                pieces = [(start, stop, 1)]
+            elif not include[0] and len(include[1]) == 1 and not exclude[1]:
+                step, phase = next(iter(include[1]))
+                first = start + (phase - start) % step
+                last = stop if stop == OPEN_END else stop - (stop - phase) % step
+                pieces = [(first, last, step)] if first <= last else []
+            else:
+                pieces = [(n, n, 1) for n in self.iter_within(start, stop)]
+
+            for piece in pieces:
+                if run is not None and run[2] == piece[2] == 1 and run[1] + 1 == piece[0]:
+                    run = (run[0], piece[1], 1)
+                    continue
+                if run is not None:
+                    yield run
+                run = piece
+        if run is not None:
+            yield run
+
+    def __str__(self):
+        parts = []
+        for start, stop, step in self._pieces():
+            if start == stop:
+                text = str(start)
+            else:
+                text = f"{start}-" if stop == OPEN_END else f"{start}-{stop}"
+                if step != 1:
+                    text += f":{step}"
+            parts.append(text)
+        return ', '.join(parts)
+
+    def __repr__(self):
+        return f"PageRanges('{self}')"
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+PDF Batch Filter - Run many page-filter jobs from a manifest in one process.
+
+Each manifest row names an input PDF, the printed page ranges to keep and an
+output PDF. Rows that share an input are grouped so every volume is opened
+and its page numbers detected once, however many outputs are cut from it.
+Volumes are processed concurrently in a bounded worker pool, and a failure in
+one volume never aborts the others.
+
+Manifest formats (chosen by file extension):
+
+    CSV   header row with input,ranges,output columns
+    JSON  list of {"input": ..., "ranges": ..., "output": ...} objects,
+          or an object with such a list under "jobs"
+    TOML  [[jobs]] tables with input, ranges and output keys
+
+Relative paths are resolved against the manifest's directory.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pdf_page_filter
+from page_map_cache import DEFAULT_MAX_BYTES
+from pdf_page_filter import PdfReader
+
+
+def _load_toml(path):
+    """Load a TOML file with tomllib (Python 3.11+) or the tomli backport."""
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ValueError("TOML manifests need Python 3.11+ or: pip install tomli")
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def load_manifest(manifest_path):
+    """
+    Read a CSV, JSON or TOML manifest.
+
+    Args:
+        manifest_path: Path to the manifest file
+
+    Returns:
+        List of job dictionaries with 'input', 'ranges' and 'output' keys,
+        with paths resolved relative to the manifest
+
+    Raises:
+        ValueError: If the format is unsupported, the jobs are not a list of
+            objects, a row is incomplete or two rows write the same output
+    """
+    manifest_path = Path(manifest_path)
+    suffix = manifest_path.suffix.lower()
+
+    if suffix == '.csv':
+        with open(manifest_path, 'r', newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+    elif suffix == '.json':
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        rows = data.get('jobs', []) if isinstance(data, dict) else data
+    elif suffix == '.toml':
+        rows = _load_toml(manifest_path).get('jobs', [])
+    else:
+        raise ValueError(f"Unsupported manifest format '{suffix}' (use .csv, .json or .toml)")
+    if not isinstance(rows, list):
+        raise ValueError("Manifest jobs must be a list")
+
+    base_dir = manifest_path.parent
+    jobs = []
+    outputs = {}
+    for line_no, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            raise ValueError(f"Manifest job {line_no} is not an object")
+        row = {str(key).strip().lower(): str(value).strip()
+               for key, value in row.items() if key is not None and value is not None}
+        missing = [key for key in ('input', 'ranges', 'output') if not row.get(key)]
+        if missing:
+            raise ValueError(f"Manifest job {line_no} is missing {', '.join(missing)}")
+        output = (base_dir / row['output']).resolve()
+        if output in outputs:
+            raise ValueError(f"Manifest jobs {outputs[output]} and {line_no} both write '{row['output']}'")
+        outputs[output] = line_no
+        jobs.append({
+            'input': str(base_dir / row['input']),
+            'ranges': row['ranges'],
+            'output': str(base_dir / row['output']),
+        })
+    return jobs
+
+
+def group_jobs_by_input(jobs):
+    """
+    Group manifest jobs so each input PDF is processed once.
+
+    Args:
+        jobs: List of job dictionaries from load_manifest()
+
+    Returns:
+        Dictionary of resolved input path -> list of (ranges, output)
+        splits, in manifest order; different spellings of one file (a.pdf,
+        ./a.pdf) are one volume
+    """
+    volumes = {}
+    for job in jobs:
+        volumes.setdefault(str(Path(job['input']).resolve()), []).append((job['ranges'], job['output']))
+    return volumes
+
+
+def _fail_volume(results, error, start):
+    """Mark every job of a volume as failed, splitting the time spent between them."""
+    seconds = (time.perf_counter() - start) / len(results)
+    for result in results:
+        result['error'] = f"{type(error).__name__}: {error}"
+        result['seconds'] = seconds
+
+
+def process_volume(input_path, splits, options):
+    """
+    Resolve page numbers for one volume once and write each of its splits.
+
+    Runs in a worker process. Errors are caught and reported per split so the
+    rest of the batch keeps going.
+
+    Args:
+        input_path: Path to the input PDF
+        splits: List of (ranges, output path) tuples
+        options: Dictionary of detection options (header_band, band_edges,
+            use_cache, cache_dir, cache_max_bytes, use_page_labels), checkpointing options
+            (resume, checkpoint_every), optimize and fingerprints (page
+            fingerprint index path)
+
+    Returns:
+        List of per-job result dictionaries; 'seconds' is the job's write
+        time plus an equal share of the volume's detection and other shared
+        work, so the jobs of a volume add up to its time
+    """
+    start = time.perf_counter()
+    results = [{
+        'input': input_path,
+        'ranges': ranges,
+        'output': output_path,
+        'status': 'error',
+        'exit_code': 1,
+        'pages': 0,
+        'missing_pages': '',
+        'error': None,
+    } for ranges, output_path in splits]
+
+    resume = options.get('resume', False)
+    key = None
+    try:
+        key = pdf_page_filter.start_checkpoints(
+            input_path, options.get('header_band'), options.get('band_edges', ('top',)),
+            options.get('use_page_labels', True), options.get('use_cache', True),
+            options.get('cache_dir'), resume,
+            options.get('checkpoint_every', pdf_page_filter.DEFAULT_CHECKPOINT_EVERY))
+        reader = PdfReader(input_path)
+        detected, page_mapping = pdf_page_filter.resolve_page_mapping(
+            reader, input_path, verbose=False,
+            header_band=options.get('header_band'),
+            band_edges=options.get('band_edges', ('top',)),
+            use_cache=options.get('use_cache', True),
+            cache_dir=options.get('cache_dir'),
+            cache_max_bytes=options.get('cache_max_bytes', DEFAULT_MAX_BYTES),
+            use_page_labels=options.get('use_page_labels', True),
+            key=key, resume=resume,
+            checkpoint_every=options.get('checkpoint_every', pdf_page_filter.DEFAULT_CHECKPOINT_EVERY),
+            fingerprints=options.get('fingerprints'),
+        )
+        if not detected:
+            raise ValueError("No page numbers detected on any pages")
+        printed_to_physical = pdf_page_filter.build_printed_to_physical(page_mapping)
+        for result in results:
+            result['detect_seconds'] = time.perf_counter() - start
+    except Exception as e:
+        _fail_volume(results, e, start)
+        return results
+
+    journal, record = (pdf_page_filter.output_journal(key, options.get('cache_dir'))
+                       if key is not None else ({}, None))
+    written = pdf_page_filter.write_splits(reader, printed_to_physical, splits, verbose=False,
+                                           written=journal if resume else None, on_written=record,
+                                           optimize=options.get('optimize', False))
+    for result, split_result in zip(results, written):
+        result.update(split_result)
+        result['exit_code'] = 0 if result['status'] == 'ok' else 1
+    if key is not None and all(result['status'] == 'ok' for result in results):
+        pdf_page_filter.page_map_cache.clear_checkpoint(key, options.get('cache_dir'))
+
+    shared = (time.perf_counter() - start - sum(result['seconds'] for result in results)) / len(results)
+    for result in results:
+        result['seconds'] += shared
+    return results
+
+
+def plan_volume(input_path, splits, options):
+    """
+    Resolve page numbers for one volume and plan each of its splits, writing nothing.
+
+    Runs in a worker process, like process_volume(), and returns results of
+    the same shape with the plan of each job added (see
+    pdf_page_filter.plan_selection).
+
+    Args:
+        input_path: Path to the input PDF
+        splits: List of (ranges, output path) tuples
+        options: Dictionary of detection options, as for process_volume()
+
+    Returns:
+        List of per-job result dictionaries
+    """
+    start = time.perf_counter()
+    results = [{
+        'input': input_path,
+        'ranges': ranges,
+        'output': output_path,
+        'status': 'error',
+        'exit_code': 1,
+        'pages': 0,
+        'missing_pages': '',
+        'error': None,
+    } for ranges, output_path in splits]
+
+    try:
+        plan = pdf_page_filter.plan_pdf_pages(
+            input_path, {output_path: ranges for ranges, output_path in splits},
+            header_band=options.get('header_band'),
+            band_edges=options.get('band_edges', ('top',)),
+            use_cache=options.get('use_cache', True),
+            cache_dir=options.get('cache_dir'),
+            cache_max_bytes=options.get('cache_max_bytes', DEFAULT_MAX_BYTES),
+            use_page_labels=options.get('use_page_labels', True),
+            fingerprints=options.get('fingerprints'),
+        )
+        if plan['numbering'] != 'printed':
+            raise ValueError("No page numbers detected on any pages")
+    except Exception as e:
+        _fail_volume(results, e, start)
+        return results
+
+    seconds = (time.perf_counter() - start) / len(results)
+    for result, output in zip(results, plan['outputs']):
+        result.update(output, output=str(output['output']), total_pages=plan['total_pages'],
+                      pages_scanned=plan['pages_scanned'], seconds=seconds)
+        if result['error'] is None and result['pages']:
+            result['status'] = 'ok'
+            result['exit_code'] = 0
+        elif result['error'] is None:
+            result['status'] = 'empty'
+            result['error'] = "No requested pages were found"
+    return results
+
+
+def run_batch(jobs, workers=None, options=None, verbose=True, plan=False):
+    """
+    Run manifest jobs across a bounded process pool.
+
+    Args:
+        jobs: List of job dictionaries from load_manifest()
+        workers: Maximum number of concurrent volumes (default: CPU count)
+        options: Detection options passed to process_volume()
+        verbose: Print a status line as each job finishes
+        plan: Only plan each job (see plan_volume()) instead of writing it
+
+    Returns:
+        List of per-job result dictionaries in manifest order
+    """
+    options = options or {}
+    volumes = group_jobs_by_input(jobs)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(volumes) or 1))
+
+    finished = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(plan_volume if plan else process_volume, input_path, splits,
+                            options): (input_path, splits)
+            for input_path, splits in volumes.items()
+        }
+        for future in as_completed(futures):
+            input_path, splits = futures[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed or out of memory)
+                results = [{
+                    'input': input_path, 'ranges': ranges, 'output': output_path,
+                    'status': 'error', 'exit_code': 1, 'pages': 0, 'missing_pages': '',
+                    'error': f"{type(e).__name__}: {e}", 'seconds': 0.0,
+                } for ranges, output_path in splits]
+
+            for result in results:
+                finished[str(Path(result['output']).resolve())] = result
+                if verbose:
+                    detail = f"{result['pages']} pages" if result['status'] == 'ok' else result['error']
+                    print(f"[{result['status']:>5}] {result['input']} -> {result['output']} "
+                          f"({detail}, {result['seconds']:.2f}s)")
+
+    return [finished[str(Path(job['output']).resolve())] for job in jobs]
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Filter many PDFs by printed page numbers from a manifest."
+    )
+    parser.add_argument('manifest', help="Manifest file (.csv, .json or .toml)")
+    parser.add_argument('--workers', '-w', type=int, default=None, metavar='N',
+                        help="Process at most N volumes concurrently (default: CPU count)")
+    parser.add_argument('--summary', default=None, metavar='PATH',
+                        help="Write a JSON summary of every job to PATH")
+    parser.add_argument('--plan-json', default=None, metavar='PATH',
+                        help="Only resolve every job's printed -> physical page plan and write "
+                             "it to PATH as JSON; no PDFs are written")
+    parser.add_argument('--header-band', type=float, nargs='?',
+                        const=pdf_page_filter.DEFAULT_HEADER_BAND, default=None,
+                        metavar='FRACTION', help="Detect page numbers from a header strip first")
+    parser.add_argument('--band-edge', choices=['top', 'bottom', 'both'], default='top',
+                        help="Which strip to scan in header-band mode (default: top)")
+    parser.add_argument('--no-page-labels', action='store_true',
+                        help="Ignore /PageLabels and always detect numbers from text")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Do not read or write the page map cache")
+    parser.add_argument('--cache-dir', default=None, help="Page map cache directory")
+    parser.add_argument('--cache-max-mb', type=float, default=None, metavar='MB',
+                        help="Keep the page map cache under this total size "
+                             f"(default: {DEFAULT_MAX_BYTES // (1024 * 1024)})")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue interrupted volumes from their checkpoints, keeping "
+                             "outputs they already wrote")
+    parser.add_argument('--checkpoint-every', type=int,
+                        default=pdf_page_filter.DEFAULT_CHECKPOINT_EVERY, metavar='N',
+                        help="Checkpoint detection every N pages; 0 disables "
+                             f"(default: {pdf_page_filter.DEFAULT_CHECKPOINT_EVERY})")
+    parser.add_argument('--fingerprints', default=None, metavar='PATH',
+                        help="Page fingerprint index: take the printed numbers of pages identical "
+                             "to pages of other volumes instead of scanning them")
+    parser.add_argument('--optimize', action='store_true',
+                        help="Merge duplicated objects, prune unused resources and compress "
+                             "streams in every output, reporting the size saved")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function to run a batch of page-filter jobs."""
+    args = parse_args()
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not read manifest '{args.manifest}': {e}")
+        sys.exit(2)
+
+    if not jobs:
+        print("Error: Manifest contains no jobs")
+        sys.exit(2)
+
+    options = {
+        'header_band': args.header_band,
+        'band_edges': ('top', 'bottom') if args.band_edge == 'both' else (args.band_edge,),
+        'use_cache': not args.no_cache,
+        'cache_dir': args.cache_dir,
+        'cache_max_bytes': pdf_page_filter.cache_max_bytes_from_args(args),
+        'use_page_labels': not args.no_page_labels,
+        'resume': args.resume,
+        'checkpoint_every': args.checkpoint_every,
+        'optimize': args.optimize,
+        'fingerprints': args.fingerprints,
+    }
+
+    volumes = len(group_jobs_by_input(jobs))
+    print(f"{'Planning' if args.plan_json else 'Running'} {len(jobs)} job(s) across {volumes} volume(s)")
+    print("-" * 60)
+    start = time.perf_counter()
+    results = run_batch(jobs, workers=args.workers, options=options, plan=bool(args.plan_json))
+    elapsed = time.perf_counter() - start
+    print("-" * 60)
+
+    failed = [result for result in results if result['exit_code'] != 0]
+    if args.plan_json:
+        planned = len(results) - len(failed)
+        pages = sum(result['pages'] for result in results)
+        print(f"{planned}/{len(results)} job(s) planned, {pages} pages in total, in {elapsed:.2f}s")
+        plan = {
+            'manifest': str(args.manifest),
+            'seconds': elapsed,
+            'planned': planned,
+            'failed': len(failed),
+            'pages': pages,
+            'jobs': results,
+        }
+        pdf_page_filter.write_plan(args.plan_json, plan)
+        print(f"Plan written to '{args.plan_json}'")
+        sys.exit(1 if failed else 0)
+
+    print(f"{len(results) - len(failed)}/{len(results)} job(s) succeeded in {elapsed:.2f}s")
+    optimised = [result for result in results if result.get('bytes_before') is not None]
+    if optimised:
+        size = sum(result['bytes'] for result in optimised)
+        size_before = sum(result['bytes_before'] for result in optimised)
+        print(f"Optimised {len(optimised)} output(s): "
+              f"{pdf_page_filter.describe_size(size, size_before)}")
+
+    if args.summary:
+        summary = {
+            'manifest': str(args.manifest),
+            'seconds': elapsed,
+            'succeeded': len(results) - len(failed),
+            'failed': len(failed),
+            'jobs': results,
+        }
+        with open(args.summary, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Summary written to '{args.summary}'")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
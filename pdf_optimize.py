@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Size optimisation for PdfWriter outputs.
+
+Pages copied with add_page bring their resources along one object at a time,
+so an output cut from a volume can carry the same font or image several times
+over, resources its pages never draw, and streams stored uncompressed. Just
+before a writer is saved, optimize_writer():
+
+- prunes resource entries (fonts, images, graphics states, ...) that no
+  page's content stream names,
+- Flate-compresses streams stored without a filter,
+- merges byte-identical objects into one, repeating until references to
+  merged objects have themselves been merged, and
+- drops objects no longer reachable from the document catalog.
+
+Objects are compared by their encoded bytes, so scanned pages (JBIG2 images)
+are never decoded. Neither PyPDF2 nor pypdf can write compressed object
+streams; for the scanned SDS volumes almost all of the output is image data,
+which no lossless rewrite shrinks.
+"""
+
+import io
+import re
+import sys
+import hashlib
+
+try:
+    from pypdf.generic import (ArrayObject, DictionaryObject, IndirectObject,
+                               NameObject, NullObject, StreamObject)
+except ImportError:
+    try:
+        from PyPDF2.generic import (ArrayObject, DictionaryObject, IndirectObject,
+                                    NameObject, NullObject, StreamObject)
+    except ImportError:
+        print("Error: PDF library not found.")
+        print("Please install using: pip install pypdf")
+        print("Or alternatively: pip install PyPDF2")
+        sys.exit(1)
+
+# Resource categories whose entries are referenced by name from content streams
+PRUNABLE_RESOURCES = ('/Font', '/XObject', '/ExtGState', '/ColorSpace', '/Pattern',
+                      '/Shading', '/Properties')
+
+# Objects that must stay distinct even when byte-identical
+_STRUCTURAL_TYPES = ('/Catalog', '/Pages', '/Page')
+
+_NAME = re.compile(rb'/([^\s/\[\]()<>{}%]+)')
+_NAME_ESCAPE = re.compile(r'#([0-9A-Fa-f]{2})')
+
+
+class _CountingStream:
+    """Write-only sink that only counts bytes, for measuring a writer's output size."""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+
+def written_size(writer):
+    """
+    Number of bytes writer.write() would produce, without keeping them.
+
+    Args:
+        writer: PdfWriter object
+
+    Returns:
+        Size in bytes
+    """
+    sink = _CountingStream()
+    writer.write(sink)
+    return sink.size
+
+
+def _content_names(data):
+    """Set of names ('/F1', '/Im0', ...) appearing in content stream bytes."""
+    names = set()
+    for match in _NAME.finditer(data):
+        name = match.group(1).decode('latin-1')
+        if '#' in name:
+            name = _NAME_ESCAPE.sub(lambda escape: chr(int(escape.group(1), 16)), name)
+        names.add('/' + name)
+    return names
+
+
+def _used_names(page):
+    """
+    Names a page's content can refer to, or None if its content cannot be read.
+
+    Form XObjects without their own /Resources draw with the page's, so the
+    names in their content streams are included too.
+    """
+    try:
+        contents = page.get_contents()
+        names = _content_names(contents.get_data()) if contents is not None else set()
+        resources = page.get('/Resources')
+        xobjects = resources.get('/XObject') if resources is not None else None
+        pending = list(names)
+        seen = set()
+        while xobjects is not None and pending:
+            name = pending.pop()
+            if name in seen or name not in xobjects:
+                continue
+            seen.add(name)
+            xobject = xobjects[name]
+            if xobject.get('/Subtype') == '/Form' and '/Resources' not in xobject:
+                inner = _content_names(xobject.get_data()) - names
+                names |= inner
+                pending.extend(inner)
+        return names
+    except Exception:
+        return None
+
+
+def prune_page_resources(page):
+    """
+    Drop resource entries a page's content never names.
+
+    The page gets a new /Resources dictionary, so a resources dictionary
+    shared with other pages is left untouched. Pages whose content cannot be
+    decoded are skipped.
+
+    Args:
+        page: PageObject already added to a PdfWriter
+
+    Returns:
+        Number of resource entries removed
+    """
+    resources = page.get('/Resources')
+    if resources is None:
+        return 0
+    names = _used_names(page)
+    if names is None:
+        return 0
+
+    pruned = DictionaryObject()
+    removed = 0
+    for category, value in resources.items():
+        entries = resources[category] if category in PRUNABLE_RESOURCES else None
+        if not isinstance(entries, DictionaryObject):
+            pruned[category] = value
+            continue
+        kept = DictionaryObject({name: ref for name, ref in entries.items() if name in names})
+        removed += len(entries) - len(kept)
+        if kept:
+            pruned[category] = kept
+    if removed:
+        page[NameObject('/Resources')] = pruned
+    return removed
+
+
+def compress_streams(writer):
+    """
+    Flate-compress every stream stored without a filter, where that is smaller.
+
+    Args:
+        writer: PdfWriter object
+
+    Returns:
+        Number of streams compressed
+    """
+    compressed = 0
+    objects = writer._objects
+    for idx, obj in enumerate(objects):
+        if not isinstance(obj, StreamObject) or '/Filter' in obj:
+            continue
+        encoded = obj.flate_encode()
+        if len(encoded._data) < len(obj._data):
+            encoded.indirect_reference = IndirectObject(idx + 1, 0, writer)
+            objects[idx] = encoded
+            compressed += 1
+    return compressed
+
+
+def _references(obj):
+    """Yield the IndirectObjects directly inside obj (not following them)."""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, IndirectObject):
+            yield value
+        elif isinstance(value, DictionaryObject):
+            stack.extend(value.values())
+        elif isinstance(value, ArrayObject):
+            stack.extend(value)
+
+
+def _replace_references(obj, merged, writer):
+    """Point references to merged objects at the object they were merged into."""
+    stack = [obj]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, DictionaryObject):
+            items = list(value.items())
+        elif isinstance(value, ArrayObject):
+            items = list(enumerate(value))
+        else:
+            continue
+        for key, item in items:
+            if isinstance(item, IndirectObject):
+                if item.idnum in merged:
+                    value[key] = IndirectObject(merged[item.idnum], 0, writer)
+            else:
+                stack.append(item)
+
+
+def _object_digest(obj):
+    """SHA-256 of an object's serialised (still encoded) bytes."""
+    buffer = io.BytesIO()
+    obj.write_to_stream(buffer, None)
+    return hashlib.sha256(buffer.getvalue()).digest()
+
+
+def _protected_idnums(writer):
+    """Object numbers the trailer points at directly (catalog and document info)."""
+    # PyPDF2 keeps the catalog reference in _root, pypdf on the catalog itself
+    root = getattr(writer, '_root', None) or writer._root_object.indirect_reference
+    protected = {root.idnum}
+    info = getattr(writer, '_info', None)
+    if isinstance(info, IndirectObject):
+        protected.add(info.idnum)
+    elif getattr(info, 'indirect_reference', None) is not None:
+        protected.add(info.indirect_reference.idnum)
+    return protected
+
+
+def merge_identical_objects(writer):
+    """
+    Merge byte-identical objects, repeating until nothing more merges.
+
+    Two fonts that differ only in which (identical) font file object they
+    point at become identical once those files are merged, hence the passes.
+    Merged objects are replaced by null objects so object numbers stay
+    stable; remove_unreferenced() then nulls anything orphaned.
+
+    Args:
+        writer: PdfWriter object
+
+    Returns:
+        Number of objects merged away
+    """
+    objects = writer._objects
+    protected = _protected_idnums(writer)
+    candidates = {idx + 1 for idx, obj in enumerate(objects)
+                  if isinstance(obj, (DictionaryObject, ArrayObject))
+                  and (idx + 1) not in protected
+                  and not (isinstance(obj, DictionaryObject) and obj.get('/Type') in _STRUCTURAL_TYPES)}
+
+    total = 0
+    while True:
+        first = {}
+        merged = {}
+        for idnum in sorted(candidates):
+            digest = _object_digest(objects[idnum - 1])
+            if digest in first:
+                merged[idnum] = first[digest]
+            else:
+                first[digest] = idnum
+        if not merged:
+            return total
+        for obj in objects:
+            _replace_references(obj, merged, writer)
+        for idnum in merged:
+            objects[idnum - 1] = NullObject()
+        candidates -= merged.keys()
+        total += len(merged)
+
+
+def remove_unreferenced(writer):
+    """
+    Null every object not reachable from the catalog or document info.
+
+    Args:
+        writer: PdfWriter object
+
+    Returns:
+        Number of objects removed
+    """
+    objects = writer._objects
+    reachable = set()
+    pending = list(_protected_idnums(writer))
+    while pending:
+        idnum = pending.pop()
+        if idnum in reachable or not 0 < idnum <= len(objects):
+            continue
+        reachable.add(idnum)
+        pending.extend(ref.idnum for ref in _references(objects[idnum - 1]))
+
+    removed = 0
+    for idx, obj in enumerate(objects):
+        if (idx + 1) not in reachable and obj is not None and not isinstance(obj, NullObject):
+            objects[idx] = NullObject()
+            removed += 1
+    return removed
+
+
+def optimize_writer(writer):
+    """
+    Shrink a PdfWriter's output in place; call it just before writing.
+
+    Args:
+        writer: PdfWriter object holding the output pages
+
+    Returns:
+        Dictionary of counts: resources_pruned, streams_compressed,
+        objects_merged and objects_removed
+    """
+    stats = {'resources_pruned': sum(prune_page_resources(page) for page in writer.pages)}
+    stats['streams_compressed'] = compress_streams(writer)
+    stats['objects_merged'] = merge_identical_objects(writer)
+    stats['objects_removed'] = remove_unreferenced(writer)
+    return stats
+
+
+def format_size(size):
+    """Human-readable byte count, e.g. '1.4 MB'."""
+    for unit in ('B', 'KB', 'MB'):
+        if size < 1024 or unit == 'MB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
@@ -6,19 +6,32 @@ This script reads the actual page numbers printed on each page (e.g., in the
 top corners) and filters based on those numbers, not the physical page position.
 """
 
+import os
 import sys
 import re
+import logging
+import csv
+import json
+import time
+import signal
+import argparse
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import page_map_cache
+import pdf_optimize
+from page_ranges import PageRanges
+
 try:
-    from PyPDF2 import PdfReader, PdfWriter
+    from pypdf import PdfReader, PdfWriter
 except ImportError:
     try:
-        from pypdf import PdfReader, PdfWriter
+        from PyPDF2 import PdfReader, PdfWriter
     except ImportError:
         print("Error: PDF library not found.")
-        print("Please install using: pip install PyPDF2")
-        print("Or alternatively: pip install pypdf")
+        print("Please install using: pip install pypdf")
+        print("Or alternatively: pip install PyPDF2")
         sys.exit(1)
 
 
@@ -61,59 +74,503 @@ def extract_page_number_from_text(text):
     return None
 
 
-def detect_page_numbers(reader, verbose=True):
+logger = logging.getLogger('pdf_page_filter')
+
+
+@contextmanager
+def _timed_stage(metrics, stage):
+    """Add the wall time of the enclosed block to metrics['stages'][stage]."""
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages = metrics.setdefault('stages', {})
+        stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _count(metrics, counter, amount=1):
+    """Add amount to metrics['counters'][counter]."""
+    if metrics is not None:
+        counters = metrics.setdefault('counters', {})
+        counters[counter] = counters.get(counter, 0) + amount
+
+
+# Bump whenever a change to detection or interpolation alters the page
+# mapping produced for the same PDF; this invalidates cached mappings.
+DETECTOR_VERSION = 2
+
+# Default height of the header/footer band, as a fraction of the page height
+DEFAULT_HEADER_BAND = 0.08
+
+# Pages detected between checkpoints of a full scan (0 disables checkpoints)
+DEFAULT_CHECKPOINT_EVERY = 250
+
+# Content-stream tokenizer used by the band extractor. Literal strings allow
+# one level of unescaped nested parentheses, which covers real-world PDFs.
+_CONTENT_TOKEN = re.compile(
+    rb'\s*(?:'
+    rb'(?P<str>\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\))'
+    rb'|(?P<hex><[0-9A-Fa-f\s]*>)'
+    rb'|(?P<dict><<|>>)'
+    rb'|(?P<arr>[\[\]])'
+    rb'|(?P<name>/[^\s/\[\]()<>{}%]*)'
+    rb'|(?P<num>[+-]?(?:\d+\.?\d*|\.\d+))'
+    rb'|(?P<comment>%[^\r\n]*)'
+    rb'|(?P<op>[^\s/\[\]()<>{}%]+)'
+    rb'|(?P<other>.)'
+    rb')',
+    re.DOTALL
+)
+
+_LITERAL_ESCAPES = {
+    b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f',
+    b'(': b'(', b')': b')', b'\\': b'\\',
+}
+
+_ENCODING_CODECS = {
+    '/WinAnsiEncoding': 'cp1252',
+    '/StandardEncoding': 'latin-1',
+    '/MacRomanEncoding': 'mac_roman',
+}
+
+
+def _decode_literal_string(raw):
+    """Decode the body of a PDF literal string (without the parentheses)."""
+    if b'\\' not in raw:
+        return raw
+    out = bytearray()
+    i = 0
+    while i < len(raw):
+        ch = raw[i:i + 1]
+        if ch != b'\\':
+            out += ch
+            i += 1
+            continue
+        nxt = raw[i + 1:i + 2]
+        if nxt in _LITERAL_ESCAPES:
+            out += _LITERAL_ESCAPES[nxt]
+            i += 2
+        elif nxt.isdigit():
+            octal = re.match(rb'[0-7]{1,3}', raw[i + 1:i + 4])
+            if octal:
+                out.append(int(octal.group(0), 8) & 0xFF)
+                i += 1 + len(octal.group(0))
+            else:
+                i += 2
+        elif nxt in (b'\r', b'\n'):
+            # Line continuation
+            i += 2
+            if nxt == b'\r' and raw[i:i + 1] == b'\n':
+                i += 1
+        else:
+            out += nxt
+            i += 2
+    return bytes(out)
+
+
+def _simple_font_codec(font):
+    """
+    Return a Python codec that decodes digits for a simple font, or None.
+
+    Composite (Type0) fonts and fonts whose encoding remaps the digit codes
+    are not decoded by the band extractor; those pages fall back to full
+    text extraction.
+    """
+    try:
+        font = font.get_object()
+        if font.get('/Subtype') not in ('/Type1', '/TrueType', '/MMType1'):
+            return None
+        encoding = font.get('/Encoding')
+        if encoding is None:
+            return None if '/ToUnicode' in font else 'latin-1'
+        encoding = encoding.get_object()
+        if isinstance(encoding, str):
+            return _ENCODING_CODECS.get(encoding)
+        differences = encoding.get('/Differences', [])
+        code = 0
+        for item in differences:
+            if isinstance(item, int):
+                code = int(item)
+            else:
+                if 0x30 <= code <= 0x39:
+                    return None
+                code += 1
+        return _ENCODING_CODECS.get(encoding.get('/BaseEncoding', '/StandardEncoding'), 'latin-1')
+    except Exception:
+        return None
+
+
+def _multiply_matrix(m, n):
+    """Multiply two PDF affine matrices given as 6-tuples (m x n)."""
+    return (
+        m[0] * n[0] + m[1] * n[2],
+        m[0] * n[1] + m[1] * n[3],
+        m[2] * n[0] + m[3] * n[2],
+        m[2] * n[1] + m[3] * n[3],
+        m[4] * n[0] + m[5] * n[2] + n[4],
+        m[4] * n[1] + m[5] * n[3] + n[5],
+    )
+
+
+def extract_band_text(page, band=DEFAULT_HEADER_BAND, edge='top'):
+    """
+    Extract text drawn inside a horizontal strip at the top or bottom of a page.
+
+    Unlike page.extract_text(), this walks the raw content stream and only
+    decodes string operands of simple fonts whose baseline falls inside the
+    strip, so it never builds character maps or lays out the rest of the page.
+
+    Args:
+        page: PageObject to scan
+        band: Height of the strip as a fraction of the page height
+        edge: 'top' for a header strip or 'bottom' for a footer strip
+
+    Returns:
+        Text of the strip, one line per baseline ordered top to bottom,
+        or None if the page cannot be scanned this way (e.g. rotated pages)
+    """
+    if page.get('/Rotate', 0) % 360:
+        return None
+    contents = page.get_contents()
+    if contents is None:
+        return ''
+    data = contents.get_data()
+
+    mediabox = page.mediabox
+    page_bottom = float(mediabox.bottom)
+    page_top = float(mediabox.top)
+    strip = (page_top - page_bottom) * band
+    if edge == 'top':
+        y_min, y_max = page_top - strip, page_top
+    else:
+        y_min, y_max = page_bottom, page_bottom + strip
+
+    codecs = {}
+    try:
+        fonts = page['/Resources']['/Font'].get_object()
+        for name, font in fonts.items():
+            codecs[name] = _simple_font_codec(font)
+    except (KeyError, TypeError, AttributeError):
+        pass
+
+    identity = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+    ctm = identity
+    ctm_stack = []
+    tm = tlm = identity
+    leading = 0.0
+    codec = None
+    operands = []
+    fragments = []  # (y, x, text, starts_new_run)
+    moved = True
+
+    def show(raw):
+        nonlocal moved
+        if codec is None:
+            return
+        x, y = _multiply_matrix(tm, ctm)[4:6]
+        if y_min <= y <= y_max:
+            fragments.append((y, x, raw.decode(codec, errors='replace'), moved))
+        moved = False
+
+    def strings_of(ops):
+        for kind, value in ops:
+            if kind == 'str':
+                yield _decode_literal_string(value[1:-1])
+            elif kind == 'hex':
+                digits = re.sub(rb'\s', b'', value[1:-1])
+                if len(digits) % 2:
+                    digits += b'0'
+                yield bytes.fromhex(digits.decode('ascii'))
+
+    pos = 0
+    length = len(data)
+    while pos < length:
+        match = _CONTENT_TOKEN.match(data, pos)
+        if not match:
+            break
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind in ('comment', 'other', 'dict'):
+            continue
+        if kind != 'op':
+            operands.append((kind, value))
+            continue
+
+        op = value
+        nums = [float(v) for k, v in operands if k == 'num']
+        if op == b'q':
+            ctm_stack.append(ctm)
+        elif op == b'Q':
+            ctm = ctm_stack.pop() if ctm_stack else identity
+        elif op == b'cm' and len(nums) >= 6:
+            ctm = _multiply_matrix(tuple(nums[-6:]), ctm)
+        elif op == b'BT':
+            tm = tlm = identity
+            moved = True
+        elif op == b'Tf' and operands and operands[0][0] == 'name':
+            codec = codecs.get(operands[0][1].decode('latin-1'))
+        elif op == b'TL' and nums:
+            leading = nums[-1]
+        elif op in (b'Td', b'TD') and len(nums) >= 2:
+            if op == b'TD':
+                leading = -nums[-1]
+            tm = tlm = _multiply_matrix((1.0, 0.0, 0.0, 1.0, nums[-2], nums[-1]), tlm)
+            moved = True
+        elif op == b'Tm' and len(nums) >= 6:
+            tm = tlm = tuple(nums[-6:])
+            moved = True
+        elif op in (b'T*', b"'", b'"'):
+            tm = tlm = _multiply_matrix((1.0, 0.0, 0.0, 1.0, 0.0, -leading), tlm)
+            moved = True
+            if op != b'T*':
+                for raw in strings_of(operands[-1:]):
+                    show(raw)
+        elif op in (b'Tj', b'TJ'):
+            for raw in strings_of(operands):
+                show(raw)
+        elif op == b'BI':
+            end = data.find(b'EI', pos)
+            pos = length if end < 0 else end + 2
+        operands = []
+
+    # Group fragments into lines by baseline, top to bottom
+    lines = {}
+    for y, x, text, new_run in fragments:
+        lines.setdefault(round(y), []).append((x, text, new_run))
+    text_lines = []
+    for y in sorted(lines, reverse=True):
+        line = ''
+        for _, text, new_run in lines[y]:
+            line += (' ' if new_run and line else '') + text
+        text_lines.append(line)
+    return '\n'.join(text_lines)
+
+
+def detect_page_number(page, header_band=None, band_edges=('top',), text=None):
+    """
+    Detect the printed page number of a single page.
+
+    Args:
+        page: PageObject to scan
+        header_band: If set, first look only at text inside header/footer
+            strips of this height (fraction of page height), falling back to
+            full-page extraction when the strips yield no number
+        band_edges: Which strips to scan in band mode ('top', 'bottom')
+        text: Full-page text already extracted from page, used instead of
+            extracting it again
+
+    Returns:
+        Page number as integer, or None if not found
+    """
+    if header_band:
+        for edge in band_edges:
+            band_text = extract_band_text(page, header_band, edge)
+            printed_num = extract_page_number_from_text(band_text)
+            if printed_num:
+                return printed_num
+
+    return extract_page_number_from_text(page.extract_text() if text is None else text)
+
+
+def _scan_pages(reader, physical_indices, header_band=None, band_edges=('top',)):
+    """
+    Yield (physical index, printed page number, error message) for each page.
+
+    The printed page number is None when no number was found, and the error
+    message is None unless text extraction raised.
+    """
+    for physical_idx in physical_indices:
+        try:
+            page = reader.pages[physical_idx]
+
+            # Extract page number from top of page
+            yield physical_idx, detect_page_number(page, header_band, band_edges), None
+
+        except Exception as e:
+            yield physical_idx, None, str(e)
+
+
+def _scan_page_chunk(input_path, physical_indices, header_band, band_edges):
+    """Worker entry point: open the PDF and scan the given physical pages."""
+    reader = PdfReader(input_path)
+    return list(_scan_pages(reader, physical_indices, header_band, band_edges))
+
+
+def _scan_pages_parallel(input_path, physical_indices, jobs, header_band, band_edges):
+    """
+    Scan physical pages across a process pool, yielding results in the
+    order given.
+
+    Pages are split into several chunks per worker so that a slow stretch of
+    dense pages does not leave the other workers idle.
+    """
+    chunk_size = max(1, -(-len(physical_indices) // (jobs * 4)))
+    chunks = [physical_indices[start:start + chunk_size]
+              for start in range(0, len(physical_indices), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(_scan_page_chunk, [input_path] * len(chunks), chunks,
+                               [header_band] * len(chunks), [band_edges] * len(chunks))
+        for chunk in results:
+            yield from chunk
+
+
+def detect_page_numbers(reader, verbose=True, header_band=None, band_edges=('top',),
+                        jobs=1, input_path=None, metrics=None, start=0, initial=None,
+                        checkpoint=None, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, known=None):
     """
     Detect printed page numbers on each page of the PDF.
 
     Args:
         reader: PdfReader object
         verbose: Print progress information
+        header_band: Fraction of the page height to scan at the top/bottom
+            before falling back to full-page text extraction (None scans the
+            whole page, as before)
+        band_edges: Which strips to scan in band mode ('top', 'bottom')
+        jobs: Number of worker processes; each opens input_path itself and
+            scans a chunk of pages. The result is identical to a serial scan.
+        input_path: Path the reader was opened from (required for jobs > 1)
+        metrics: Optional dict that receives the 'detect' stage time and
+            pages_scanned/pages_detected/extraction_errors counters
+        start: First physical page to scan (pages before it were scanned by
+            an earlier, interrupted run)
+        initial: Page numbers detected on the pages before start
+        checkpoint: Optional callable(pages scanned, mapping so far), called
+            every checkpoint_every pages and when the scan is interrupted
+        checkpoint_every: Pages between checkpoint calls
+        known: Printed numbers already known for some pages (physical index
+            -> number), e.g. from identical pages of other volumes; those
+            pages are not scanned
 
     Returns:
         Dictionary mapping physical page index (0-indexed) to printed page number
     """
-    page_mapping = {}
+    page_mapping = dict(initial or {})
+    page_mapping.update(known or {})
     total_pages = len(reader.pages)
+    physical_indices = [physical_idx for physical_idx in range(start, total_pages)
+                        if physical_idx not in (known or {})]
+    errors = 0
+    scanned = start
+
+    # Decide once whether per-page lines are wanted, keeping the loop cheap
+    log_pages = verbose and logger.isEnabledFor(logging.DEBUG)
 
     if verbose:
-        print("\nDetecting page numbers printed on pages...")
-        print("-" * 60)
+        logger.info("Detecting page numbers printed on pages...")
+
+    if verbose and start:
+        logger.info(f"Resuming detection at physical page {start + 1} "
+                    f"({len(initial or {})} numbers from the checkpoint)")
+    if verbose and known:
+        logger.info(f"Took {len(known)} page numbers from identical pages of other volumes")
+
+    with _timed_stage(metrics, 'detect'):
+        if jobs > 1 and input_path is not None and len(physical_indices) > 1:
+            results = _scan_pages_parallel(input_path, physical_indices,
+                                           min(jobs, len(physical_indices)), header_band, band_edges)
+        else:
+            results = _scan_pages(reader, physical_indices, header_band, band_edges)
 
-    for physical_idx in range(total_pages):
         try:
-            page = reader.pages[physical_idx]
-            text = page.extract_text()
+            for count, (physical_idx, printed_num, error) in enumerate(results, 1):
+                if error is not None:
+                    errors += 1
+                    if log_pages:
+                        logger.debug(f"Physical page {physical_idx + 1:3d} -> Error extracting text: {error}")
+                elif printed_num:
+                    page_mapping[physical_idx] = printed_num
+                    if log_pages:
+                        logger.debug(f"Physical page {physical_idx + 1:3d} -> Printed page number: {printed_num}")
+                elif log_pages:
+                    logger.debug(f"Physical page {physical_idx + 1:3d} -> No page number detected")
+                scanned = physical_idx + 1
+                if checkpoint is not None and checkpoint_every and count % checkpoint_every == 0:
+                    checkpoint(scanned, page_mapping)
+            scanned = total_pages
+        finally:
+            # Interrupted (error, Ctrl-C, SIGTERM): keep what was scanned
+            if checkpoint is not None and start < scanned < total_pages:
+                checkpoint(scanned, page_mapping)
+
+    _count(metrics, 'pages_scanned', len(physical_indices))
+    _count(metrics, 'pages_linked', len(known or {}))
+    _count(metrics, 'pages_detected', len(page_mapping))
+    _count(metrics, 'extraction_errors', errors)
 
-            # Extract page number from top of page
-            printed_num = extract_page_number_from_text(text)
+    if verbose:
+        if errors:
+            logger.warning(f"Warning: Text extraction failed on {errors}/{total_pages} pages")
+        logger.info(f"Detected page numbers on {len(page_mapping)}/{total_pages} pages")
 
-            if printed_num:
-                page_mapping[physical_idx] = printed_num
-                if verbose:
-                    print(f"Physical page {physical_idx + 1:3d} -> Printed page number: {printed_num}")
-            else:
-                if verbose:
-                    print(f"Physical page {physical_idx + 1:3d} -> No page number detected")
+    return page_mapping
 
-        except Exception as e:
-            if verbose:
-                print(f"Physical page {physical_idx + 1:3d} -> Error extracting text: {e}")
 
-    if verbose:
-        print("-" * 60)
-        print(f"Detected page numbers on {len(page_mapping)}/{total_pages} pages\n")
+def compare_extraction_modes(input_path, header_band=DEFAULT_HEADER_BAND, band_edges=('top',)):
+    """
+    Time full-page and header-band page number detection on the same PDF.
 
-    return page_mapping
+    Each mode gets a freshly opened reader so neither benefits from objects
+    the other has already parsed.
+
+    Args:
+        input_path: Path to input PDF file
+        header_band: Band height used for the band mode
+        band_edges: Which strips to scan in band mode ('top', 'bottom')
 
+    Returns:
+        Dictionary with timings, detection counts and the pages where the
+        two modes disagree
+    """
+    results = {}
+    mappings = {}
+    for mode, band in (('full', None), ('band', header_band)):
+        reader = PdfReader(input_path)
+        start = time.perf_counter()
+        mappings[mode] = detect_page_numbers(reader, verbose=False,
+                                             header_band=band, band_edges=band_edges)
+        results[mode] = {
+            'seconds': time.perf_counter() - start,
+            'pages_detected': len(mappings[mode]),
+        }
 
-def interpolate_missing_pages(page_mapping, total_pages, verbose=True):
+    total_pages = len(reader.pages)
+    results['total_pages'] = total_pages
+    results['speedup'] = results['full']['seconds'] / max(results['band']['seconds'], 1e-9)
+    results['disagreements'] = {
+        physical_idx: (mappings['full'].get(physical_idx), mappings['band'].get(physical_idx))
+        for physical_idx in range(total_pages)
+        if mappings['full'].get(physical_idx) != mappings['band'].get(physical_idx)
+    }
+
+    print(f"Compared page number detection on {total_pages} pages of '{input_path}'")
+    print("-" * 60)
+    for mode in ('full', 'band'):
+        print(f"{mode:>4} extraction: {results[mode]['seconds']:8.3f}s "
+              f"({results[mode]['pages_detected']}/{total_pages} pages detected)")
+    print(f"Speedup: {results['speedup']:.1f}x")
+    for physical_idx, (full_num, band_num) in sorted(results['disagreements'].items()):
+        print(f"Physical page {physical_idx + 1:3d} -> full: {full_num}, band: {band_num}")
+    print("-" * 60)
+
+    return results
+
+
+def interpolate_missing_pages(page_mapping, total_pages, verbose=True, metrics=None):
     """
     Intelligently fill in missing page numbers based on detected sequences.
 
     Args:
         page_mapping: Dictionary of physical index -> printed page number
         total_pages: Total number of physical pages
-        verbose: Print interpolation information
+        verbose: Log interpolation information
+        metrics: Optional dict that receives the 'interpolate' stage time and
+            the pages_interpolated counter
 
     Returns:
         Updated page_mapping with interpolated values
@@ -122,146 +579,1175 @@ def interpolate_missing_pages(page_mapping, total_pages, verbose=True):
         return page_mapping
 
     interpolated = page_mapping.copy()
+    log_pages = verbose and logger.isEnabledFor(logging.DEBUG)
+
+    with _timed_stage(metrics, 'interpolate'):
+        # Find sequences of consecutive detected pages
+        detected_indices = sorted(page_mapping.keys())
+
+        # Look for patterns and fill gaps
+        for i in range(len(detected_indices) - 1):
+            phys_start = detected_indices[i]
+            phys_end = detected_indices[i + 1]
+
+            page_start = page_mapping[phys_start]
+            page_end = page_mapping[phys_end]
+
+            # Calculate the gap
+            phys_gap = phys_end - phys_start
+            page_gap = page_end - page_start
+
+            # If the gaps match or are close, interpolate
+            # Allow for some flexibility (e.g., one skipped page number)
+            if phys_gap > 1 and phys_gap <= 10 and page_gap >= phys_gap - 2 and page_gap <= phys_gap + 2:
+                # Linear interpolation
+                if page_gap == phys_gap:
+                    # Perfect match - sequential numbering
+                    for j in range(1, phys_gap):
+                        phys_idx = phys_start + j
+                        inferred_page = page_start + j
+                        if phys_idx not in interpolated:
+                            interpolated[phys_idx] = inferred_page
+                            if log_pages:
+                                logger.debug(f"Physical page {phys_idx + 1:3d} -> Inferred page number: {inferred_page}")
+                elif page_gap == phys_gap - 1:
+                    # One physical page doesn't have a number (likely blank/separator)
+                    # Fill in the sequential ones
+                    current_page = page_start
+                    for j in range(1, phys_gap):
+                        phys_idx = phys_start + j
+                        if phys_idx not in interpolated:
+                            # Try to infer if this should be numbered or blank
+                            expected_page = current_page + 1
+                            if expected_page < page_end:
+                                interpolated[phys_idx] = expected_page
+                                current_page = expected_page
+                                if log_pages:
+                                    logger.debug(f"Physical page {phys_idx + 1:3d} -> Inferred page number: {expected_page}")
+                            else:
+                                if log_pages:
+                                    logger.debug(f"Physical page {phys_idx + 1:3d} -> Likely unnumbered page (blank/separator)")
+
+        # Handle pages before the first detected page
+        if detected_indices:
+            first_detected = detected_indices[0]
+            first_page_num = page_mapping[first_detected]
+
+            # If first detected page has a reasonable page number, backfill
+            if first_page_num > 1 and first_page_num - 1 <= first_detected:
+                for phys_idx in range(first_detected - 1, -1, -1):
+                    inferred_page = first_page_num - (first_detected - phys_idx)
+                    if inferred_page >= 1 and phys_idx not in interpolated:
+                        interpolated[phys_idx] = inferred_page
+                        if log_pages:
+                            logger.debug(f"Physical page {phys_idx + 1:3d} -> Inferred page number: {inferred_page} (backfilled)")
+                    else:
+                        break
+
+        # Handle pages after the last detected page
+        if detected_indices:
+            last_detected = detected_indices[-1]
+            last_page_num = page_mapping[last_detected]
+
+            # Look for a consistent increment pattern near the end
+            if len(detected_indices) >= 2:
+                # Check if we have a consistent pattern
+                prev_detected = detected_indices[-2]
+                if last_detected - prev_detected == 1:
+                    # Sequential physical pages, extend forward
+                    for phys_idx in range(last_detected + 1, total_pages):
+                        inferred_page = last_page_num + (phys_idx - last_detected)
+                        if phys_idx not in interpolated:
+                            interpolated[phys_idx] = inferred_page
+                            if log_pages:
+                                logger.debug(f"Physical page {phys_idx + 1:3d} -> Inferred page number: {inferred_page} (forward fill)")
+
+    added_count = len(interpolated) - len(page_mapping)
+    _count(metrics, 'pages_interpolated', added_count)
 
     if verbose:
-        print("Interpolating missing page numbers...")
-        print("-" * 60)
-
-    # Find sequences of consecutive detected pages
-    detected_indices = sorted(page_mapping.keys())
-
-    # Look for patterns and fill gaps
-    for i in range(len(detected_indices) - 1):
-        phys_start = detected_indices[i]
-        phys_end = detected_indices[i + 1]
-
-        page_start = page_mapping[phys_start]
-        page_end = page_mapping[phys_end]
-
-        # Calculate the gap
-        phys_gap = phys_end - phys_start
-        page_gap = page_end - page_start
-
-        # If the gaps match or are close, interpolate
-        # Allow for some flexibility (e.g., one skipped page number)
-        if phys_gap > 1 and phys_gap <= 10 and page_gap >= phys_gap - 2 and page_gap <= phys_gap + 2:
-            # Linear interpolation
-            if page_gap == phys_gap:
-                # Perfect match - sequential numbering
-                for j in range(1, phys_gap):
-                    phys_idx = phys_start + j
-                    inferred_page = page_start + j
-                    if phys_idx not in interpolated:
-                        interpolated[phys_idx] = inferred_page
-                        if verbose:
-                            print(f"Physical page {phys_idx + 1:3d} -> Inferred page number: {inferred_page}")
-            elif page_gap == phys_gap - 1:
-                # One physical page doesn't have a number (likely blank/separator)
-                # Fill in the sequential ones
-                current_page = page_start
-                for j in range(1, phys_gap):
-                    phys_idx = phys_start + j
-                    if phys_idx not in interpolated:
-                        # Try to infer if this should be numbered or blank
-                        expected_page = current_page + 1
-                        if expected_page < page_end:
-                            interpolated[phys_idx] = expected_page
-                            current_page = expected_page
-                            if verbose:
-                                print(f"Physical page {phys_idx + 1:3d} -> Inferred page number: {expected_page}")
-                        else:
-                            if verbose:
-                                print(f"Physical page {phys_idx + 1:3d} -> Likely unnumbered page (blank/separator)")
-
-    # Handle pages before the first detected page
-    if detected_indices:
-        first_detected = detected_indices[0]
-        first_page_num = page_mapping[first_detected]
-
-        # If first detected page has a reasonable page number, backfill
-        if first_page_num > 1 and first_page_num - 1 <= first_detected:
-            for phys_idx in range(first_detected - 1, -1, -1):
-                inferred_page = first_page_num - (first_detected - phys_idx)
-                if inferred_page >= 1 and phys_idx not in interpolated:
-                    interpolated[phys_idx] = inferred_page
-                    if verbose:
-                        print(f"Physical page {phys_idx + 1:3d} -> Inferred page number: {inferred_page} (backfilled)")
+        logger.info(f"Interpolated {added_count} additional page numbers")
+        logger.info(f"Total pages mapped: {len(interpolated)}/{total_pages}")
+
+    return interpolated
+
+
+def page_map_cache_key(input_path, header_band, band_edges, use_page_labels=True, digest=None):
+    """
+    Cache key for the page mapping of input_path under the given options.
+
+    Args:
+        input_path: Path to the PDF file
+        header_band, band_edges, use_page_labels: Detection options
+        digest: The PDF's SHA-256 digest, if already known (default: hash the file)
+
+    Returns:
+        Cache key string (see page_map_cache.cache_key())
+    """
+    options = {'header_band': header_band, 'band_edges': list(band_edges),
+               'page_labels': use_page_labels}
+    return page_map_cache.cache_key(digest or page_map_cache.file_digest(input_path),
+                                    DETECTOR_VERSION, options)
+
+
+def load_cached_page_mapping(input_path, total_pages, header_band=None, band_edges=('top',),
+                             cache_dir=None, key=None, use_page_labels=True):
+    """
+    Look up a cached page mapping without extracting any text.
+
+    Args:
+        input_path: Path to the PDF file
+        total_pages: Number of physical pages (guards against stale entries)
+        header_band: Header/footer band height the mapping was detected with
+        band_edges: Which strips were scanned in band mode
+        cache_dir: Cache directory (default: page_map_cache.DEFAULT_CACHE_DIR)
+        key: Precomputed cache key, to avoid hashing the PDF twice
+        use_page_labels: Whether the mapping may come from /PageLabels
+
+    Returns:
+        Tuple (detected, interpolated), or None on a cache miss
+    """
+    if key is None:
+        key = page_map_cache_key(input_path, header_band, band_edges, use_page_labels)
+    entry = page_map_cache.load_page_map(key, cache_dir)
+    if entry is None or entry.get('total_pages') != total_pages:
+        return None
+    return entry['detected'], entry['interpolated']
+
+
+@contextmanager
+def _volume_fingerprints(fingerprints, input_path, reader):
+    """Open input_path's entry in a page fingerprint index, or yield None without one."""
+    if fingerprints is None:
+        yield None
+        return
+    import page_fingerprints
+
+    volume = page_fingerprints.VolumeFingerprints(fingerprints, input_path, reader)
+    try:
+        yield volume
+    finally:
+        volume.close()
+
+
+def resolve_page_mapping(reader, input_path, verbose=True, header_band=None,
+                         band_edges=('top',), jobs=1, use_cache=True, cache_dir=None,
+                         cache_max_bytes=page_map_cache.DEFAULT_MAX_BYTES, use_page_labels=True,
+                         metrics=None, key=None, resume=False,
+                         checkpoint_every=DEFAULT_CHECKPOINT_EVERY, fingerprints=None):
+    """
+    Detect and interpolate printed page numbers, using the on-disk cache.
+
+    On a cache hit no page text is extracted at all. On a miss, /PageLabels
+    are tried before text detection, and the detected and interpolated
+    mappings are stored for the next run. While text detection runs, the
+    pages detected so far are checkpointed next to the cache entry, so an
+    interrupted scan can be resumed.
+
+    Args:
+        reader: PdfReader object opened from input_path
+        input_path: Path to the PDF file (hashed for the cache key)
+        verbose: Print progress information
+        header_band: Header/footer band height for detection (see detect_page_numbers)
+        band_edges: Which strips to scan in band mode ('top', 'bottom')
+        jobs: Number of worker processes used for detection
+        use_cache: Read and write the page map cache
+        cache_dir: Cache directory (default: page_map_cache.DEFAULT_CACHE_DIR)
+        cache_max_bytes: Size limit for the cache directory
+        use_page_labels: Use the PDF's /PageLabels when they pass the cross-check
+        metrics: Optional dict collecting stage timings and counters
+        key: Precomputed cache key, to avoid hashing the PDF twice
+        resume: Continue text detection from the checkpoint of an interrupted
+            run, if there is one
+        checkpoint_every: Pages between checkpoints (0 disables them);
+            checkpoints need the cache
+        fingerprints: Optional page fingerprint index path (see
+            page_fingerprints.py). Pages identical to pages of other indexed
+            volumes take their printed numbers instead of being scanned, and
+            this volume's fingerprints and numbers are recorded.
+
+    Returns:
+        Tuple (detected, interpolated) of physical index -> printed number dicts
+    """
+    total_pages = len(reader.pages)
+
+    if use_cache:
+        with _timed_stage(metrics, 'cache_lookup'):
+            if key is None:
+                key = page_map_cache_key(input_path, header_band, band_edges, use_page_labels)
+            cached = load_cached_page_mapping(input_path, total_pages, header_band, band_edges,
+                                              cache_dir, key=key)
+        _count(metrics, 'cache_hits' if cached is not None else 'cache_misses')
+        if cached is not None:
+            if verbose:
+                logger.info(f"Loaded page mapping from cache "
+                            f"({len(cached[0])} detected, {len(cached[1])} mapped)")
+            with _volume_fingerprints(fingerprints, input_path, reader) as volume:
+                if volume is not None and volume.fresh:
+                    volume.record_numbers(cached[0])
+            return cached
+
+    labelled = None
+    if use_page_labels:
+        with _timed_stage(metrics, 'page_labels'):
+            labelled = page_label_mapping(reader, header_band, band_edges, verbose=verbose)
+
+    if labelled is not None:
+        detected = interpolated = labelled
+        with _volume_fingerprints(fingerprints, input_path, reader) as volume:
+            if volume is not None and volume.fresh:
+                volume.record_numbers(labelled)
+    else:
+        def save_checkpoint(scanned, page_mapping):
+            # Keep the record of outputs already written alongside
+            state = page_map_cache.load_checkpoint(key, cache_dir) or {}
+            state.update(total_pages=total_pages, scanned=scanned, detected=page_mapping)
+            try:
+                page_map_cache.store_checkpoint(key, state, cache_dir)
+            except OSError as e:
+                logger.warning(f"Warning: Could not write checkpoint: {e}")
+
+        start, initial = 0, None
+        checkpointing = bool(use_cache and checkpoint_every)
+        if checkpointing and resume:
+            previous = page_map_cache.load_checkpoint(key, cache_dir)
+            if previous is not None and previous.get('total_pages') == total_pages:
+                start, initial = previous.get('scanned', 0), previous.get('detected')
+
+        with _volume_fingerprints(fingerprints, input_path, reader) as volume:
+            known = volume.known_numbers() if volume is not None else None
+            detected = detect_page_numbers(reader, verbose=verbose, header_band=header_band,
+                                           band_edges=band_edges, jobs=jobs, input_path=input_path,
+                                           metrics=metrics, start=start, initial=initial,
+                                           checkpoint=save_checkpoint if checkpointing else None,
+                                           checkpoint_every=checkpoint_every,
+                                           known=known)
+            if volume is not None:
+                volume.record_numbers(detected)
+        interpolated = interpolate_missing_pages(detected, total_pages, verbose=verbose,
+                                                 metrics=metrics)
+
+    if use_cache and key is not None:
+        store_cached_page_mapping(key, input_path, total_pages, detected, interpolated,
+                                  'page_labels' if labelled is not None else 'text',
+                                  cache_dir, cache_max_bytes, verbose=verbose)
+
+    return detected, interpolated
+
+
+def store_cached_page_mapping(key, input_path, total_pages, detected, interpolated, method='text',
+                              cache_dir=None, cache_max_bytes=page_map_cache.DEFAULT_MAX_BYTES,
+                              verbose=True):
+    """
+    Store a resolved page mapping for load_cached_page_mapping().
+
+    Args:
+        key: Cache key from page_map_cache_key()
+        input_path: Path to the PDF file
+        total_pages: Number of physical pages
+        detected: Physical index -> detected printed number
+        interpolated: Physical index -> printed number after interpolation
+        method: 'text' or 'page_labels'
+        cache_dir: Cache directory (default: page_map_cache.DEFAULT_CACHE_DIR)
+        cache_max_bytes: Size limit for the cache entries
+        verbose: Warn when the entry cannot be written
+    """
+    entry = {
+        'source': str(input_path),
+        'detector_version': DETECTOR_VERSION,
+        'method': method,
+        'total_pages': total_pages,
+        'detected': detected,
+        'interpolated': interpolated,
+    }
+    try:
+        page_map_cache.store_page_map(key, entry, cache_dir, cache_max_bytes)
+    except OSError as e:
+        if verbose:
+            logger.warning(f"Warning: Could not write page map cache: {e}")
+
+
+# Number of labelled pages whose text is checked against /PageLabels
+PAGE_LABEL_SAMPLE_SIZE = 5
+
+_ROMAN_NUMERALS = [
+    (1000, 'm'), (900, 'cm'), (500, 'd'), (400, 'cd'), (100, 'c'), (90, 'xc'),
+    (50, 'l'), (40, 'xl'), (10, 'x'), (9, 'ix'), (5, 'v'), (4, 'iv'), (1, 'i'),
+]
+
+# Labels that carry an arabic page number, mirroring extract_page_number_from_text
+_LABEL_NUMBER = re.compile(r'^\s*(?:Page\s+|P\.?\s*)?(\d+)\s*$', re.IGNORECASE)
+
+
+def _format_label_number(value, style):
+    """Format a page label counter in a /PageLabels numbering style."""
+    if style == '/D':
+        return str(value)
+    if style in ('/R', '/r'):
+        roman = ''
+        for amount, numeral in _ROMAN_NUMERALS:
+            count, value = divmod(value, amount)
+            roman += numeral * count
+        return roman.upper() if style == '/R' else roman
+    if style in ('/A', '/a'):
+        # A..Z, then AA..ZZ, then AAA..ZZZ, ...
+        letter = chr(ord('A') + (value - 1) % 26) * ((value - 1) // 26 + 1)
+        return letter if style == '/A' else letter.lower()
+    return ''
+
+
+def _collect_number_tree(node, entries):
+    """Collect (key, value) pairs from a PDF number tree node."""
+    node = node.get_object()
+    nums = node.get('/Nums')
+    if nums is not None:
+        for i in range(0, len(nums) - 1, 2):
+            entries.append((int(nums[i]), nums[i + 1].get_object()))
+    for kid in node.get('/Kids', []):
+        _collect_number_tree(kid, entries)
+
+
+def read_page_labels(reader):
+    """
+    Read the logical page labels from the document catalog's /PageLabels tree.
+
+    Supports decimal (/D), upper/lower roman (/R, /r) and letter (/A, /a)
+    numbering styles with optional /P prefixes and /St start values.
+
+    Args:
+        reader: PdfReader object
+
+    Returns:
+        List with one label string per physical page, or None if the PDF has
+        no /PageLabels entry
+    """
+    try:
+        root = reader.trailer['/Root'].get_object()
+        tree = root.get('/PageLabels')
+        if tree is None:
+            return None
+        ranges = []
+        _collect_number_tree(tree, ranges)
+    except Exception:
+        return None
+    if not ranges:
+        return None
+
+    total_pages = len(reader.pages)
+    ranges.sort(key=lambda item: item[0])
+    labels = [''] * total_pages
+    for i, (start, spec) in enumerate(ranges):
+        stop = ranges[i + 1][0] if i + 1 < len(ranges) else total_pages
+        style = spec.get('/S')
+        prefix = str(spec.get('/P', ''))
+        first = int(spec.get('/St', 1))
+        for physical_idx in range(max(start, 0), min(stop, total_pages)):
+            number = _format_label_number(first + physical_idx - start, style) if style else ''
+            labels[physical_idx] = prefix + number
+    return labels
+
+
+def page_label_mapping(reader, header_band=None, band_edges=('top',),
+                       sample_size=PAGE_LABEL_SAMPLE_SIZE, verbose=True):
+    """
+    Build the physical -> printed page mapping from /PageLabels.
+
+    Labels that are plain arabic numbers (optionally written as "Page N" or
+    "P. N") map to printed page numbers; roman and letter labels are front or
+    back matter and stay unmapped, as they would with text detection. A few
+    labelled pages spread across the document are checked against
+    extract_page_number_from_text. The labels are only used if at least one
+    sampled page confirms them and none contradicts them; labels that no
+    sampled page can confirm are not trusted either.
+
+    Args:
+        reader: PdfReader object
+        header_band: Header/footer band height for the cross-check
+        band_edges: Which strips to scan in band mode ('top', 'bottom')
+        sample_size: Number of labelled pages to cross-check
+        verbose: Print progress information
+
+    Returns:
+        Dictionary mapping physical page index to printed page number, or
+        None if the PDF has no usable labels or they fail the cross-check
+    """
+    labels = read_page_labels(reader)
+    if labels is None:
+        return None
+
+    mapping = {}
+    for physical_idx, label in enumerate(labels):
+        match = _LABEL_NUMBER.match(label)
+        if match and 1 <= int(match.group(1)) <= 9999:
+            mapping[physical_idx] = int(match.group(1))
+    if not mapping:
+        return None
+
+    labelled = sorted(mapping)
+    step = max(1, len(labelled) // sample_size)
+    sample = labelled[step // 2::step][:sample_size]
+    agree = disagree = 0
+    for physical_idx in sample:
+        try:
+            printed_num = detect_page_number(reader.pages[physical_idx], header_band, band_edges)
+        except Exception:
+            printed_num = None
+        if printed_num is None:
+            continue
+        if printed_num == mapping[physical_idx]:
+            agree += 1
+        else:
+            disagree += 1
+
+    if disagree:
+        if verbose:
+            logger.warning(f"Warning: Page labels disagree with printed numbers on "
+                           f"{disagree}/{agree + disagree} sampled pages, ignoring /PageLabels")
+        return None
+    if not agree:
+        if verbose:
+            logger.info(f"No printed number found on the {len(sample)} sampled labelled pages "
+                        f"to verify /PageLabels against, ignoring them")
+        return None
+
+    if verbose:
+        logger.info(f"Using /PageLabels: {len(mapping)}/{len(labels)} pages labelled "
+                    f"(cross-checked {agree}/{len(sample)} sampled pages)")
+    return mapping
+
+
+# Largest physical gap interpolate_missing_pages fills between two detected pages
+INTERPOLATION_WINDOW = 10
+
+
+def resolve_pages_lazily(reader, requested_pages, header_band=None, band_edges=('top',),
+                         verbose=True, metrics=None):
+    """
+    Locate requested printed pages without scanning the whole PDF.
+
+    Printed page numbers increase with physical position, so each requested
+    number is found by binary search over physical indices, probing pages on
+    demand. Once the search has narrowed to a window no wider than the
+    interpolation gap, every page between the bracketing detected numbers is
+    probed and interpolate_missing_pages is applied to that window, so gaps,
+    unnumbered separator pages, backfilled and forward-filled pages resolve
+    exactly as in a full scan. Neighbours of each match are checked for
+    repeated printed numbers.
+
+    Args:
+        reader: PdfReader object
+        requested_pages: Sorted list of printed page numbers to locate
+        header_band: Header/footer band height for detection (see detect_page_numbers)
+        band_edges: Which strips to scan in band mode ('top', 'bottom')
+        verbose: Log progress information
+        metrics: Optional dict that receives the 'lazy_lookup' stage time and
+            the pages_scanned counter
+
+    Returns:
+        Tuple (printed_to_physical, probed) where printed_to_physical maps
+        each located printed number to its physical indices and probed maps
+        every physical index whose text was extracted to its detected number
+    """
+    total_pages = len(reader.pages)
+    probed = {}
+
+    def probe(physical_idx):
+        if physical_idx not in probed:
+            try:
+                printed_num = detect_page_number(reader.pages[physical_idx], header_band, band_edges)
+            except Exception:
+                printed_num = None
+            probed[physical_idx] = printed_num
+        return probed[physical_idx]
+
+    def next_numbered(start, stop):
+        for physical_idx in range(start, stop):
+            printed_num = probe(physical_idx)
+            if printed_num:
+                return physical_idx, printed_num
+        return None, None
+
+    log_pages = verbose and logger.isEnabledFor(logging.DEBUG)
+    if verbose:
+        logger.info("Locating requested page numbers lazily...")
+
+    printed_to_physical = {}
+    with _timed_stage(metrics, 'lazy_lookup'):
+        for target in requested_pages:
+            # Binary search for the last numbered page below target (lo) and a
+            # bound hi at or before the first numbered page >= target
+            lo, hi = -1, total_pages
+            while hi - lo > INTERPOLATION_WINDOW:
+                mid = (lo + hi) // 2
+                physical_idx, printed_num = next_numbered(mid, hi)
+                if physical_idx is None:
+                    hi = mid
+                elif printed_num < target:
+                    lo = physical_idx
                 else:
-                    break
-
-    # Handle pages after the last detected page
-    if detected_indices:
-        last_detected = detected_indices[-1]
-        last_page_num = page_mapping[last_detected]
-
-        # Look for a consistent increment pattern near the end
-        if len(detected_indices) >= 2:
-            # Check if we have a consistent pattern
-            prev_detected = detected_indices[-2]
-            if last_detected - prev_detected == 1:
-                # Sequential physical pages, extend forward
-                for phys_idx in range(last_detected + 1, total_pages):
-                    inferred_page = last_page_num + (phys_idx - last_detected)
-                    if phys_idx not in interpolated:
-                        interpolated[phys_idx] = inferred_page
-                        if verbose:
-                            print(f"Physical page {phys_idx + 1:3d} -> Inferred page number: {inferred_page} (forward fill)")
+                    hi = physical_idx
+
+            # Probe the whole window, from the page before lo (needed to decide
+            # forward filling) up to the next numbered page at or after hi
+            window_start = max(lo - 1, 0)
+            for physical_idx in range(window_start, hi):
+                probe(physical_idx)
+            anchor, _ = next_numbered(hi, total_pages)
+            window_end = anchor if anchor is not None else total_pages - 1
+
+            local_detected = {
+                physical_idx: probed[physical_idx]
+                for physical_idx in range(window_start, window_end + 1)
+                if probed.get(physical_idx)
+            }
+            local_mapping = interpolate_missing_pages(local_detected, total_pages, verbose=False)
+            matches = [physical_idx for physical_idx in range(window_start, window_end + 1)
+                       if local_mapping.get(physical_idx) == target]
+
+            # Verify neighbours: the same printed number may repeat on the next pages
+            if matches:
+                physical_idx = matches[-1] + 1
+                while physical_idx < total_pages and probe(physical_idx) == target:
+                    matches.append(physical_idx)
+                    physical_idx += 1
+                printed_to_physical[target] = matches
+
+            if log_pages:
+                if matches:
+                    pages = ', '.join(str(physical_idx + 1) for physical_idx in matches)
+                    logger.debug(f"Printed page {target} -> Physical page(s) {pages}")
+                else:
+                    logger.debug(f"Printed page {target} -> Not found")
+    _count(metrics, 'pages_scanned', len(probed))
+    _count(metrics, 'pages_detected', sum(1 for printed_num in probed.values() if printed_num))
 
     if verbose:
-        print("-" * 60)
-        added_count = len(interpolated) - len(page_mapping)
-        print(f"Interpolated {added_count} additional page numbers")
-        print(f"Total pages mapped: {len(interpolated)}/{total_pages}\n")
+        logger.info(f"Extracted text from {len(probed)}/{total_pages} pages "
+                    f"to locate {len(printed_to_physical)}/{len(requested_pages)} requested pages")
 
-    return interpolated
+    return printed_to_physical, probed
 
 
 def parse_page_ranges(range_string):
     """
-    Parse page range string like "1-3, 5, 7-10" into a list of page numbers.
+    Parse page range string like "1-3, 5, 7-10" into a compact PageRanges set.
+
+    Besides single pages and ranges, open ends ("17-"), steps ("1-20:2") and
+    exclusions ("!50-60") are supported; see page_ranges for the syntax.
+    The set stores intervals, so wide ranges do not allocate page numbers.
 
     Args:
         range_string: String containing page ranges
 
     Returns:
-        Sorted list of unique page numbers
+        PageRanges set of requested page numbers
     """
-    pages = set()
+    return PageRanges.parse(range_string, warn=logger.warning)
 
-    # Split by comma and process each part
-    parts = [part.strip() for part in range_string.split(',')]
 
-    for part in parts:
-        if not part:
-            continue
+def _number_runs(numbers):
+    """Collapse sorted integers into (start, stop) runs of consecutive values."""
+    runs = []
+    for n in numbers:
+        if runs and runs[-1][1] + 1 == n:
+            runs[-1][1] = n
+        else:
+            runs.append([n, n])
+    return [tuple(run) for run in runs]
+
+
+def select_printed_pages(requested_pages, printed_to_physical):
+    """
+    Pick the physical pages whose printed numbers were requested.
+
+    Each printed number in the mapping is tested against the requested
+    ranges, so the work depends on the number of pages in the PDF rather
+    than the width of the ranges.
+
+    Args:
+        requested_pages: PageRanges from parse_page_ranges()
+        printed_to_physical: Dictionary of printed page number -> physical indices
+
+    Returns:
+        Tuple (selected, missing): selected is a list of (printed number,
+        physical index) in printed order, missing is a PageRanges of
+        requested numbers with no page (open ends stop at the last printed
+        number in the PDF)
+    """
+    printed_numbers = sorted(printed_to_physical)
+    selected = [(printed_num, phys_idx)
+                for printed_num in printed_numbers if printed_num in requested_pages
+                for phys_idx in printed_to_physical[printed_num]]
+
+    upper = printed_numbers[-1] if printed_numbers else 0
+    missing = requested_pages.bounded(upper).without(_number_runs(printed_numbers))
+    return selected, missing
+
+
+def build_printed_to_physical(page_mapping):
+    """
+    Create the reverse mapping: printed number -> physical indices.
+
+    Args:
+        page_mapping: Dictionary of physical index -> printed page number
+
+    Returns:
+        Dictionary of printed page number -> list of physical indices in order
+    """
+    printed_to_physical = {}
+    for phys_idx, printed_num in sorted(page_mapping.items()):
+        if printed_num not in printed_to_physical:
+            printed_to_physical[printed_num] = []
+        printed_to_physical[printed_num].append(phys_idx)
+    return printed_to_physical
+
+
+def _locate_requested_pages(reader, input_path, requested_pages, header_band=None,
+                            band_edges=('top',), jobs=1, use_cache=True, cache_dir=None,
+                            cache_max_bytes=page_map_cache.DEFAULT_MAX_BYTES,
+                            lazy=False, use_page_labels=True, metrics=None, key=None,
+                            resume=False, checkpoint_every=DEFAULT_CHECKPOINT_EVERY,
+                            fingerprints=None, verbose=True):
+    """
+    Resolve printed page numbers for a set of requested pages.
+
+    With lazy, a cached mapping or valid /PageLabels are used when available
+    and otherwise only the pages needed to locate the requested numbers are
+    probed (see resolve_pages_lazily). Without it, or when the ranges are
+    wider than the PDF, the full mapping is resolved (see
+    resolve_page_mapping).
+
+    Args:
+        reader: PdfReader object opened from input_path
+        input_path: Path to the PDF file
+        requested_pages: PageRanges of requested printed numbers (only
+            needed with lazy)
+        verbose: Log progress information
+        (other arguments as for filter_pdf_pages)
+
+    Returns:
+        Tuple (printed_to_physical, detected): printed_to_physical maps
+        printed numbers to physical indices, or is None if no page has a
+        printed number (physical numbers should be used instead); detected
+        maps the physical indices whose number was read from the page (not
+        inferred) to that number
+    """
+    total_pages = len(reader.pages)
+    cached = None
+    if lazy and use_cache:
+        cached = load_cached_page_mapping(input_path, total_pages, header_band,
+                                          band_edges, cache_dir, key=key,
+                                          use_page_labels=use_page_labels)
+        _count(metrics, 'cache_hits' if cached is not None else 'cache_misses')
+        if cached is not None and verbose:
+            logger.info("Loaded page mapping from cache")
+    if lazy and cached is None and use_page_labels:
+        with _timed_stage(metrics, 'page_labels'):
+            labelled = page_label_mapping(reader, header_band, band_edges, verbose=verbose)
+        if labelled is not None:
+            cached = labelled, labelled
+
+    if (lazy and cached is None
+            and not (requested_pages.is_bounded() and requested_pages.count() <= total_pages)):
+        if verbose:
+            logger.info("Requested ranges are wider than the PDF, scanning every page instead of lazily")
+        lazy = False
+
+    if lazy and cached is None:
+        # Probe only the pages needed to find the requested numbers
+        printed_to_physical, probed = resolve_pages_lazily(
+            reader, list(requested_pages), header_band=header_band,
+            band_edges=band_edges, verbose=verbose, metrics=metrics
+        )
+        if not any(probed.values()) and len(probed) == total_pages:
+            logger.warning("Warning: No page numbers detected on any pages! "
+                           "Falling back to physical page numbers...")
+            return None, {}
+        return printed_to_physical, {physical_idx: printed_num
+                                     for physical_idx, printed_num in probed.items() if printed_num}
+
+    # Detect printed page numbers and interpolate missing ones
+    if cached is not None:
+        detected, page_mapping = cached
+    else:
+        detected, page_mapping = resolve_page_mapping(
+            reader, input_path, verbose=verbose, header_band=header_band,
+            band_edges=band_edges, jobs=jobs, use_cache=use_cache, cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes, use_page_labels=use_page_labels, metrics=metrics,
+            key=key, resume=resume, checkpoint_every=checkpoint_every, fingerprints=fingerprints
+        )
+    if not detected:
+        logger.warning("Warning: No page numbers detected on any pages! "
+                       "Falling back to physical page numbers...")
+        return None, {}
+    return build_printed_to_physical(page_mapping), detected
+
+
+def _page_origin(physical_idx, detected, detected_indices):
+    """How a page's printed number was found: read, or inferred relative to the read ones."""
+    if physical_idx in detected:
+        return 'detected'
+    if not detected_indices or physical_idx < detected_indices[0]:
+        return 'backfilled'
+    if physical_idx > detected_indices[-1]:
+        return 'forward_filled'
+    return 'interpolated'
+
+
+def plan_selection(requested_pages, printed_to_physical, detected, total_pages):
+    """
+    Describe the pages a page range selects, in output order.
+
+    Args:
+        requested_pages: PageRanges from parse_page_ranges()
+        printed_to_physical: Dictionary of printed page number -> physical
+            indices, or None to select by physical position
+        detected: Dictionary of physical index -> printed number read from
+            the page (see _locate_requested_pages)
+        total_pages: Number of physical pages in the PDF
+
+    Returns:
+        Dictionary with pages (count), origins (count per origin),
+        missing_pages (range string of requested numbers with no page),
+        missing_count and entries, a list of {printed, physical_index,
+        origin} dictionaries. origin is 'detected', 'interpolated',
+        'backfilled' (before the first detected page), 'forward_filled'
+        (after the last one) or 'physical'.
+    """
+    if printed_to_physical is None:
+        within = requested_pages.bounded(total_pages)
+        entries = [{'printed': None, 'physical_index': page_num - 1, 'origin': 'physical'}
+                   for page_num in within.iter_within(1, total_pages)]
+        missing = within.without([(1, total_pages)])
+    else:
+        selected, missing = select_printed_pages(requested_pages, printed_to_physical)
+        detected_indices = sorted(detected)
+        entries = [{'printed': printed_num, 'physical_index': phys_idx,
+                    'origin': _page_origin(phys_idx, detected, detected_indices)}
+                   for printed_num, phys_idx in selected]
+
+    origins = {}
+    for entry in entries:
+        origins[entry['origin']] = origins.get(entry['origin'], 0) + 1
+    return {
+        'pages': len(entries),
+        'origins': origins,
+        'missing_pages': str(missing),
+        'missing_count': missing.count(),
+        'entries': entries,
+    }
+
+
+def plan_pdf_pages(input_path, page_ranges, use_printed_numbers=True, header_band=None,
+                   band_edges=('top',), jobs=1, use_cache=True, cache_dir=None,
+                   cache_max_bytes=page_map_cache.DEFAULT_MAX_BYTES, lazy=False,
+                   use_page_labels=True, metrics=None, fingerprints=None, verbose=False):
+    """
+    Work out which pages a filter or split run would write, without writing.
+
+    Page numbers are resolved exactly as filter_pdf_pages and split_pdf_pages
+    resolve them (cache, /PageLabels, lazy probing, fingerprints), so a
+    scheduler can size jobs by their real page counts. No output or
+    checkpoint is written; a page mapping resolved here is stored in the
+    page map cache, so the run that follows does not detect it again.
+
+    Args:
+        input_path: Path to input PDF file
+        page_ranges: Page range string, or dictionary of output name -> page
+            range string to plan several outputs from one detection pass (as
+            for split_pdf_pages; lazy is not used then)
+        verbose: Log progress information
+        (other arguments as for filter_pdf_pages)
+
+    Returns:
+        Dictionary with input, total_pages, numbering ('printed' or
+        'physical'), pages_scanned (pages whose text was extracted),
+        cache_hit, and either the fields of plan_selection() plus ranges or,
+        for a dictionary of ranges, outputs: a list of such dictionaries
+        each with its output name. An output whose ranges hold no valid
+        page has an error instead.
+
+    Raises:
+        ValueError: If page_ranges is a string with no valid pages
+    """
+    splits = page_ranges if isinstance(page_ranges, dict) else None
+    requested = {name: parse_page_ranges(ranges)
+                 for name, ranges in (splits if splits is not None else {None: page_ranges}).items()}
+    if splits is None and not requested[None]:
+        raise ValueError(f"No valid pages in '{page_ranges}'")
+
+    metrics = {} if metrics is None else metrics
+    counters = metrics.setdefault('counters', {})
+    scanned_before = counters.get('pages_scanned', 0)
+    hits_before = counters.get('cache_hits', 0)
+
+    with _timed_stage(metrics, 'open'):
+        reader = PdfReader(input_path)
+        total_pages = len(reader.pages)
+
+    printed_to_physical, detected = None, {}
+    if use_printed_numbers:
+        printed_to_physical, detected = _locate_requested_pages(
+            reader, input_path, requested.get(None), header_band=header_band, band_edges=band_edges,
+            jobs=jobs, use_cache=use_cache, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes,
+            lazy=lazy and splits is None, use_page_labels=use_page_labels, metrics=metrics,
+            checkpoint_every=0, fingerprints=fingerprints, verbose=verbose
+        )
+
+    plan = {
+        'input': str(input_path),
+        'total_pages': total_pages,
+        'numbering': 'physical' if printed_to_physical is None else 'printed',
+        'pages_scanned': counters.get('pages_scanned', 0) - scanned_before,
+        'cache_hit': counters.get('cache_hits', 0) > hits_before,
+    }
+    with _timed_stage(metrics, 'select'):
+        if splits is None:
+            plan['ranges'] = page_ranges
+            plan.update(plan_selection(requested[None], printed_to_physical, detected, total_pages))
+            return plan
+
+        plan['outputs'] = []
+        for name, requested_pages in requested.items():
+            output = {'output': name, 'ranges': splits[name]}
+            if requested_pages:
+                output.update(plan_selection(requested_pages, printed_to_physical,
+                                             detected, total_pages))
+            else:
+                output.update(pages=0, error=f"No valid pages in '{splits[name]}'")
+            plan['outputs'].append(output)
+    return plan
+
+
+def describe_plan(plan):
+    """One-line summary of a plan_selection() result, e.g. '42 pages (40 detected, 2 interpolated)'."""
+    if 'error' in plan:
+        return plan['error']
+    origins = ', '.join(f"{count} {origin.replace('_', ' ')}"
+                        for origin, count in sorted(plan['origins'].items()))
+    line = f"{plan['pages']} pages" + (f" ({origins})" if origins else '')
+    if plan['missing_pages']:
+        line += f", missing {plan['missing_pages']}"
+    return line
+
+
+def _write_pdf(writer, output_path, optimize=False):
+    """
+    Write a PdfWriter to output_path atomically, so a killed write leaves no partial file.
+
+    Args:
+        writer: PdfWriter object
+        output_path: Path to the output PDF
+        optimize: Shrink the output with pdf_optimize.optimize_writer() first
+
+    Returns:
+        Tuple of (bytes written, bytes a plain write would have produced);
+        the second is None unless optimize is set
+    """
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    size_before = None
+    if optimize:
+        size_before = pdf_optimize.written_size(writer)
+        pdf_optimize.optimize_writer(writer)
+    try:
+        with open(tmp_path, 'wb') as output_file:
+            writer.write(output_file)
+        size = tmp_path.stat().st_size
+        os.replace(tmp_path, output_path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return size, size_before
 
-        # Check if it's a range (e.g., "5-10")
-        if '-' in part:
-            try:
-                start, end = part.split('-', 1)
-                start = int(start.strip())
-                end = int(end.strip())
 
-                if start > end:
-                    print(f"Warning: Invalid range {start}-{end}, skipping")
-                    continue
+def describe_size(size, size_before):
+    """'1.2 MB', or '1.4 MB -> 1.2 MB, -9.5%' for an optimised write."""
+    if size_before is None:
+        return pdf_optimize.format_size(size)
+    saved = 100.0 * (size_before - size) / size_before if size_before else 0.0
+    return (f"{pdf_optimize.format_size(size_before)} -> {pdf_optimize.format_size(size)}, "
+            f"-{saved:.1f}%")
 
-                pages.update(range(start, end + 1))
-            except ValueError:
-                print(f"Warning: Invalid range format '{part}', skipping")
+
+def _write_split(reader, physical_indices, output_path, optimize=False):
+    """
+    Build one output from physical pages of reader and write it.
+
+    The PdfWriter only lives for this call, so its pages are released as
+    soon as the output is written.
+
+    Returns:
+        Tuple (size, size_before) as returned by _write_pdf()
+    """
+    writer = PdfWriter()
+    for phys_idx in physical_indices:
+        writer.add_page(reader.pages[phys_idx])
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    return _write_pdf(writer, output_path, optimize)
+
+
+def write_splits(reader, printed_to_physical, splits, verbose=True, metrics=None,
+                 written=None, on_written=None, optimize=False):
+    """
+    Write several output PDFs from one already-resolved source.
+
+    The page mapping of the whole source has already been resolved, so every
+    split is planned up front from it. Splits are then written one after
+    another, ordered by their last physical page, with a fresh PdfWriter for
+    each, so only one output is held in memory at a time. Each output is
+    written to a temporary file and renamed into place.
+
+    Args:
+        reader: PdfReader object for the source PDF
+        printed_to_physical: Dictionary of printed page number -> physical indices
+        splits: List of (page range string, output path) tuples
+        verbose: Log progress information
+        metrics: Optional dict that receives the 'write' stage time and the
+            pages_written counter
+        written: Optional dictionary of output path -> ranges already written
+            by an interrupted run; those outputs are kept if they still exist
+        on_written: Optional callable(output path, ranges) called after each
+            output is written
+        optimize: Shrink each output with pdf_optimize before writing it
+
+    Returns:
+        List of result dictionaries (ranges, output, status, pages,
+        missing_pages as a range string, error, seconds spent writing that
+        output, and for written outputs bytes and bytes_before, the
+        unoptimised size or None) in the same order as splits
+    """
+    written = written or {}
+    results = []
+    plans = []
+    for ranges, output_path in splits:
+        result = {'ranges': ranges, 'output': str(output_path), 'status': 'error',
+                  'pages': 0, 'missing_pages': '', 'error': None, 'seconds': 0.0}
+        results.append(result)
+
+        requested_pages = parse_page_ranges(ranges)
+        if not requested_pages:
+            result['error'] = f"No valid pages in '{ranges}'"
+            continue
+
+        selected, missing = select_printed_pages(requested_pages, printed_to_physical)
+        physical_indices = [phys_idx for _, phys_idx in selected]
+        result['missing_pages'] = str(missing)
+
+        if not physical_indices:
+            result['status'] = 'empty'
+            result['error'] = "No requested pages were found"
+            continue
+        plans.append((max(physical_indices), physical_indices, result))
+
+    log_pages = verbose and logger.isEnabledFor(logging.DEBUG)
+    with _timed_stage(metrics, 'write'):
+        for _, physical_indices, result in sorted(plans, key=lambda plan: plan[0]):
+            if written.get(result['output']) == result['ranges'] and Path(result['output']).exists():
+                result['status'] = 'ok'
+                result['pages'] = len(physical_indices)
+                result['resumed'] = True
+                if verbose:
+                    logger.info(f"Kept '{result['output']}' from the interrupted run")
                 continue
-        else:
-            # Single page number
+            write_start = time.perf_counter()
             try:
-                pages.add(int(part))
-            except ValueError:
-                print(f"Warning: Invalid page number '{part}', skipping")
-                continue
+                size, size_before = _write_split(reader, physical_indices, result['output'], optimize)
+                result['bytes'] = size
+                result['bytes_before'] = size_before
+                result['status'] = 'ok'
+                result['pages'] = len(physical_indices)
+                if on_written is not None:
+                    on_written(result['output'], result['ranges'])
+            except Exception as e:
+                result['error'] = f"{type(e).__name__}: {e}"
+            result['seconds'] = time.perf_counter() - write_start
+
+            if result['status'] != 'ok':
+                if verbose:
+                    logger.error(f"Error: Could not write '{result['output']}': {result['error']}")
+            elif verbose:
+                logger.info(f"Wrote '{result['output']}' with {result['pages']} pages "
+                            f"({describe_size(result['bytes'], result['bytes_before'])})")
+                if log_pages:
+                    pages = ', '.join(str(phys_idx + 1) for phys_idx in physical_indices)
+                    logger.debug(f"  physical pages {pages}")
+    _count(metrics, 'pages_written', sum(result['pages'] for result in results))
+    _count(metrics, 'bytes_written', sum(result.get('bytes', 0) for result in results))
+    if optimize:
+        _count(metrics, 'bytes_before_optimize',
+               sum(result.get('bytes_before') or 0 for result in results))
+
+    if verbose:
+        planned = {id(plan[2]) for plan in plans}
+        for result in results:
+            if result['missing_pages']:
+                logger.warning(f"Warning: '{result['output']}' is missing printed pages {result['missing_pages']}")
+            if id(result) not in planned:
+                logger.warning(f"Warning: '{result['output']}' was not written: {result['error']}")
+
+    return results
+
+
+def output_journal(key, cache_dir):
+    """
+    Outputs recorded in a checkpoint, and a callable recording another.
+
+    Args:
+        key: Checkpoint key from start_checkpoints()
+        cache_dir: Page map cache directory
+
+    Returns:
+        Tuple (dictionary of output path -> ranges, callable(output path, ranges))
+    """
+    checkpoint = page_map_cache.load_checkpoint(key, cache_dir) or {}
+
+    def record(output_path, ranges):
+        state = page_map_cache.load_checkpoint(key, cache_dir) or {}
+        state.setdefault('written', {})[str(output_path)] = ranges
+        try:
+            page_map_cache.store_checkpoint(key, state, cache_dir)
+        except OSError as e:
+            logger.warning(f"Warning: Could not write checkpoint: {e}")
+
+    return dict(checkpoint.get('written', {})), record
+
+
+def start_checkpoints(input_path, header_band, band_edges, use_page_labels, use_cache,
+                      cache_dir, resume, checkpoint_every):
+    """
+    Cache key under which a run checkpoints, or None if it does not.
+
+    A run that is not resuming discards any checkpoint left by an earlier one.
+
+    Args:
+        input_path: Path to the input PDF
+        header_band, band_edges, use_page_labels: Detection options, which
+            are part of the key (see resolve_page_mapping)
+        use_cache: Whether the run uses the page map cache
+        cache_dir: Page map cache directory
+        resume: Keep the checkpoint of an interrupted run
+        checkpoint_every: Pages detected between checkpoints (0 disables them)
+
+    Returns:
+        Cache key to pass to resolve_page_mapping() and output_journal(), or None
+    """
+    if not (use_cache and checkpoint_every):
+        return None
+    key = page_map_cache_key(input_path, header_band, band_edges, use_page_labels)
+    if not resume:
+        page_map_cache.clear_checkpoint(key, cache_dir)
+    return key
+
+
+def split_pdf_pages(input_path, splits, output_dir=None, header_band=None, band_edges=('top',),
+                    jobs=1, use_cache=True, cache_dir=None, cache_max_bytes=page_map_cache.DEFAULT_MAX_BYTES,
+                    use_page_labels=True, metrics=None, resume=False, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, optimize=False,
+                    fingerprints=None):
+    """
+    Cut one PDF into several output PDFs with a single read and detection pass.
+
+    Args:
+        input_path: Path to input PDF file
+        splits: Dictionary of output name -> printed page range string; names
+            without a suffix get '.pdf'
+        output_dir: Directory for the outputs (default: current directory)
+        header_band: Header/footer band height for detection (see detect_page_numbers)
+        band_edges: Which strips to scan in band mode ('top', 'bottom')
+        jobs: Number of worker processes used for page number detection
+        use_cache: Reuse page mappings cached from earlier runs on the same PDF
+        cache_dir: Page map cache directory (default: page_map_cache.DEFAULT_CACHE_DIR)
+        cache_max_bytes: Size limit for the page map cache directory, enforced
+            whenever a page map is stored
+        use_page_labels: Take printed page numbers from /PageLabels when valid
+        metrics: Optional dict collecting stage timings and counters
+        resume: Continue an interrupted run: detection restarts from its
+            checkpoint and outputs it already wrote are kept
+        checkpoint_every: Pages detected between checkpoints (0 disables
+            checkpoints; they also need the cache)
+        optimize: Shrink each output with pdf_optimize before writing it
+        fingerprints: Optional page fingerprint index path (see resolve_page_mapping)
+
+    Returns:
+        List of per-output result dictionaries (see write_splits), or None if
+        the input could not be read or had no detectable page numbers
+    """
+    output_dir = Path(output_dir or '.')
+    split_list = []
+    for name, ranges in splits.items():
+        output_path = output_dir / name
+        if not output_path.suffix:
+            output_path = output_path.with_suffix('.pdf')
+        split_list.append((ranges, output_path))
+
+    key = None
+    try:
+        key = start_checkpoints(input_path, header_band, band_edges, use_page_labels,
+                                 use_cache, cache_dir, resume, checkpoint_every)
+        with _timed_stage(metrics, 'open'):
+            reader = PdfReader(input_path)
+            total_pages = len(reader.pages)
+        logger.info(f"Input PDF has {total_pages} physical pages, writing {len(split_list)} outputs")
+
+        detected, page_mapping = resolve_page_mapping(
+            reader, input_path, verbose=True, header_band=header_band, band_edges=band_edges,
+            jobs=jobs, use_cache=use_cache, cache_dir=cache_dir, cache_max_bytes=cache_max_bytes,
+            use_page_labels=use_page_labels, metrics=metrics, key=key, resume=resume,
+            checkpoint_every=checkpoint_every, fingerprints=fingerprints
+        )
+        if not detected:
+            logger.error("Error: No page numbers detected on any pages")
+            return None
+
+        logger.info("Writing split outputs...")
+        written, record = output_journal(key, cache_dir) if key else ({}, None)
+        results = write_splits(reader, build_printed_to_physical(page_mapping), split_list,
+                               metrics=metrics, written=written if resume else None,
+                               on_written=record, optimize=optimize)
+    except FileNotFoundError:
+        logger.error(f"Error: Input file '{input_path}' not found")
+        return None
+    except Exception as e:
+        logger.exception(f"Error processing PDF: {e}")
+        if key is not None:
+            logger.error("Progress was checkpointed; rerun with --resume to continue")
+        return None
+
+    written = sum(1 for result in results if result['status'] == 'ok')
+    logger.info(f"Created {written}/{len(results)} output PDFs in '{output_dir}'")
+    if key is not None and written == len(results):
+        page_map_cache.clear_checkpoint(key, cache_dir)
+    return results
+
+
+def load_split_spec(spec_path):
+    """
+    Read a split specification file.
+
+    JSON files hold an object of output name -> page ranges; CSV files have
+    name,ranges columns (e.g. one row per element of an SDS volume).
+
+    Args:
+        spec_path: Path to a .json or .csv file
+
+    Returns:
+        Dictionary of output name -> page range string
+    """
+    spec_path = Path(spec_path)
+    if spec_path.suffix.lower() == '.json':
+        with open(spec_path, 'r', encoding='utf-8') as f:
+            return {str(name): str(ranges) for name, ranges in json.load(f).items()}
 
-    return sorted(list(pages))
+    with open(spec_path, 'r', newline='', encoding='utf-8') as f:
+        return {row['name'].strip(): row['ranges'].strip() for row in csv.DictReader(f)}
 
 
-def filter_pdf_pages(input_path, output_path, page_ranges, use_printed_numbers=True):
+def filter_pdf_pages(input_path, output_path, page_ranges, use_printed_numbers=True,
+                     header_band=None, band_edges=('top',), jobs=1, use_cache=True,
+                     cache_dir=None, cache_max_bytes=page_map_cache.DEFAULT_MAX_BYTES, lazy=False,
+                     use_page_labels=True, metrics=None,
+                     resume=False, checkpoint_every=DEFAULT_CHECKPOINT_EVERY, optimize=False,
+                     fingerprints=None):
     """
     Extract specific pages from a PDF and create a new PDF.
 
@@ -270,100 +1756,348 @@ def filter_pdf_pages(input_path, output_path, page_ranges, use_printed_numbers=T
         output_path: Path to output PDF file
         page_ranges: String of page ranges (e.g., "1-3, 5, 7-10")
         use_printed_numbers: If True, use printed page numbers; if False, use physical position
+        header_band: If set, detect page numbers from header/footer strips of
+            this height (fraction of page height) before full-page extraction
+        band_edges: Which strips to scan in band mode ('top', 'bottom')
+        jobs: Number of worker processes used for page number detection
+        use_cache: Reuse page mappings cached from earlier runs on the same PDF
+        cache_dir: Page map cache directory (default: page_map_cache.DEFAULT_CACHE_DIR)
+        cache_max_bytes: Size limit for the page map cache directory, enforced
+            whenever a page map is stored
+        lazy: Only extract text from the pages needed to locate the requested
+            page numbers (a cached full mapping is still used when available)
+        use_page_labels: Take printed page numbers from the PDF's /PageLabels
+            when they agree with a sample of detected numbers
+        metrics: Optional dict collecting per-stage timings ('open', 'detect',
+            'select', 'write', ...) and counters (pages_scanned,
+            pages_detected, pages_interpolated, extraction_errors, ...)
+        resume: Continue an interrupted run's detection from its checkpoint
+        checkpoint_every: Pages detected between checkpoints (0 disables
+            checkpoints; they also need the cache)
+        optimize: Merge duplicated objects, prune unused resources and compress
+            unfiltered streams before writing, logging the size saved
+        fingerprints: Optional page fingerprint index path: pages identical to
+            pages of other indexed volumes take their printed numbers instead
+            of being scanned (see resolve_page_mapping)
     """
     # Parse page ranges
     requested_pages = parse_page_ranges(page_ranges)
 
     if not requested_pages:
-        print("Error: No valid pages specified")
+        logger.error("Error: No valid pages specified")
         return False
 
-    print(f"Requested page numbers: {requested_pages}")
+    logger.info(f"Requested page numbers: {requested_pages}")
 
     # Read input PDF
+    key = None
     try:
-        reader = PdfReader(input_path)
-        total_pages = len(reader.pages)
-        print(f"Input PDF has {total_pages} physical pages\n")
-
         if use_printed_numbers:
-            # Detect printed page numbers
-            page_mapping = detect_page_numbers(reader, verbose=True)
-
-            if not page_mapping:
-                print("\nWarning: No page numbers detected on any pages!")
-                print("Falling back to physical page numbers...")
-                use_printed_numbers = False
-            else:
-                # Interpolate missing page numbers
-                page_mapping = interpolate_missing_pages(page_mapping, total_pages, verbose=True)
+            key = start_checkpoints(input_path, header_band, band_edges, use_page_labels,
+                                     use_cache, cache_dir, resume, checkpoint_every)
+        with _timed_stage(metrics, 'open'):
+            reader = PdfReader(input_path)
+            total_pages = len(reader.pages)
+        logger.info(f"Input PDF has {total_pages} physical pages")
+
+        printed_to_physical = None
+        if use_printed_numbers:
+            printed_to_physical, _ = _locate_requested_pages(
+                reader, input_path, requested_pages, header_band=header_band,
+                band_edges=band_edges, jobs=jobs, use_cache=use_cache, cache_dir=cache_dir,
+                cache_max_bytes=cache_max_bytes, lazy=lazy, use_page_labels=use_page_labels, metrics=metrics, key=key,
+                resume=resume, checkpoint_every=checkpoint_every, fingerprints=fingerprints
+            )
+            use_printed_numbers = printed_to_physical is not None
 
         # Create output PDF
         writer = PdfWriter()
         pages_added = []
+        log_pages = logger.isEnabledFor(logging.DEBUG)
+
+        with _timed_stage(metrics, 'select'):
+            if use_printed_numbers and printed_to_physical is not None:
+                # Filter by printed page numbers
+                logger.info("Filtering by printed page numbers...")
+
+                # Add pages with matching printed numbers
+                selected, missing = select_printed_pages(requested_pages, printed_to_physical)
+                for printed_num, phys_idx in selected:
+                    writer.add_page(reader.pages[phys_idx])
+                    pages_added.append(printed_num)
+                    if log_pages:
+                        logger.debug(f"Added page with printed number {printed_num} "
+                                     f"(physical page {phys_idx + 1})")
+                if missing:
+                    logger.warning(f"Warning: No page found with printed number(s) {missing}")
+            else:
+                # Filter by physical page numbers
+                logger.info("Filtering by physical page numbers...")
 
-        if use_printed_numbers and page_mapping:
-            # Filter by printed page numbers
-            print("Filtering by printed page numbers...")
-
-            # Create reverse mapping: printed number -> physical indices
-            printed_to_physical = {}
-            for phys_idx, printed_num in page_mapping.items():
-                if printed_num not in printed_to_physical:
-                    printed_to_physical[printed_num] = []
-                printed_to_physical[printed_num].append(phys_idx)
-
-            # Add pages with matching printed numbers
-            for printed_num in requested_pages:
-                if printed_num in printed_to_physical:
-                    for phys_idx in printed_to_physical[printed_num]:
-                        writer.add_page(reader.pages[phys_idx])
-                        pages_added.append(printed_num)
-                        print(f"Added page with printed number {printed_num} (physical page {phys_idx + 1})")
-                else:
-                    print(f"Warning: No page found with printed number {printed_num}")
-        else:
-            # Filter by physical page numbers
-            print("Filtering by physical page numbers...")
-
-            for page_num in requested_pages:
-                if 1 <= page_num <= total_pages:
+                for page_num in requested_pages.bounded(total_pages).iter_within(1, total_pages):
                     writer.add_page(reader.pages[page_num - 1])
                     pages_added.append(page_num)
-                    print(f"Added physical page {page_num}")
-                else:
-                    print(f"Warning: Physical page {page_num} is out of range (1-{total_pages})")
+                    if log_pages:
+                        logger.debug(f"Added physical page {page_num}")
+                out_of_range = requested_pages.bounded(total_pages).without([(1, total_pages)])
+                if out_of_range:
+                    logger.warning(f"Warning: Physical page(s) {out_of_range} out of range (1-{total_pages})")
 
         if not pages_added:
-            print("\nError: No pages were added to output PDF")
+            logger.error("Error: No pages were added to output PDF")
             return False
 
         # Write output file
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
-
-        print(f"\nSuccess! Created '{output_path}' with {len(pages_added)} pages")
+        with _timed_stage(metrics, 'write'):
+            size, size_before = _write_pdf(writer, output_path, optimize)
+        _count(metrics, 'pages_written', len(pages_added))
+        _count(metrics, 'bytes_written', size)
+        if size_before is not None:
+            _count(metrics, 'bytes_before_optimize', size_before)
+            logger.info(f"Optimised output: {describe_size(size, size_before)}")
+        if key is not None:
+            page_map_cache.clear_checkpoint(key, cache_dir)
+
+        logger.info(f"Success! Created '{output_path}' with {len(pages_added)} pages")
         return True
 
     except FileNotFoundError:
-        print(f"Error: Input file '{input_path}' not found")
+        logger.error(f"Error: Input file '{input_path}' not found")
         return False
     except Exception as e:
-        print(f"Error processing PDF: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error processing PDF: {e}")
+        if key is not None:
+            logger.error("Progress was checkpointed; rerun with --resume to continue")
         return False
 
 
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Extract pages from a PDF by the page numbers printed on them."
+    )
+    parser.add_argument('input', nargs='?', help="Input PDF path")
+    parser.add_argument('page_ranges', nargs='?', help="Printed page ranges, e.g. '2-5, 17-20'")
+    parser.add_argument('output', nargs='?', help="Output PDF path")
+    parser.add_argument('--header-band', type=float, nargs='?', const=DEFAULT_HEADER_BAND,
+                        default=None, metavar='FRACTION',
+                        help="Only read text in a header/footer strip of this height "
+                             f"(default {DEFAULT_HEADER_BAND}), falling back to the full page")
+    parser.add_argument('--band-edge', choices=['top', 'bottom', 'both'], default='top',
+                        help="Which strip to scan in header-band mode (default: top)")
+    parser.add_argument('--jobs', '-j', type=int, default=1, metavar='N',
+                        help="Detect page numbers with N worker processes (default: 1)")
+    parser.add_argument('--split', action='append', default=[], metavar='NAME=RANGES',
+                        help="Write printed pages RANGES to NAME.pdf; repeat to cut several "
+                             "outputs from one read of the input")
+    parser.add_argument('--split-file', default=None, metavar='PATH',
+                        help="JSON object or name,ranges CSV of outputs to split into")
+    parser.add_argument('--output-dir', default=None,
+                        help="Directory for --split outputs (default: current directory)")
+    parser.add_argument('--compound', default=None, metavar='QUERY',
+                        help="Keep the pages covering a compound, CAS number or words, looked up "
+                             "in the page index instead of giving page ranges")
+    parser.add_argument('--index', default=None, metavar='PATH',
+                        help="Page index for --compound (default: sds_page_index.db, "
+                             "see page_index.py)")
+    parser.add_argument('--lazy', action='store_true',
+                        help="Only scan the pages needed to locate the requested numbers")
+    parser.add_argument('--no-page-labels', action='store_true',
+                        help="Ignore the PDF's /PageLabels and always detect numbers from text")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Do not read or write the page map cache")
+    parser.add_argument('--cache-dir', default=None,
+                        help=f"Page map cache directory (default: {page_map_cache.DEFAULT_CACHE_DIR})")
+    parser.add_argument('--cache-max-mb', type=float, default=None, metavar='MB',
+                        help="Evict cached page maps beyond this total size")
+    parser.add_argument('--clear-cache', action='store_true',
+                        help="Invalidate cached page maps (only the input PDF's, if given) and exit")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run from its checkpoint instead of starting over")
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY, metavar='N',
+                        help="Checkpoint detection every N pages; 0 disables "
+                             f"(default: {DEFAULT_CHECKPOINT_EVERY}, needs the cache)")
+    parser.add_argument('--fingerprints', default=None, metavar='PATH',
+                        help="Page fingerprint index: take the printed numbers of pages identical "
+                             "to pages of other volumes instead of scanning them, and record this "
+                             "volume's pages (see page_fingerprints.py)")
+    parser.add_argument('--optimize', action='store_true',
+                        help="Merge duplicated objects, prune unused resources and compress "
+                             "streams in the output, reporting the size before and after")
+    parser.add_argument('--plan-json', default=None, metavar='PATH',
+                        help="Write the resolved printed -> physical page plan (how each number "
+                             "was found, missing pages) to PATH as JSON instead of writing PDFs")
+    parser.add_argument('--compare-extraction', action='store_true',
+                        help="Time full-page against header-band detection and exit")
+    parser.add_argument('--watch', default=None, metavar='DIR',
+                        help="Run as a daemon filtering every PDF dropped into DIR with the given "
+                             "ranges (and running dropped manifests) into --output-dir")
+    parser.add_argument('--socket', default=None, metavar='PATH',
+                        help="Run as a daemon accepting JSON jobs on a Unix socket")
+    parser.add_argument('--poll-interval', type=float, default=1.0, metavar='SECONDS',
+                        help="Seconds between scans of the --watch directory (default: 1)")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument('--verbose', '-v', action='store_true',
+                           help="Log one line per page scanned, inferred and added")
+    verbosity.add_argument('--quiet', '-q', action='store_true',
+                           help="Only log warnings and errors")
+    parser.add_argument('--metrics-json', default=None, metavar='PATH',
+                        help="Write per-stage timings and page counters to PATH as JSON")
+    # Intermixed, so positionals may follow options: INPUT --compound QUERY OUTPUT
+    return parser.parse_intermixed_args(argv)
+
+
+def write_metrics(path, metrics, **fields):
+    """
+    Write collected metrics as JSON.
+
+    Args:
+        path: Output JSON path
+        metrics: Dict filled in by the metrics= parameter of the library functions
+        **fields: Extra top-level fields (input path, options, success, ...)
+    """
+    document = dict(fields)
+    document['stages'] = metrics.get('stages', {})
+    document['counters'] = metrics.get('counters', {})
+    document['total_seconds'] = sum(document['stages'].values())
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def cache_max_bytes_from_args(args):
+    """Page map cache size limit from --cache-max-mb, or the default."""
+    if args.cache_max_mb is None:
+        return page_map_cache.DEFAULT_MAX_BYTES
+    return int(args.cache_max_mb * 1024 * 1024)
+
+
+def write_plan(path, plan):
+    """
+    Write a page plan from plan_pdf_pages() as JSON.
+
+    Args:
+        path: Output JSON path
+        plan: Plan dictionary
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=2)
+        f.write('\n')
+
+
+def _run_plan(args, input_path, page_ranges, band_edges, metrics, options,
+              use_printed_numbers=True):
+    """Plan a filter or split run for --plan-json, write the plan and exit."""
+    try:
+        plan = plan_pdf_pages(input_path, page_ranges, use_printed_numbers=use_printed_numbers,
+                              header_band=args.header_band,
+                              band_edges=band_edges, jobs=args.jobs, use_cache=not args.no_cache,
+                              cache_dir=args.cache_dir,
+                              cache_max_bytes=cache_max_bytes_from_args(args), lazy=args.lazy,
+                              use_page_labels=not args.no_page_labels, metrics=metrics,
+                              fingerprints=args.fingerprints, verbose=True)
+    except Exception as e:
+        logger.error(f"Error: Could not plan '{input_path}': {e}")
+        sys.exit(1)
+
+    for output in plan.get('outputs', [plan]):
+        name = f"'{output['output']}': " if 'output' in output else ''
+        print(f"{name}{describe_plan(output)}")
+    write_plan(args.plan_json, plan)
+    print(f"Plan written to '{args.plan_json}' ({plan['pages_scanned']} pages scanned)")
+
+    ok = all('error' not in output and output['pages'] for output in plan.get('outputs', [plan]))
+    if metrics is not None:
+        write_metrics(args.metrics_json, metrics, input=str(input_path), mode='plan',
+                      options=options, success=ok)
+    sys.exit(0 if ok else 1)
+
+
 def main():
     """Main function to run the PDF page filter."""
+    args = parse_args()
+    if args.jobs < 1:
+        print("Error: --jobs must be at least 1")
+        sys.exit(1)
+    # Preemption sends SIGTERM: exit through the normal unwinding so the
+    # current detection progress is checkpointed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    band_edges = ('top', 'bottom') if args.band_edge == 'both' else (args.band_edge,)
+
+    level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(format='%(message)s', stream=sys.stdout)
+    logger.setLevel(level)
+    metrics = {} if args.metrics_json else None
+    options = {'header_band': args.header_band, 'band_edges': list(band_edges), 'jobs': args.jobs,
+               'lazy': args.lazy, 'cache': not args.no_cache,
+               'page_labels': not args.no_page_labels, 'optimize': args.optimize,
+               'fingerprints': args.fingerprints}
+
     print("=" * 60)
     print("PDF Page Filter (Smart Page Number Detection)")
     print("=" * 60)
 
+    if args.clear_cache:
+        if args.input and not Path(args.input).exists():
+            print(f"Error: File '{args.input}' does not exist")
+            sys.exit(1)
+        digest = page_map_cache.file_digest(args.input) if args.input else None
+        removed = page_map_cache.clear_page_maps(args.cache_dir, digest)
+        print(f"Removed {removed} cached page map(s)")
+        sys.exit(0)
+
+    if args.cache_max_mb is not None:
+        removed = page_map_cache.evict_page_maps(args.cache_dir, cache_max_bytes_from_args(args))
+        if removed:
+            print(f"Evicted {removed} cached page map(s)")
+
+    if args.watch or args.socket:
+        import pdf_watch
+
+        # In daemon mode the only positional is the page ranges for dropped PDFs
+        page_ranges = args.input
+        if args.page_ranges or args.output:
+            print("Error: Daemon mode takes only page ranges (for --watch), e.g. --watch inbox/ '17-250'")
+            sys.exit(1)
+        if args.watch and not Path(args.watch).is_dir():
+            print(f"Error: Watch directory '{args.watch}' does not exist")
+            sys.exit(1)
+        if args.watch and args.output_dir:
+            try:
+                pdf_watch.check_output_dir(args.watch, args.output_dir)
+            except ValueError as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+        if args.socket:
+            try:
+                pdf_watch.check_socket_path(args.socket)
+            except (ValueError, OSError) as e:
+                print(f"Error: {e}")
+                sys.exit(1)
+        if args.watch and page_ranges is None:
+            logger.warning("Warning: No page ranges given; only manifests dropped into "
+                           f"'{args.watch}' will be run")
+        # Stop on SIGTERM the way Ctrl-C does, so the queue drains and the
+        # latency summary (and --metrics-json) is still written
+        def interrupt(signum, frame):
+            raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM, interrupt)
+        summary = pdf_watch.run(
+            options={'header_band': args.header_band, 'band_edges': band_edges,
+                     'use_cache': not args.no_cache, 'cache_dir': args.cache_dir,
+                     'cache_max_bytes': cache_max_bytes_from_args(args),
+                     'use_page_labels': not args.no_page_labels, 'optimize': args.optimize,
+                     'fingerprints': args.fingerprints},
+            watch_dir=args.watch, socket_path=args.socket, output_dir=args.output_dir,
+            page_ranges=page_ranges, interval=args.poll_interval)
+        if metrics is not None:
+            write_metrics(args.metrics_json, metrics, mode='daemon', options=options,
+                          success=summary['failed'] == 0, latency=summary)
+        sys.exit(0 if summary['failed'] == 0 else 1)
+
     # Get input PDF path
-    if len(sys.argv) > 1:
-        input_path = sys.argv[1]
+    if args.input:
+        input_path = args.input
     else:
         input_path = input("Enter input PDF path: ").strip()
 
@@ -377,9 +2111,60 @@ def main():
         print(f"Error: File '{input_path}' does not exist")
         sys.exit(1)
 
-    # Get page ranges
-    if len(sys.argv) > 2:
-        page_ranges = sys.argv[2]
+    if args.compare_extraction:
+        compare_extraction_modes(input_path, args.header_band or DEFAULT_HEADER_BAND, band_edges)
+        sys.exit(0)
+
+    if args.split or args.split_file:
+        splits = load_split_spec(args.split_file) if args.split_file else {}
+        for spec in args.split:
+            name, sep, ranges = spec.partition('=')
+            if not sep or not name.strip():
+                print(f"Error: Invalid --split '{spec}' (expected NAME=RANGES)")
+                sys.exit(1)
+            splits[name.strip()] = ranges.strip()
+
+        if args.plan_json:
+            _run_plan(args, input_path, splits, band_edges, metrics, options)
+
+        results = split_pdf_pages(input_path, splits, args.output_dir,
+                                  header_band=args.header_band, band_edges=band_edges,
+                                  jobs=args.jobs, use_cache=not args.no_cache,
+                                  cache_dir=args.cache_dir, cache_max_bytes=cache_max_bytes_from_args(args),
+                                  use_page_labels=not args.no_page_labels, metrics=metrics,
+                                  resume=args.resume, checkpoint_every=args.checkpoint_every,
+                                  optimize=args.optimize, fingerprints=args.fingerprints)
+        ok = results is not None and all(result['status'] == 'ok' for result in results)
+        if metrics is not None:
+            write_metrics(args.metrics_json, metrics, input=str(input_path), mode='split',
+                          options=options, success=ok)
+        sys.exit(0 if ok else 1)
+
+    # Get page ranges (--compound gives physical positions)
+    use_printed_numbers = True
+    if args.compound:
+        from page_index import DEFAULT_INDEX, compound_ranges
+
+        # The ranges positional is unused, so "INPUT OUTPUT" lands in input, page_ranges
+        if args.page_ranges and not args.output:
+            args.output, args.page_ranges = args.page_ranges, None
+        if args.page_ranges:
+            print("Error: Give either page ranges or --compound, not both")
+            sys.exit(1)
+        try:
+            printed, physical = compound_ranges(args.compound, input_path, args.index or DEFAULT_INDEX)
+        except ValueError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if not physical:
+            print(f"Error: No indexed pages match '{args.compound}'")
+            sys.exit(1)
+        # The matched pages themselves: a printed number can recur on other pages
+        page_ranges, use_printed_numbers = str(physical), False
+        print(f"'{args.compound}' is on printed page(s) {printed or '-'} "
+              f"(physical {page_ranges})")
+    elif args.page_ranges:
+        page_ranges = args.page_ranges
     else:
         print("\nEnter page numbers to keep (e.g., '2-5, 17-20, 25'):")
         print("(This will look for these numbers printed on the pages)")
@@ -389,9 +2174,13 @@ def main():
         print("Error: No page ranges specified")
         sys.exit(1)
 
+    if args.plan_json:
+        _run_plan(args, input_path, page_ranges, band_edges, metrics, options,
+                  use_printed_numbers=use_printed_numbers)
+
     # Get output path
-    if len(sys.argv) > 3:
-        output_path = sys.argv[3]
+    if args.output:
+        output_path = args.output
     else:
         default_output = input_path.stem + "_filtered.pdf"
         output_input = input(f"Enter output PDF path (default: {default_output}): ").strip()
@@ -409,7 +2198,19 @@ def main():
     print()
 
     # Process PDF
-    success = filter_pdf_pages(input_path, output_path, page_ranges, use_printed_numbers=True)
+    success = filter_pdf_pages(input_path, output_path, page_ranges,
+                               use_printed_numbers=use_printed_numbers,
+                               header_band=args.header_band, band_edges=band_edges,
+                               jobs=args.jobs, use_cache=not args.no_cache,
+                               cache_dir=args.cache_dir, cache_max_bytes=cache_max_bytes_from_args(args),
+                               lazy=args.lazy,
+                               use_page_labels=not args.no_page_labels, metrics=metrics,
+                               resume=args.resume, checkpoint_every=args.checkpoint_every,
+                               optimize=args.optimize, fingerprints=args.fingerprints)
+
+    if metrics is not None:
+        write_metrics(args.metrics_json, metrics, input=str(input_path), mode='filter',
+                      ranges=page_ranges, options=options, success=success)
 
     sys.exit(0 if success else 1)
 
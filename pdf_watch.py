@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+"""
+PDF Watch - Long-running page filter that keeps its state warm.
+
+A one-off run of pdf_page_filter.py pays for interpreter start-up, the PDF
+library import and page number detection every time. This daemon pays them
+once: readers and resolved page maps stay in memory, keyed by path, size and
+modification time, so a file seen before is filtered without re-reading its
+cross-reference table or re-detecting a single page number.
+
+Jobs arrive two ways, and both can be used at once:
+
+    watch directory   every PDF dropped into it is filtered with the default
+                      ranges into the output directory; a .csv, .json or
+                      .toml manifest dropped into it runs its jobs (same
+                      format as pdf_batch.py). A file is picked up once its
+                      size and modification time stop changing.
+    local socket      a Unix socket accepting one JSON job per line,
+                      {"input": ..., "ranges": ..., "output": ...}, and
+                      answering each with a JSON result line.
+
+Jobs run one at a time on a single worker thread. Every result reports its
+queue wait and processing time, and a latency summary is printed on exit.
+
+Usage:
+    python pdf_page_filter.py --watch inbox/ "17-250" --output-dir filtered/
+    python pdf_page_filter.py --socket /tmp/pdf_filter.sock
+"""
+
+import os
+import json
+import stat
+import time
+import queue
+import socket
+import logging
+import threading
+import socketserver
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from pathlib import Path
+
+import pdf_page_filter
+from page_map_cache import DEFAULT_MAX_BYTES
+from pdf_page_filter import PdfReader, logger
+from pdf_batch import load_manifest, group_jobs_by_input
+
+# Seconds between scans of the watch directory
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Open readers (and their page maps) kept in memory
+DEFAULT_MAX_READERS = 8
+
+# Latencies of the most recent jobs kept for the median in the summary
+LATENCY_SAMPLE = 1024
+
+MANIFEST_SUFFIXES = ('.csv', '.json', '.toml')
+
+
+class WarmState:
+    """
+    Open readers and resolved page maps, least recently used evicted first.
+
+    Entries are keyed by (path, size, mtime_ns), so a file that is replaced
+    in place is opened and detected afresh.
+    """
+
+    def __init__(self, options=None, max_readers=DEFAULT_MAX_READERS):
+        """
+        Args:
+            options: Detection options (header_band, band_edges, use_cache,
+                cache_dir, use_page_labels) and optimize, as in pdf_batch
+            max_readers: Number of files kept open
+        """
+        self.options = options or {}
+        self.max_readers = max(1, max_readers)
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, input_path, metrics=None):
+        """
+        Reader and printed -> physical mapping of a PDF, from memory if warm.
+
+        Args:
+            input_path: Path to the PDF
+            metrics: Optional metrics dict (see pdf_page_filter)
+
+        Returns:
+            Tuple (reader, printed_to_physical)
+
+        Raises:
+            ValueError: If no page numbers are detected
+        """
+        stat = os.stat(input_path)
+        key = (str(Path(input_path).resolve()), stat.st_size, stat.st_mtime_ns)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+
+        self.misses += 1
+        reader = PdfReader(input_path)
+        detected, page_mapping = pdf_page_filter.resolve_page_mapping(
+            reader, input_path, verbose=False,
+            header_band=self.options.get('header_band'),
+            band_edges=self.options.get('band_edges', ('top',)),
+            use_cache=self.options.get('use_cache', True),
+            cache_dir=self.options.get('cache_dir'),
+            cache_max_bytes=self.options.get('cache_max_bytes', DEFAULT_MAX_BYTES),
+            use_page_labels=self.options.get('use_page_labels', True),
+            metrics=metrics,
+            fingerprints=self.options.get('fingerprints'),
+        )
+        if not detected:
+            raise ValueError("No page numbers detected on any pages")
+        entry = reader, pdf_page_filter.build_printed_to_physical(page_mapping)
+        # Drop older versions of the same file along with the least recently used
+        for stale in [k for k in self._entries if k[0] == key[0]]:
+            del self._entries[stale]
+        self._entries[key] = entry
+        while len(self._entries) > self.max_readers:
+            self._entries.popitem(last=False)
+        return entry
+
+
+class FilterDaemon:
+    """Queue of filter jobs processed one at a time against a WarmState."""
+
+    def __init__(self, options=None, max_readers=DEFAULT_MAX_READERS):
+        self.state = WarmState(options, max_readers)
+        self.jobs = 0
+        self.failed = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        self._latencies = deque(maxlen=LATENCY_SAMPLE)
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name='pdf-watch-worker', daemon=True)
+        self._worker.start()
+
+    def submit(self, input_path, splits):
+        """
+        Queue one input with its splits.
+
+        Args:
+            input_path: Path to the input PDF
+            splits: List of (ranges, output path) tuples
+
+        Returns:
+            Future resolving to the list of per-split result dictionaries
+        """
+        future = Future()
+        self._queue.put((str(input_path), list(splits), time.perf_counter(), future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            input_path, splits, queued_at, future = item
+            started = time.perf_counter()
+            try:
+                reader, printed_to_physical = self.state.resolve(input_path)
+                results = pdf_page_filter.write_splits(
+                    reader, printed_to_physical, splits, verbose=False,
+                    optimize=self.state.options.get('optimize', False))
+            except Exception as e:
+                results = [{'ranges': ranges, 'output': str(output_path), 'status': 'error',
+                            'pages': 0, 'missing_pages': '', 'error': f"{type(e).__name__}: {e}"}
+                           for ranges, output_path in splits]
+            finished = time.perf_counter()
+            for result in results:
+                result.update(input=input_path, queued_seconds=started - queued_at,
+                              seconds=finished - started, latency_seconds=finished - queued_at)
+                self._count(result)
+                detail = f"{result['pages']} pages" if result['status'] == 'ok' else result['error']
+                logger.info(f"[{result['status']:>5}] {input_path} -> {result['output']} "
+                            f"({detail}, queued {result['queued_seconds']:.3f}s, "
+                            f"{result['seconds']:.3f}s)")
+            future.set_result(results)
+
+    def _count(self, result):
+        self.jobs += 1
+        self.failed += result['status'] != 'ok'
+        self._latency_total += result['latency_seconds']
+        self._latency_max = max(self._latency_max, result['latency_seconds'])
+        self._latencies.append(result['latency_seconds'])
+
+    def close(self):
+        """Finish the queued jobs and stop the worker."""
+        self._queue.put(None)
+        self._worker.join()
+
+    def summary(self):
+        """
+        Latency statistics of the jobs processed so far.
+
+        Only counters and the latencies of the last LATENCY_SAMPLE jobs are
+        kept, so a long-running daemon does not grow.
+
+        Returns:
+            Dictionary with jobs, failed, warm hits/misses and mean, median
+            (of the recent sample) and maximum latency in seconds
+        """
+        recent = sorted(self._latencies)
+        return {
+            'jobs': self.jobs,
+            'failed': self.failed,
+            'warm_hits': self.state.hits,
+            'warm_misses': self.state.misses,
+            'mean_latency': self._latency_total / self.jobs if self.jobs else 0.0,
+            'median_latency': recent[len(recent) // 2] if recent else 0.0,
+            'max_latency': self._latency_max,
+        }
+
+
+def scan_directory(watch_dir, seen, pending):
+    """
+    Find files in watch_dir that are new and have stopped changing.
+
+    A file is ready when its size and modification time are the same on two
+    consecutive scans (so files still being copied are not picked up).
+
+    Args:
+        watch_dir: Directory to scan (not recursive)
+        seen: Dictionary of path -> (size, mtime_ns) already processed,
+            updated in place
+        pending: Dictionary of path -> (size, mtime_ns) from the previous
+            scan, updated in place
+
+    Returns:
+        List of ready paths, sorted by name
+    """
+    ready = []
+    current = {}
+    with os.scandir(watch_dir) as entries:
+        for entry in entries:
+            if not entry.is_file() or entry.name.startswith('.'):
+                continue
+            suffix = Path(entry.name).suffix.lower()
+            if suffix != '.pdf' and suffix not in MANIFEST_SUFFIXES:
+                continue
+            stat = entry.stat()
+            current[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    for path, state in current.items():
+        if seen.get(path) == state:
+            continue
+        if pending.get(path) == state:
+            ready.append(path)
+            seen[path] = state
+    pending.clear()
+    pending.update(current)
+    return sorted(ready)
+
+
+def _is_current(input_path, output_path):
+    """True if output_path exists and is newer than input_path."""
+    try:
+        return os.stat(output_path).st_mtime_ns >= os.stat(input_path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def check_output_dir(watch_dir, output_dir):
+    """
+    Make sure filtered PDFs are not written back into the watch directory.
+
+    Outputs there would be picked up as new input and filtered again
+    (X_filtered_filtered.pdf, and so on).
+
+    Args:
+        watch_dir: Directory for --watch
+        output_dir: Directory for filtered PDFs
+
+    Raises:
+        ValueError: If both resolve to the same directory
+    """
+    if Path(output_dir).resolve() == Path(watch_dir).resolve():
+        raise ValueError(f"Output directory '{output_dir}' must not be the watch directory")
+
+
+def watch_directory(daemon, watch_dir, output_dir=None, page_ranges=None,
+                    interval=DEFAULT_POLL_INTERVAL, stop=None):
+    """
+    Submit every PDF or manifest that arrives in watch_dir, until stopped.
+
+    PDFs already filtered (output newer than input) are skipped, so
+    restarting the daemon does not redo earlier work. Files the daemon
+    writes itself (manifest outputs may land in watch_dir) are never picked
+    up as new input.
+
+    Args:
+        daemon: FilterDaemon to submit to
+        watch_dir: Directory to watch
+        output_dir: Directory for filtered PDFs (default: watch_dir/filtered)
+        page_ranges: Printed page ranges applied to dropped PDFs (PDFs are
+            ignored if None; manifests carry their own ranges)
+        interval: Seconds between scans
+        stop: Optional threading.Event that ends the loop
+
+    Raises:
+        ValueError: If output_dir is watch_dir
+    """
+    output_dir = Path(output_dir or Path(watch_dir) / 'filtered')
+    check_output_dir(watch_dir, output_dir)
+    written = set()
+    seen = {}
+    pending = {}
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        for path in scan_directory(watch_dir, seen, pending):
+            if str(Path(path).resolve()) in written:
+                continue
+            if Path(path).suffix.lower() in MANIFEST_SUFFIXES:
+                try:
+                    jobs = load_manifest(path)
+                except (OSError, ValueError) as e:
+                    logger.error(f"Error: Could not read manifest '{path}': {e}")
+                    continue
+                for input_path, splits in group_jobs_by_input(jobs).items():
+                    written.update(str(Path(output).resolve()) for _, output in splits)
+                    daemon.submit(input_path, splits)
+            elif page_ranges is not None:
+                output_path = output_dir / f"{Path(path).stem}_filtered.pdf"
+                if _is_current(path, output_path):
+                    logger.debug(f"Skipping {path}: {output_path} is up to date")
+                    continue
+                written.add(str(output_path.resolve()))
+                daemon.submit(path, [(page_ranges, str(output_path))])
+        stop.wait(interval)
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    """One JSON job per line in, one JSON result line out."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+                splits = [(job['ranges'], job['output'])]
+                results = self.server.filter_daemon.submit(job['input'], splits).result()
+                reply = results[0]
+            except (ValueError, KeyError, TypeError) as e:
+                reply = {'status': 'error', 'error': f"Invalid job: {e}"}
+            self.wfile.write(json.dumps(reply).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+def check_socket_path(socket_path):
+    """
+    Make sure a daemon can bind to socket_path.
+
+    A socket left behind by a previous run that was killed (nothing accepts
+    connections on it) is removed. Anything else at the path is kept.
+
+    Args:
+        socket_path: Unix socket path for --socket
+
+    Raises:
+        ValueError: If the path is not a socket, or another daemon is
+            listening on it
+    """
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise ValueError(f"'{socket_path}' exists and is not a socket")
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(str(socket_path))
+        except ConnectionRefusedError:
+            os.unlink(socket_path)
+            return
+    raise ValueError(f"Another daemon is already listening on '{socket_path}'")
+
+
+class JobServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server feeding jobs to a FilterDaemon."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon):
+        self.filter_daemon = daemon
+        self.socket_path = str(socket_path)
+        check_socket_path(self.socket_path)
+        super().__init__(self.socket_path, _JobHandler)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+
+def submit_job(socket_path, input_path, ranges, output_path, timeout=None):
+    """
+    Send one job to a running daemon and wait for its result.
+
+    Args:
+        socket_path: The daemon's Unix socket
+        input_path: Input PDF (absolute, or relative to the daemon's directory)
+        ranges: Printed page ranges
+        output_path: Output PDF
+        timeout: Optional socket timeout in seconds
+
+    Returns:
+        Result dictionary (status, pages, missing_pages, error and latency
+        fields)
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(str(socket_path))
+        job = {'input': str(input_path), 'ranges': ranges, 'output': str(output_path)}
+        client.sendall(json.dumps(job).encode('utf-8') + b'\n')
+        with client.makefile('rb') as reply:
+            return json.loads(reply.readline())
+
+
+def run(options=None, watch_dir=None, socket_path=None, output_dir=None, page_ranges=None,
+        interval=DEFAULT_POLL_INTERVAL, max_readers=DEFAULT_MAX_READERS, stop=None):
+    """
+    Run the daemon until interrupted (or until stop is set).
+
+    Args:
+        options: Detection options (see WarmState)
+        watch_dir: Directory to watch, if any
+        socket_path: Unix socket to accept jobs on, if any
+        output_dir: Output directory for PDFs dropped into watch_dir
+        page_ranges: Printed page ranges for PDFs dropped into watch_dir
+        interval: Seconds between directory scans
+        max_readers: Files kept open with their page maps
+        stop: Optional threading.Event that shuts the daemon down
+
+    Returns:
+        Latency summary (see FilterDaemon.summary())
+    """
+    daemon = FilterDaemon(options, max_readers)
+    stop = stop or threading.Event()
+    server = None
+    try:
+        if socket_path:
+            server = JobServer(socket_path, daemon)
+            threading.Thread(target=server.serve_forever, name='pdf-watch-socket', daemon=True).start()
+            logger.info(f"Accepting jobs on {socket_path}")
+        if watch_dir:
+            logger.info(f"Watching {watch_dir}")
+            watch_directory(daemon, watch_dir, output_dir, page_ranges, interval, stop)
+        else:
+            stop.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        daemon.close()
+
+    summary = daemon.summary()
+    if summary['jobs'] and logger.isEnabledFor(logging.INFO):
+        logger.info(f"{summary['jobs']} job(s), {summary['failed']} failed; latency mean "
+                    f"{summary['mean_latency']:.3f}s, median {summary['median_latency']:.3f}s, "
+                    f"max {summary['max_latency']:.3f}s; warm hits {summary['warm_hits']}, "
+                    f"misses {summary['warm_misses']}")
+    return summary
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Incremental build of the solubility dataset.
+
+A manifest (JSON) records, for every volume built, the source PDF's size,
+modification time and SHA-256, and a digest of the extraction rules (the
+source of the modules that turn PDF text into rows). A rebuild re-extracts
+only the volumes whose PDF or rules changed; the rest keep their CSVs and
+store rows untouched. Changed volumes are merged into the SQLite store by
+stable row key (salt, temperature, reference, duplicate index), so the same
+input always produces the same store.
+
+A PDF whose size and modification time match the manifest is not even
+hashed, so a no-op rebuild costs a few stat() calls.
+
+Usage:
+    python solubility_build.py SDS-*_filtered.pdf --db solubility.db
+"""
+
+import os
+import csv
+import sys
+import json
+import time
+import hashlib
+import argparse
+from pathlib import Path
+
+import solubility_extractor
+import solubility_units
+import molar_mass
+import extract_solubility_complete
+from extract_solubility_complete import volume_paths, extract_volume
+from page_map_cache import file_digest, source_state
+from solubility_store import SolubilityStore
+from solubility_columns import ColumnWriter, check_table_path
+
+MANIFEST_VERSION = 1
+DEFAULT_MANIFEST = 'solubility_manifest.json'
+
+# Manifests of builds without --output-dir, whose CSVs sit next to the PDFs
+DEFAULT_MANIFEST_DIR = Path(os.environ.get(
+    'SOLUBILITY_BUILD_DIR', Path.home() / '.cache' / 'solubility_build'
+))
+
+# Modules whose source defines how PDF text becomes rows
+RULE_MODULES = (solubility_extractor, solubility_units, molar_mass, extract_solubility_complete)
+
+
+def rules_digest(modules=RULE_MODULES):
+    """
+    Digest of the extraction rules: the source files of the given modules.
+
+    Args:
+        modules: Modules whose source affects extracted rows
+
+    Returns:
+        Dictionary of module name -> SHA-256 of its source file
+    """
+    return {module.__name__: file_digest(module.__file__) for module in modules}
+
+
+def load_manifest(path):
+    """
+    Read a build manifest.
+
+    Args:
+        path: Manifest path
+
+    Returns:
+        Manifest dictionary (an empty one if missing, unreadable or from
+        another manifest version)
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            manifest.setdefault('volumes', {})
+            return manifest
+    except (OSError, ValueError, AttributeError):
+        pass
+    return {'version': MANIFEST_VERSION, 'volumes': {}}
+
+
+def default_manifest_path(pdf_paths, output_dir=None):
+    """
+    Where a build keeps its manifest when none is given.
+
+    With an output directory, the manifest sits there beside the CSVs.
+    Otherwise it goes to DEFAULT_MANIFEST_DIR, named after the resolved
+    directories of the PDFs, so a build never writes into a source tree
+    other than through its CSVs.
+
+    Args:
+        pdf_paths: Paths to the PDFs being built
+        output_dir: Directory for the CSVs, or None
+
+    Returns:
+        Manifest Path
+    """
+    if output_dir:
+        return Path(output_dir) / DEFAULT_MANIFEST
+    sources = sorted({str(Path(pdf_path).resolve().parent) for pdf_path in pdf_paths})
+    digest = hashlib.sha256('\n'.join(sources).encode('utf-8')).hexdigest()[:16]
+    return DEFAULT_MANIFEST_DIR / f"manifest-{digest}.json"
+
+
+def save_manifest(path, manifest):
+    """Write a manifest atomically, creating its directory if needed."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def stale_reason(entry, state, rules, options, output_csv, db_path=None):
+    """
+    Why a volume must be rebuilt, or None if its outputs are current.
+
+    Args:
+        entry: The volume's manifest entry from the last build (or None)
+        state: source_state() of its PDF now
+        rules: rules_digest() now
+        options: Build options that change the rows (e.g. derive)
+        output_csv: Expected CSV path
+        db_path: SQLite store the volume must be merged into, if any
+
+    Returns:
+        Short reason string, or None
+    """
+    if entry is None:
+        return "new volume"
+    if entry.get('digest') != state['digest']:
+        return "PDF changed"
+    if entry.get('rules') != rules:
+        changed = sorted(name for name in set(rules) | set(entry.get('rules') or {})
+                         if rules.get(name) != (entry.get('rules') or {}).get(name))
+        return f"rules changed ({', '.join(changed)})"
+    if entry.get('options') != options:
+        return "options changed"
+    if entry.get('csv') != str(output_csv) or not Path(output_csv).exists():
+        return "output missing"
+    if db_path and (entry.get('db') != str(db_path) or not Path(db_path).exists()):
+        return "not in store"
+    return None
+
+
+def build(pdf_paths, output_dir=None, manifest_path=None, db_path=None, derive=False,
+          force=False, columns_path=None, verbose=True):
+    """
+    Re-extract the volumes whose PDF or extraction rules changed.
+
+    Args:
+        pdf_paths: Paths to (filtered) SDS PDFs
+        output_dir: Directory for the CSVs, created if needed (default:
+            next to each PDF)
+        manifest_path: Manifest path (default: see default_manifest_path())
+        db_path: Optional SQLite store to merge changed volumes into
+        derive: Fill blank mass% and molality cells (see build_rows())
+        force: Rebuild every volume
+        columns_path: Optional columnar table of all volumes, rewritten from
+            the CSVs when any volume changed (or when it is missing)
+        verbose: Print one line per volume
+
+    Returns:
+        Dictionary of volume -> 'built' or 'unchanged'
+
+    Raises:
+        ValueError: If columns_path exists and is not a columnar table
+    """
+    pdf_paths = [Path(pdf_path) for pdf_path in pdf_paths]
+    if columns_path:
+        check_table_path(columns_path)
+    if output_dir:
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
+    if manifest_path is None:
+        manifest_path = default_manifest_path(pdf_paths, output_dir)
+    manifest = load_manifest(manifest_path)
+    rules = rules_digest()
+    options = {'derive': bool(derive)}
+
+    results = {}
+    store = None
+    try:
+        for pdf_path in pdf_paths:
+            volume, output_csv = volume_paths(pdf_path, output_dir)
+            entry = manifest['volumes'].get(volume)
+            state = source_state(pdf_path, entry)
+            reason = "forced" if force else stale_reason(
+                entry, state, rules, options, output_csv, db_path)
+
+            if reason is None:
+                if entry != dict(entry, **state):
+                    # Touched but identical: remember the new mtime so it is not re-hashed
+                    manifest['volumes'][volume] = dict(entry, **state)
+                results[volume] = 'unchanged'
+                if verbose:
+                    print(f"[unchanged] {volume}")
+                continue
+
+            if db_path and store is None:
+                store = SolubilityStore(db_path)
+            start = time.perf_counter()
+            count, invalid = extract_volume(pdf_path, output_csv, volume, derive=derive, store=store)
+            manifest['volumes'][volume] = dict(state, pdf=str(pdf_path), csv=str(output_csv),
+                                               rules=rules, options=options, rows=count,
+                                               db=str(db_path) if db_path else entry and entry.get('db'))
+            # Save after every volume so an interrupted build keeps its progress
+            save_manifest(manifest_path, manifest)
+            results[volume] = 'built'
+            if verbose:
+                print(f"[    built] {volume}: {count} rows ({reason}, {time.perf_counter() - start:.2f}s)")
+                if invalid:
+                    print(f"  ⚠ WARNING: {invalid} entries with mass% > 100!")
+    finally:
+        if store is not None:
+            store.close()
+    save_manifest(manifest_path, manifest)
+
+    if columns_path and ('built' in results.values() or not Path(columns_path).exists()):
+        writer = ColumnWriter(columns_path)
+        for volume in sorted(results):
+            with open(manifest['volumes'][volume]['csv'], 'r', newline='', encoding='utf-8') as f:
+                writer.append(csv.DictReader(f))
+        writer.close()
+        if verbose:
+            print(f"Wrote {writer.rows} rows to columnar table {columns_path}")
+    return results
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Incrementally rebuild solubility CSVs (and a SQLite store) from SDS PDFs."
+    )
+    parser.add_argument('pdfs', nargs='+', help="SDS PDFs")
+    parser.add_argument('--output-dir', default=None,
+                        help="Directory for the CSVs (default: next to each PDF)")
+    parser.add_argument('--manifest', default=None,
+                        help=f"Build manifest (default: {DEFAULT_MANIFEST} in the output directory, "
+                             f"or under {DEFAULT_MANIFEST_DIR} without --output-dir)")
+    parser.add_argument('--db', default=None, metavar='PATH', help="SQLite store to merge changes into")
+    parser.add_argument('--columns', default=None, metavar='DIR',
+                        help="Columnar table of all volumes, rewritten when anything changed")
+    parser.add_argument('--derive', action='store_true',
+                        help="Fill blank mass%% and molality cells from the salt's molar mass")
+    parser.add_argument('--force', action='store_true', help="Rebuild every volume")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function to run an incremental build."""
+    args = parse_args()
+    missing = [pdf for pdf in args.pdfs if not os.path.exists(pdf)]
+    if missing:
+        print(f"Error: File(s) not found: {', '.join(missing)}")
+        sys.exit(2)
+
+    start = time.perf_counter()
+    try:
+        results = build(args.pdfs, output_dir=args.output_dir, manifest_path=args.manifest,
+                        db_path=args.db, derive=args.derive, force=args.force,
+                        columns_path=args.columns)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    built = sum(1 for status in results.values() if status == 'built')
+    print(f"{built} of {len(results)} volume(s) rebuilt in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
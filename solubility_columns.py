@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Columnar binary export of solubility data.
+
+A table is a directory holding a data directory with one .npy file per CSV
+column, plus a metadata.json file that names it:
+
+    data-<id>/Temperature_C.npy, ...   float64, NaN = missing
+    data-<id>/Salt.npy, ...            int32 codes, -1 = missing
+    metadata.json                      data directory, row count, column types
+                                       and the strings each code stands for
+
+Rewriting a table writes a new data directory and then replaces
+metadata.json in one rename, so a reader sees either the old table or the
+new one, never a mix of the two.
+
+Numeric columns keep their type (no string round trip), and string columns
+are dictionary-encoded, so a repeated salt or reference is stored once.
+Plain .npy files can be memory-mapped, so read_columns() is zero-copy: only
+the pages of the columns actually touched are read from disk.
+"""
+
+import os
+import json
+import uuid
+import shutil
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+# Version 1 tables kept their column files next to metadata.json; they are still read
+FORMAT_VERSION = 2
+
+FLOAT_FIELDS = ['Temperature_C', 'Mass_Saturated_Solution_g', 'Mass_Oxide_g',
+                'Solubility_g_per_100g_H2O_old_masses', 'Solubility_g_per_100g_H2O_new_masses',
+                'Solubility_mass_percent', 'Solubility_mol_per_kg']
+STRING_FIELDS = ['Salt', 'CAS_Number', 'Solid_Phase', 'Reference', 'Journal', 'Year',
+                 'Additional_Conditions']
+
+# Column order of the CSV files, used when rebuilding rows
+CSV_ORDER = STRING_FIELDS[:2] + FLOAT_FIELDS + STRING_FIELDS[2:]
+
+METADATA_FILE = 'metadata.json'
+
+# Column files of a version 1 table, removed when it is rewritten
+LEGACY_FILES = [f"{field}.npy" for field in FLOAT_FIELDS + STRING_FIELDS]
+
+
+def check_table_path(path):
+    """
+    Check that a table may be written to path.
+
+    A new directory, or an existing columnar table (one holding
+    metadata.json), is accepted; any other existing file or directory is not,
+    so a mistyped path never loses its contents.
+
+    Args:
+        path: Output directory
+
+    Raises:
+        ValueError: If path exists and is not a columnar table
+    """
+    path = Path(path)
+    if path.exists() and not (path.is_dir() and (path / METADATA_FILE).is_file()):
+        raise ValueError(f"Refusing to replace {path}: it exists and is not a columnar table "
+                         f"(no {METADATA_FILE})")
+
+
+class ColumnWriter:
+    """
+    Accumulate rows as typed columns and write them as a columnar table.
+
+    Rows are encoded as they are appended (8 bytes per float cell, 4 per
+    string cell), so a large volume never has to be held as dictionaries.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path: Output directory, new or an existing table (whose table
+                files are replaced when close() is called)
+
+        Raises:
+            ValueError: If path exists and is not a columnar table
+        """
+        check_table_path(path)
+        self.path = Path(path)
+        self._floats = {field: array('d') for field in FLOAT_FIELDS}
+        self._codes = {field: array('i') for field in STRING_FIELDS}
+        self._categories = {field: {} for field in STRING_FIELDS}
+        self.rows = 0
+
+    def append(self, rows):
+        """
+        Add rows.
+
+        Args:
+            rows: Iterable of dictionaries keyed by the CSV field names
+        """
+        for row in rows:
+            for field in FLOAT_FIELDS:
+                value = row.get(field)
+                self._floats[field].append(np.nan if value is None or value == '' else float(value))
+            for field in STRING_FIELDS:
+                value = row.get(field)
+                if value is None or value == '':
+                    self._codes[field].append(-1)
+                    continue
+                categories = self._categories[field]
+                self._codes[field].append(categories.setdefault(str(value), len(categories)))
+            self.rows += 1
+
+    def close(self):
+        """
+        Write the table.
+
+        The columns are written to a new data directory. A new table is
+        built next to path and renamed into place; in an existing table
+        metadata.json is replaced last, in one rename, and only then is the
+        previous data directory removed, so readers see either the old or the
+        new table and other files in the directory are left alone. Nothing is
+        left behind if writing fails.
+
+        Returns:
+            Output directory path
+
+        Raises:
+            ValueError: If path was created meanwhile and is not a columnar table
+        """
+        check_table_path(self.path)
+        data_name = f"data-{uuid.uuid4().hex[:12]}"
+        if self.path.exists():
+            tmp_path = self.path / f".{data_name}.tmp"
+        else:
+            tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        try:
+            if self.path.exists():
+                self._write_data(tmp_path)
+                os.replace(tmp_path, self.path / data_name)
+                self._replace_table(data_name)
+            else:
+                self._write_data(tmp_path / data_name)
+                self._write_metadata(tmp_path / METADATA_FILE, data_name)
+                check_table_path(self.path)
+                os.replace(tmp_path, self.path)
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        return self.path
+
+    def _write_data(self, data_path):
+        """Write every column to its .npy file in a new directory."""
+        data_path.mkdir(parents=True)
+        for field, values in self._floats.items():
+            np.save(data_path / f"{field}.npy", np.frombuffer(values, dtype=np.float64))
+        for field, codes in self._codes.items():
+            np.save(data_path / f"{field}.npy", np.frombuffer(codes, dtype=np.int32))
+
+    def _write_metadata(self, metadata_path, data_name):
+        metadata = {
+            'version': FORMAT_VERSION,
+            'data': data_name,
+            'rows': self.rows,
+            'float_fields': FLOAT_FIELDS,
+            'string_fields': STRING_FIELDS,
+            'categories': {field: list(categories) for field, categories in self._categories.items()},
+        }
+        with open(metadata_path, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+
+    def _replace_table(self, data_name):
+        """Point an existing table at data_name and remove the data it replaces."""
+        try:
+            with open(self.path / METADATA_FILE, 'r', encoding='utf-8') as f:
+                old_data = json.load(f).get('data')
+        except (OSError, ValueError):
+            old_data = None
+        metadata_tmp = self.path / f".{METADATA_FILE}.{os.getpid()}.tmp"
+        try:
+            self._write_metadata(metadata_tmp, data_name)
+            os.replace(metadata_tmp, self.path / METADATA_FILE)
+        except BaseException:
+            shutil.rmtree(self.path / data_name, ignore_errors=True)
+            raise
+        finally:
+            if metadata_tmp.exists():
+                metadata_tmp.unlink()
+
+        if old_data:
+            shutil.rmtree(self.path / Path(old_data).name, ignore_errors=True)
+        else:
+            for name in LEGACY_FILES:
+                try:
+                    os.unlink(self.path / name)
+                except FileNotFoundError:
+                    pass
+
+
+def write_columns(rows, path):
+    """
+    Write rows as a columnar table.
+
+    Args:
+        rows: Iterable of dictionaries keyed by the CSV field names
+        path: Output directory
+
+    Returns:
+        Number of rows written
+    """
+    writer = ColumnWriter(path)
+    writer.append(rows)
+    writer.close()
+    return writer.rows
+
+
+class ColumnTable:
+    """
+    A columnar table opened by read_columns().
+
+    Float columns are float64 arrays and string columns are int32 code
+    arrays; categories[field] maps codes back to strings.
+    """
+
+    def __init__(self, columns, categories, rows):
+        self.columns = columns
+        self.categories = categories
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, field):
+        return self.columns[field]
+
+    def code(self, field, value):
+        """Code of a string value in a dictionary-encoded column, or None if absent."""
+        try:
+            return self.categories[field].index(value)
+        except ValueError:
+            return None
+
+    def decode(self, field):
+        """
+        Decode a string column.
+
+        Returns:
+            Object array of strings, "" where missing
+        """
+        lookup = np.array(self.categories[field] + [''], dtype=object)
+        # Code -1 (missing) picks the trailing ""
+        return lookup[self.columns[field]]
+
+    def mask(self, field, value):
+        """Boolean row mask for a string column equal to value."""
+        code = self.code(field, value)
+        if code is None:
+            return np.zeros(self.rows, dtype=bool)
+        return self.columns[field] == code
+
+    def to_rows(self, mask=None):
+        """
+        Rebuild CSV-style rows.
+
+        Args:
+            mask: Optional boolean mask or index array selecting rows
+
+        Returns:
+            List of dictionaries keyed by the CSV field names
+        """
+        index = np.arange(self.rows) if mask is None else np.arange(self.rows)[mask]
+        floats = {field: self.columns[field][index] for field in FLOAT_FIELDS}
+        strings = {field: self.decode(field)[index] for field in STRING_FIELDS}
+        rows = []
+        for i in range(len(index)):
+            rows.append({field: strings[field][i] if field in strings else
+                         ('' if np.isnan(floats[field][i]) else float(floats[field][i]))
+                         for field in CSV_ORDER})
+        return rows
+
+
+def read_columns(path, mmap=True):
+    """
+    Open a columnar table.
+
+    Args:
+        path: Table directory written by write_columns() or ColumnWriter
+        mmap: Memory-map the column files instead of reading them
+
+    Returns:
+        ColumnTable
+
+    Raises:
+        ValueError: If the directory is not a supported columnar table
+    """
+    path = Path(path)
+    mmap_mode = 'r' if mmap else None
+    for attempt in range(3):
+        try:
+            with open(path / METADATA_FILE, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Not a columnar solubility table: {path} ({e})")
+        if metadata.get('version') not in (1, FORMAT_VERSION):
+            raise ValueError(f"Unsupported columnar table version {metadata.get('version')} in {path}")
+
+        data_path = path / Path(metadata['data']).name if metadata.get('data') else path
+        try:
+            columns = {field: np.load(data_path / f"{field}.npy", mmap_mode=mmap_mode)
+                       for field in metadata['float_fields'] + metadata['string_fields']}
+        except FileNotFoundError:
+            # A writer replaced the table after metadata.json was read; read the new one
+            if attempt == 2:
+                raise
+            continue
+        return ColumnTable(columns, metadata['categories'], metadata['rows'])
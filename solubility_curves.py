@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Solubility-curve interpolation over extracted solubility data.
+
+Each (salt, solid phase) branch gets a least-squares polynomial of mass %
+against temperature. A branch is split further at the transitions recorded
+in Additional_Conditions ("Transition at 38.5°C"), so a fit never runs
+across a phase change. Ice branches (freezing-point curves) are left out.
+
+Queries take arrays of temperatures and are answered in one vectorised
+pass. Where branches overlap (metastable phases), the lowest solubility,
+i.e. the stable phase, wins; temperatures outside every branch give NaN.
+A branch needs measurements at MIN_BRANCH_TEMPERATURES distinct
+temperatures; a lone point is not a curve and is left out.
+
+Fits are cached as JSON, keyed by a hash of the data they were fitted to,
+so the cache is invalidated whenever the source data changes.
+
+Usage:
+    python solubility_curves.py SDS-13_solubility_data.csv --salt "Pr(NO3)3" -t 27.3 40
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import hashlib
+import argparse
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+from molar_mass import molar_mass, molar_masses
+from solubility_units import (UNITS, to_array, derive_columns,
+                              g_per_100g_from_mass_percent, molality_from_mass_percent)
+
+# Bump when the fitting changes so old cached fits are not reused
+FIT_VERSION = 2
+
+DEFAULT_MAX_DEGREE = 3
+
+# Fewest distinct temperatures a branch is fitted to
+MIN_BRANCH_TEMPERATURES = 2
+
+DEFAULT_CACHE_DIR = Path(os.environ.get(
+    'SOLUBILITY_CURVE_CACHE', Path.home() / '.cache' / 'solubility_curves'
+))
+
+# Cached fit files kept per cache directory
+MAX_CACHE_ENTRIES = 32
+
+# Name of a cached fit file (fit_key() plus '.json'); only these are pruned
+_FIT_FILE = re.compile(r'[0-9a-f]{64}-[0-9a-f]{16}\.json')
+
+_TRANSITION = re.compile(r'Transition\s*(?:at\s*)?~?\s*(-?\d+(?:\.\d+)?)\s*°?\s*C', re.IGNORECASE)
+
+Branch = namedtuple('Branch', ['salt', 'solid_phase', 't_min', 't_max', 'coef', 'domain',
+                               'points', 'rms'])
+Branch.__doc__ = """One fitted branch: mass % = Polynomial(coef, domain)(t) for t_min <= t <= t_max."""
+
+
+def transition_temperatures(notes):
+    """
+    Temperatures of the transitions mentioned in an Additional_Conditions cell.
+
+    Args:
+        notes: Additional_Conditions text
+
+    Returns:
+        List of temperatures in °C
+    """
+    return [float(value) for value in _TRANSITION.findall(notes or '')]
+
+
+def _is_ice(solid_phase):
+    return solid_phase.strip().lower().startswith('ice')
+
+
+def _mass_percent_column(rows):
+    """Mass % per row, derived from g/100 g H2O or molality where not reported."""
+    return derive_columns(
+        mass_percent=[row.get('Solubility_mass_percent', '') for row in rows],
+        g_per_100g=[row.get('Solubility_g_per_100g_H2O_new_masses', '') for row in rows],
+        molality=[row.get('Solubility_mol_per_kg', '') for row in rows],
+        molar_mass=molar_masses(row['Salt'] for row in rows),
+    )['mass_percent']
+
+
+def data_digest(rows):
+    """
+    SHA-256 of the fields the fits depend on, independent of row order.
+
+    Args:
+        rows: List of CSV-style row dictionaries
+
+    Returns:
+        Hex digest string
+    """
+    fields = ('Salt', 'Solid_Phase', 'Temperature_C', 'Solubility_mass_percent',
+              'Solubility_g_per_100g_H2O_new_masses', 'Solubility_mol_per_kg',
+              'Additional_Conditions')
+    lines = sorted('\x1f'.join(str(row.get(field, '')) for field in fields) for row in rows)
+    return hashlib.sha256('\x1e'.join(lines).encode('utf-8')).hexdigest()
+
+
+def fit_key(rows, max_degree):
+    """
+    Cache key of the fits for rows: data digest, fit version and settings.
+
+    Args:
+        rows: List of CSV-style row dictionaries
+        max_degree: Highest polynomial degree
+
+    Returns:
+        Key string (also used as the cache file name)
+    """
+    settings = json.dumps({'version': FIT_VERSION, 'max_degree': max_degree}, sort_keys=True)
+    return f"{data_digest(rows)}-{hashlib.sha256(settings.encode('utf-8')).hexdigest()[:16]}"
+
+
+def fit_branches(rows, max_degree=DEFAULT_MAX_DEGREE):
+    """
+    Fit one polynomial per (salt, solid phase) branch, split at transitions.
+
+    Args:
+        rows: List of CSV-style row dictionaries
+        max_degree: Highest polynomial degree (lower when a branch has few points)
+
+    Returns:
+        List of Branch tuples, ordered by salt, solid phase and temperature;
+        segments measured at fewer than MIN_BRANCH_TEMPERATURES temperatures
+        are left out
+    """
+    temps = to_array([row.get('Temperature_C', '') for row in rows])
+    mass_percent = _mass_percent_column(rows)
+
+    groups = {}
+    transitions = {}
+    for row, temp, value in zip(rows, temps.tolist(), mass_percent.tolist()):
+        salt = str(row['Salt'])
+        transitions.setdefault(salt, set()).update(transition_temperatures(row.get('Additional_Conditions')))
+        solid = str(row.get('Solid_Phase', ''))
+        if np.isnan(temp) or np.isnan(value) or _is_ice(solid):
+            continue
+        groups.setdefault((salt, solid), []).append((temp, value))
+
+    branches = []
+    for (salt, solid), points in sorted(groups.items()):
+        points = np.array(sorted(points))
+        edges = [t for t in sorted(transitions.get(salt, ())) if points[0, 0] < t < points[-1, 0]]
+        # Points at a transition temperature belong to the branch below it
+        segment = np.searchsorted(edges, points[:, 0], side='left')
+        for index in range(len(edges) + 1):
+            t, w = points[segment == index].T if np.any(segment == index) else (np.empty(0), np.empty(0))
+            distinct = len(np.unique(t))
+            if distinct < MIN_BRANCH_TEMPERATURES:
+                continue
+            polynomial = np.polynomial.Polynomial.fit(t, w, min(max_degree, distinct - 1))
+            coef, domain = polynomial.coef.tolist(), polynomial.domain.tolist()
+            rms = float(np.sqrt(np.mean((polynomial(t) - w) ** 2)))
+            branches.append(Branch(salt, solid, float(t.min()), float(t.max()), coef, domain,
+                                   len(t), rms))
+    return branches
+
+
+def _load_fits(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return [Branch(**branch) for branch in json.load(f)['branches']]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _store_fits(path, branches):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'branches': [branch._asdict() for branch in branches]}, f)
+    os.replace(tmp_path, path)
+
+    # Fits for data that has since changed are never hit again; drop the oldest,
+    # leaving any other file in a shared cache directory alone
+    entries = sorted((entry for entry in path.parent.glob('*.json') if _FIT_FILE.fullmatch(entry.name)),
+                     key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for stale in entries[MAX_CACHE_ENTRIES:]:
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+
+
+class SolubilityCurves:
+    """Fitted solubility branches answering vectorised temperature queries."""
+
+    def __init__(self, branches):
+        """
+        Args:
+            branches: List of Branch tuples from fit_branches()
+        """
+        self.branches = {}
+        self._polynomials = {}
+        for branch in branches:
+            self.branches.setdefault(branch.salt, []).append(branch)
+            self._polynomials[id(branch)] = np.polynomial.Polynomial(branch.coef, domain=branch.domain)
+
+    @classmethod
+    def from_rows(cls, rows, max_degree=DEFAULT_MAX_DEGREE, use_cache=True, cache_dir=None):
+        """
+        Fit (or load cached fits for) CSV-style rows.
+
+        Args:
+            rows: Iterable of row dictionaries keyed by the CSV field names
+            max_degree: Highest polynomial degree
+            use_cache: Read and write the fit cache
+            cache_dir: Cache directory (default: DEFAULT_CACHE_DIR)
+
+        Returns:
+            SolubilityCurves instance
+        """
+        rows = list(rows)
+        path = None
+        if use_cache:
+            path = Path(cache_dir or DEFAULT_CACHE_DIR) / f"{fit_key(rows, max_degree)}.json"
+            branches = _load_fits(path)
+            if branches is not None:
+                return cls(branches)
+
+        branches = fit_branches(rows, max_degree=max_degree)
+        if path is not None:
+            try:
+                _store_fits(path, branches)
+            except OSError:
+                pass
+        return cls(branches)
+
+    @classmethod
+    def from_csv(cls, csv_paths, **kwargs):
+        """
+        Fit the rows of one or more solubility CSVs (see from_rows()).
+
+        Args:
+            csv_paths: Path or list of paths to CSVs written by
+                extract_solubility_complete.py
+        """
+        if isinstance(csv_paths, (str, Path)):
+            csv_paths = [csv_paths]
+        rows = []
+        for csv_path in csv_paths:
+            with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+                rows.extend(csv.DictReader(f))
+        return cls.from_rows(rows, **kwargs)
+
+    def salts(self):
+        """Salts with at least one fitted branch."""
+        return sorted(self.branches)
+
+    def query(self, salt, temperatures, solid_phase=None, unit='mass_percent'):
+        """
+        Interpolated solubility at the given temperatures.
+
+        Args:
+            salt: Salt formula, e.g. 'Pr(NO3)3'
+            temperatures: Scalar or array of temperatures in °C
+            solid_phase: Only use branches with this solid phase
+                (default: the stable, least soluble, branch at each temperature)
+            unit: 'mass_percent', 'g_per_100g' or 'molality'
+
+        Returns:
+            Float array shaped like temperatures, NaN outside every branch
+
+        Raises:
+            ValueError: If the unit is unknown
+        """
+        if unit not in UNITS:
+            raise ValueError(f"Unknown unit '{unit}' (use {', '.join(UNITS)})")
+        temperatures = np.asarray(temperatures, dtype=float)
+        flat = temperatures.reshape(-1)
+        branches = [branch for branch in self.branches.get(salt, [])
+                    if solid_phase is None or branch.solid_phase == solid_phase]
+
+        values = np.full((max(len(branches), 1), flat.size), np.nan)
+        for i, branch in enumerate(branches):
+            inside = (flat >= branch.t_min) & (flat <= branch.t_max)
+            values[i, inside] = self._polynomials[id(branch)](flat[inside])
+        with np.errstate(all='ignore'):
+            stable = np.where(np.all(np.isnan(values), axis=0), np.nan,
+                              np.nanmin(np.where(np.isnan(values), np.inf, values), axis=0))
+
+        if unit == 'g_per_100g':
+            stable = g_per_100g_from_mass_percent(stable)
+        elif unit == 'molality':
+            stable = molality_from_mass_percent(stable, molar_mass(salt))
+        return stable.reshape(temperatures.shape)
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Interpolate solubility curves fitted to extracted solubility CSVs."
+    )
+    parser.add_argument('csv', nargs='+', help="Solubility CSV(s) from extract_solubility_complete.py")
+    parser.add_argument('--salt', help="Salt formula to query, e.g. 'Pr(NO3)3' (default: list branches)")
+    parser.add_argument('-t', '--temperature', type=float, nargs='+', default=[], metavar='T',
+                        help="Temperatures in °C")
+    parser.add_argument('--solid-phase', default=None, help="Only use branches with this solid phase")
+    parser.add_argument('--unit', choices=UNITS, default='mass_percent', help="Output unit")
+    parser.add_argument('--max-degree', type=int, default=DEFAULT_MAX_DEGREE,
+                        help=f"Highest polynomial degree (default: {DEFAULT_MAX_DEGREE})")
+    parser.add_argument('--no-cache', action='store_true', help="Do not read or write cached fits")
+    parser.add_argument('--cache-dir', default=None, help="Fit cache directory")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function to query solubility curves."""
+    args = parse_args()
+    try:
+        curves = SolubilityCurves.from_csv(args.csv, max_degree=args.max_degree,
+                                           use_cache=not args.no_cache, cache_dir=args.cache_dir)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: Could not load solubility data: {e}")
+        sys.exit(2)
+
+    if not args.salt:
+        for salt in curves.salts():
+            for branch in curves.branches[salt]:
+                print(f"{salt:<14} {branch.solid_phase:<24} {branch.t_min:7.2f} to {branch.t_max:7.2f} °C "
+                      f"({branch.points} points, rms {branch.rms:.3f})")
+        return
+
+    if args.salt not in curves.branches:
+        print(f"Error: No fitted branches for '{args.salt}'")
+        sys.exit(1)
+    values = curves.query(args.salt, args.temperature, solid_phase=args.solid_phase, unit=args.unit)
+    for temperature, value in zip(args.temperature, values):
+        print(f"{args.salt} at {temperature:g} °C: {'outside fitted range' if np.isnan(value) else f'{value:.4g}'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,668 @@
+#!/usr/bin/env python3
+"""
+Extract binary solubility tables from IUPAC Solubility Data Series PDFs.
+
+Every compilation sheet in an SDS volume follows the same layout:
+
+    COMPONENTS:            (1) Yttrium nitrate; Y(NO3)3; [10361-93-0]
+                           (2) Water; H2O; [7732-18-5]
+    ORIGINAL MEASUREMENTS: Crew, M.C.; Steinert, H.E.; ... J. Phys. Chem. 1925, ...
+    EXPERIMENTAL VALUES:   t/oC  mass satd sln/g  mass Y2O3/g  g(1)/100 g(2) ...
+                           0     1.3078           0.2596       93.1 ...
+
+The OCR text layer scrambles that layout (columns are extracted one after the
+other, "0" reads as "°" or "O", "100" as "lOO"), so tables are located from
+their t/°C header and parsed either as rows or as parallel single-number
+column blocks. Each data point is yielded as a SolubilityRecord with the same
+14 fields as the hand-typed all_data_raw tuples in
+extract_solubility_complete.py, in the 'experimental' format (g per 100 g
+water from weighed saturated solution) or the 'mass_percent' format.
+
+Pages are read one at a time, so a whole volume is extracted in a single
+pass without holding more than one page of text in memory.
+"""
+
+import re
+import sys
+import logging
+from collections import namedtuple
+
+# The heuristics below are tuned to the text layer of pypdf 6.20+; PyPDF2 and
+# older pypdf releases split and order the OCR text differently and misread
+# values, so extraction does not fall back to them like pdf_page_filter does
+try:
+    import pypdf
+    from pypdf import PdfReader
+except ImportError:
+    pypdf = None
+if pypdf is None or tuple(int(part) for part in re.findall(r'\d+', pypdf.__version__)[:2]) < (6, 20):
+    print("Error: solubility extraction needs pypdf 6.20 or later.")
+    print("Please install using: pip install 'pypdf>=6.20.0'")
+    sys.exit(1)
+
+logger = logging.getLogger('solubility_extractor')
+
+# Same layout as the all_data_raw tuples (the mass % of 'mass_percent' records
+# is carried in g_per_100g_new, as in the hand-typed data)
+SolubilityRecord = namedtuple('SolubilityRecord', [
+    'salt', 'cas', 'temp', 'mass_satd', 'mass_oxide', 'g_per_100g_old', 'g_per_100g_new',
+    'molality', 'solid_phase', 'reference', 'journal', 'year', 'format_type', 'notes',
+])
+
+# Column headings of the experimental-values table, in the order they are tried
+_COLUMN_PATTERNS = [
+    ('mass_satd', r'mass\s*satd'),
+    ('mass_oxide', r'mass\s+[A-Z][a-z]?\s*\d?\s*[O0]\s*\d?\s*/\s*g'),
+    ('g100', r'g\s*\(\s*[l1I]\s*\)\s*/\s*[l1I][oO0]{2}\s*g|g\s*/\s*[l1I][oO0]{2}\s*g'),
+    # A "%" standing alone is a mass % heading whose words the OCR moved away
+    ('mass_percent', r'mass\s*%|(?<=\s)%(?=\s)'),
+    ('other', r'mol\s*%|mol\s*/\s*[l1I][oO0]{2}\s*mol|T\s*/\s*K\b'),
+    ('molality', r'mol(?!\s*%)[^%\n]{0,30}?kg|soly\s*/\s*mol|molality'),
+    ('solid', r'solid|nature'),
+]
+_COLUMN_ORDER = ['mass_satd', 'mass_oxide', 'g100', 'mass_percent', 'other', 'molality', 'solid']
+_COLUMN_HEADING = re.compile('|'.join(f'(?P<{kind}>{pattern})' for kind, pattern in _COLUMN_PATTERNS),
+                             re.IGNORECASE)
+
+# Temperature column heading: t/oC, t/°C, t/"C, t/·C and the OCR misreads "tlOe", "tjOC", "trc"
+_TEMPERATURE_HEADING = re.compile(r'^\s*(?:t\s*[/lj]\s*\S?\s*[cCe]\b|trc\b)')
+_TEMPERATURE_COLUMN = re.compile(r'\bt\s*[/lj]\s*\S?\s*[cCe]\b')
+
+# Rows the OCR ran together after a ditto mark or after the hydrate water of
+# a solid phase ('... Sc(NO3)3'4H2O15 18.30 ...')
+_GLUED_ROWS = re.compile(r'(?<=")\s*(?=-?\s?\d)|(?<=H[2Z][O0])(?=\d+\s+\d)')
+
+_COMPONENTS = re.compile(r'C[O0][MH]P[O0]NENTS')
+
+# Lines at which the experimental values end
+_TABLE_END = re.compile(r'AUXI\s*LIARY|METHOD\s*/\s*APPARATUS|COMMENTS\s+AND', re.IGNORECASE)
+
+_NUMBER = re.compile(r'^[-+]?(?:\d+\.?\d*|\.\d+)$')
+_OCR_DIGITS = str.maketrans('OoZSlI', '002511')
+_OCR_NUMBER = re.compile(r'^-?(?=.*[\d.])(?=.*[ZS])[\dOoZSlI]+(?:\.[\dOoZSlI]*)?$')
+_FOOTNOTE_MARK = re.compile(r'^[a-e]$|^\(?[a-e]\)$')
+_CAS = re.compile(r'\[\s*(\d[\d\s]*-\s*\d+\s*-\s*\d)\s*[\])]?')
+_YEAR = re.compile(r'\b(1[89]\d\d|20\d\d)\b')
+_AUTHORS = re.compile(
+    r"(?:[A-Z][A-Za-z'\-]+,\s*[A-Z][a-z]?\."
+    r"(?:-?[A-Z][a-z]?\.|\s[A-Z]\.(?!\s*[A-Z][a-z]+\.)|\s[A-Z][a-z]\.(?=[;,]))*[;,]?\s*(?:and\s+)?)+"
+)
+_TRANSITION = re.compile(r'transition[^.]*?(-?\d+(?:\.\d+)?)\s*[°o0]?\s*C\b', re.IGNORECASE)
+_SOLID_PHASE_IS = re.compile(r'solid phase (?:is|was)\s+([^\s,;]+(?:\s*[·\'.,]\s*\d*\s*H\s*2\s*[O0])?)',
+                             re.IGNORECASE)
+# Values reported in a sentence: "At 25·C, soly = 63.71 %", "at 25°C was reported to be 62.5 mass %"
+_SENTENCE_VALUE = re.compile(r'(-?\d+(?:\.\d+)?)\s*[·°o]\s*C\b[^%=\n]{0,40}?(?:=|\bbe\b|soly)\s*=?\s*'
+                             r'(\d+\.\d+)\s*(?:mass\s*)?(%|mol)', re.IGNORECASE)
+_HYDRATE_WORD = re.compile(r'solid phase[^.]*?\b(mono|di|tri|tetra|penta|hexa|hepta|octa|nona|deca)hydrate',
+                           re.IGNORECASE)
+_HYDRATE_COUNTS = {'mono': 1, 'di': 2, 'tri': 3, 'tetra': 4, 'penta': 5,
+                   'hexa': 6, 'hepta': 7, 'octa': 8, 'nona': 9, 'deca': 10}
+_LEGEND = re.compile(r'\b([A-Z])\s*=\s*([^~;=]+?)\s*(?=[~;]|\s[A-Z]\s*=|$)')
+_LEGEND_CODES = re.compile(r'^[A-Z](?:\s*\+\s*[A-Z])*(?=\s|$)')
+_DITTO = re.compile(r'^(?:"|\'\'|II|tt|11)$')
+
+# Frequent OCR misreadings in journal abbreviations
+_JOURNAL_FIXES = {'Chern': 'Chem', 'Aota': 'Acta', 'Aata': 'Acta', 'Rourn': 'Roum', 'Boa.': 'Soc.',
+                   'Soa.': 'Soc.', 'HeLv': 'Helv', 'HeZv': 'Helv', 'Dtsah': 'Dtsch'}
+# Volume, page and OCR debris ("~, 35", "lJ~.") left after the journal name when no year was read
+_JOURNAL_DEBRIS = re.compile(r'[\d~]|^[,;.\-]*$')
+
+
+def normalise_formula(text):
+    """
+    Clean up an OCR'd chemical formula.
+
+    Removes spaces, reads zeros inside formulas as oxygen (N03 -> NO3,
+    H20 -> H2O) and writes the hydrate separator as a middle dot.
+
+    Args:
+        text: Formula as extracted from the PDF, e.g. "Y(N03)3' 6H20"
+
+    Returns:
+        Normalised formula, e.g. "Y(NO3)3·6H2O"
+    """
+    formula = re.sub(r'\s+', '', text.strip().strip(".;,'"))
+    # Chlorine and lithium read as C1/CI and L1, scandium as SC
+    formula = re.sub(r'C[1I](?=[O0])', 'Cl', formula)
+    formula = re.sub(r'L1', 'Li', formula)
+    formula = re.sub(r'^SC(?=\()', 'Sc', formula)
+    # ...and the 2 of hydrate water as Z (4HZO)
+    formula = re.sub(r'(?<=\dH)Z(?=[O0])', '2', formula)
+    # A zero directly after an element symbol or ')' is an O (N03, (N03)3)
+    formula = re.sub(r'(?<=[A-Za-z)])0', 'O', formula)
+    # ...as is a zero following an element count (H20, Y203)
+    formula = re.sub(r'(?<=[A-Z]\d)0(?=\d|\)|$|[·\'.,])', 'O', formula)
+    formula = re.sub(r'(?<=[A-Z][a-z]\d)0(?=\d|\)|$|[·\'.,])', 'O', formula)
+    # Polymorph prefixes: a-, 6- (OCR for β)
+    formula = re.sub(r'^a-', 'α-', formula)
+    formula = re.sub(r'^[6ß]-', 'β-', formula)
+    # Hydrate separator: Y(NO3)3'6H2O, Y(NO3)3.6H2O, Y(NO3)3,5H2O
+    formula = re.sub(r"(?<=[)\w])[·'.,](?=\d*H2O)", '·', formula)
+    return formula
+
+
+def _parse_number(token):
+    """Convert a numeric token to int or float, keeping integers as written."""
+    return float(token) if '.' in token else int(token)
+
+
+def _clean_line(line):
+    """Undo OCR damage that breaks numeric tokens in a table line."""
+    # "Z" and "S" for 2 and 5 in tokens that are otherwise numeric ("6Z.37", "ZO.OO", "4.S39")
+    line = ' '.join(token.translate(_OCR_DIGITS)
+                    if _OCR_NUMBER.match(token) else token for token in line.split())
+    # "°" or "O" standing alone (or in front of digits) is a zero
+    line = re.sub(r'^[°Oo](?=\s|$|\d)', '0 ', line).strip()
+    # "- 1.6" -> "-1.6"
+    line = re.sub(r'^-\s+(?=\d)', '-', line)
+    # "1. 3078" -> "1.3078", "72 .6" -> "72.6"
+    line = re.sub(r'(\d)\s*\.\s+(\d)|(\d)\s+\.(\d)', lambda m: '.'.join(g for g in m.groups() if g), line)
+    # "lOO" -> "100" inside otherwise numeric tokens
+    line = re.sub(r'(?<![A-Za-z])[lI](?=[\dOo.]*\d|[Oo]{2})|(?<=\d)[Oo]|(?<=[lI])[Oo]',
+                  lambda m: '1' if m.group(0) in 'lI' else '0', line)
+    return line
+
+
+def _split_row(line):
+    """
+    Split a table line into leading numbers and trailing text.
+
+    Footnote markers between numbers ("64.5 b 75.04") are skipped.
+
+    Returns:
+        Tuple (numbers as strings, trailing text)
+    """
+    tokens = _clean_line(line).split()
+    numbers = []
+    for i, token in enumerate(tokens):
+        if _NUMBER.match(token.rstrip('abcde*')) and token.rstrip('abcde*'):
+            numbers.append(token.rstrip('abcde*'))
+        elif numbers and _FOOTNOTE_MARK.match(token) and i + 1 < len(tokens) \
+                and _NUMBER.match(tokens[i + 1]):
+            continue
+        else:
+            return numbers, ' '.join(tokens[i:])
+    return numbers, ''
+
+
+def classify_columns(heading):
+    """
+    Identify the columns named in a table heading.
+
+    Args:
+        heading: Heading text after the temperature column
+
+    Returns:
+        List of column kinds ('mass_satd', 'mass_oxide', 'g100',
+        'mass_percent', 'molality', 'solid', 'other') in heading order
+    """
+    return [match.lastgroup for match in _COLUMN_HEADING.finditer(heading)]
+
+
+def _format_type(kinds):
+    """Record format for a set of column kinds, or None if not a solubility table."""
+    if 'g100' in kinds or 'mass_satd' in kinds:
+        return 'experimental'
+    if 'mass_percent' in kinds or 'molality' in kinds:
+        return 'mass_percent'
+    return None
+
+
+def parse_components(text):
+    """
+    Read the solute of a compilation sheet from its COMPONENTS box.
+
+    Args:
+        text: Page text
+
+    Returns:
+        Tuple (formula, CAS number in brackets), or None if the page has no
+        binary aqueous system
+    """
+    first = re.search(r'\([1Il]\)', text)
+    if first is None:
+        return None
+    second = re.compile(r'\([2Z]\)').search(text, first.end())
+    if second is None or not re.search(r'[Ww]ater|H\s*2\s*[O0]', text[second.end():second.end() + 40]):
+        return None
+    if re.search(r'^\s*\(3\)', text[second.end():], re.MULTILINE):
+        return None
+
+    component = text[first.end():second.start()]
+    cas = _CAS.search(component)
+    fields = component[:cas.start()] if cas else component
+    parts = [part.strip() for part in fields.split(';') if part.strip()]
+    if len(parts) < 2:
+        return None
+    cas_number = '[' + re.sub(r'\s+', '', cas.group(1)) + ']' if cas else ''
+    return normalise_formula(parts[1]), cas_number
+
+
+def parse_reference(lines):
+    """
+    Read authors, journal and year from the ORIGINAL MEASUREMENTS box.
+
+    Component lines that the OCR layer interleaves with the reference are
+    skipped, as is the line following VARIABLES.
+
+    Args:
+        lines: Page lines
+
+    Returns:
+        Tuple (reference, journal, year) of strings ('' when not found)
+    """
+    try:
+        start = next(i for i, line in enumerate(lines) if 'ORIGINAL MEASUREMENTS' in line)
+    except StopIteration:
+        return '', '', ''
+
+    parts = []
+    skip_next = False
+    for line in lines[start + 1:]:
+        if re.search(r'PREPARED BY|EXPERIMENTAL VALUES|AUXI\s*LIARY', line):
+            if parts:
+                break
+            continue
+        if skip_next:
+            skip_next = False
+            continue
+        if 'VARIABLES' in line:
+            skip_next = True
+            continue
+        cas = list(_CAS.finditer(line))
+        if cas:
+            line = line[cas[-1].end():]
+        elif re.match(r'^\s*\(\d\)', line) or 'COMPONENTS' in line:
+            continue
+        line = line.strip()
+        if line and (not _NUMBER.match(line) or _YEAR.search(line)):
+            parts.append(line)
+    text = ' '.join(parts)
+
+    authors = _AUTHORS.search(text)
+    if not authors:
+        return text, '', ''
+    reference = authors.group(0).strip().rstrip(';,').strip()
+    rest = text[authors.end():]
+    year = _YEAR.search(rest)
+    journal = rest[:year.start()] if year else rest
+    for wrong, right in _JOURNAL_FIXES.items():
+        journal = journal.replace(wrong, right)
+    if not year:
+        words = journal.split()
+        while words and _JOURNAL_DEBRIS.search(words[-1]):
+            words.pop()
+        journal = ' '.join(words)
+    journal = journal.strip().rstrip(',;').strip()
+    return reference, journal, year.group(1) if year else ''
+
+
+def _solid_phase_legend(lines):
+    """Map solid phase codes from a table footnote ("A = ice", "B = ...")."""
+    legend = {}
+    for line in lines:
+        for match in _LEGEND.finditer(line):
+            value = match.group(2).strip()
+            legend[match.group(1)] = 'ice' if value.lower() == 'ice' else normalise_formula(value)
+    return legend
+
+
+def _resolve_solid(text, previous, legend):
+    """Turn the trailing text of a row into a solid phase name."""
+    text = re.sub(r'(\s+[-+]?\d+(?:\.\d+)?)+$', '', text)
+    text = re.sub(r'^(?:-+\s*)+', '', text).strip()
+    if not text:
+        return ''
+    if _DITTO.match(text):
+        return previous
+    if text.lower() == 'ice':
+        return 'ice'
+    codes = _LEGEND_CODES.match(text)
+    if codes:
+        codes = [code.strip() for code in codes.group(0).split('+')]
+        if all(code in legend for code in codes):
+            return ' + '.join(legend[code] for code in codes)
+        return ' + '.join(codes)
+    if re.search(r'H\s*2\s*[O0]|\(', text):
+        return normalise_formula(text)
+    return text
+
+
+def _table_region(lines):
+    """Lines that can hold experimental values (everything before AUXILIARY INFORMATION)."""
+    region = []
+    for line in lines:
+        if _TABLE_END.search(line):
+            break
+        # Rows the OCR ran together after a ditto mark ('... 6.793 "29 60.23 ...')
+        region.extend(_GLUED_ROWS.split(line))
+    return region
+
+
+def _row_tables(region):
+    """
+    Find tables laid out as rows below a t/°C heading.
+
+    Yields:
+        Tuples (column kinds, rows) where each row is (numbers, trailing text)
+    """
+    i = 0
+    while i < len(region):
+        heading = _TEMPERATURE_HEADING.match(region[i])
+        if not heading:
+            i += 1
+            continue
+        kinds = classify_columns(region[i][heading.end():])
+        # Headings that wrap over the next few lines come out of the OCR in
+        # no reliable order, so put the columns back in the SDS convention:
+        # the author's values first, the compiler's conversions after them
+        start = i
+        wrapped = 0
+        while (i + 1 < len(region) and wrapped < 3 and not _split_row(region[i + 1])[0]
+               and not _TEMPERATURE_HEADING.match(region[i + 1])):
+            i += 1
+            wrapped += 1
+            kinds += classify_columns(region[i])
+        if wrapped and len(kinds) > 1:
+            kinds = sorted(kinds, key=_COLUMN_ORDER.index)
+        # Two copies of the table printed side by side
+        side_by_side = len(_TEMPERATURE_COLUMN.findall(region[start])) == 2
+        if side_by_side:
+            # One copy of each column, whether or not the heading was re-sorted
+            kinds = [kind for n, kind in enumerate(kinds)
+                     if kinds[:n].count(kind) < (kinds.count(kind) + 1) // 2]
+        numeric = [kind for kind in kinds if kind != 'solid']
+        width = 1 + len(numeric)
+        rows = []
+        i += 1
+        while i < len(region) and not _TEMPERATURE_HEADING.match(region[i]):
+            numbers, trailing = _split_row(region[i])
+            # A first row split over two lines ("°" then "55.51")
+            if not rows and len(numbers) == 1 and not trailing and i + 1 < len(region):
+                following, trailing = _split_row(region[i + 1])
+                if len(following) == width - 1:
+                    numbers += following
+                    i += 1
+            if side_by_side and len(numbers) == 2 * width:
+                rows.append((numbers[:width], ''))
+                rows.append((numbers[width:], trailing))
+            elif len(numbers) >= 2:
+                rows.append((numbers, trailing))
+            i += 1
+        # Rows with fewer values than the heading lost cells to the OCR
+        # layout; rows with more than usual have digits split apart
+        lengths = [len(numbers) for numbers, _ in rows]
+        usual = max((length for length in set(lengths)
+                     if lengths.count(length) >= max(2, len(lengths) / 4)), default=0)
+        if usual >= width:
+            rows = [(numbers, trailing) for numbers, trailing in rows
+                    if width <= len(numbers) <= usual]
+        if _format_type(kinds) and len(rows) > 1:
+            yield kinds, rows
+
+
+def _column_blocks(region):
+    """
+    Find runs of single-number lines with the label line that precedes each.
+
+    Returns:
+        List of (label, [(number, trailing text), ...]) in page order
+    """
+    blocks = []
+    label = ''
+    run = []
+    for line in region:
+        # "°5" is a zero and a five read onto one line
+        if re.match(r'^\s*°\d', line):
+            run.append(('0', ''))
+            line = line.strip()[1:]
+        numbers, trailing = _split_row(line)
+        if len(numbers) == 1:
+            run.append((numbers[0], trailing))
+            continue
+        if run:
+            blocks.append((label, run))
+            run = []
+        if not numbers and line.strip():
+            label = line.strip()
+    if run:
+        blocks.append((label, run))
+    return blocks
+
+
+def _fill_from_blocks(columns, blocks, nrows, wanted):
+    """Fill missing columns from a column block of matching length and label."""
+    for label, block in blocks:
+        if len(block) != nrows:
+            continue
+        kinds = classify_columns(label)
+        for kind in wanted:
+            if kind in kinds and kind not in columns:
+                columns[kind] = [number for number, _ in block]
+                if kind == 'molality' and any(trailing for _, trailing in block):
+                    columns.setdefault('solid', [trailing for _, trailing in block])
+                break
+
+
+def parse_tables(lines):
+    """
+    Parse the experimental values on one page.
+
+    Args:
+        lines: Page lines
+
+    Returns:
+        List of (format_type, rows) where rows is a list of dicts keyed by
+        temp, mass_satd, mass_oxide, g_old, g_new, mass_percent, molality and
+        solid (raw strings, '' when absent)
+    """
+    region = _table_region(lines)
+    blocks = _column_blocks(region)
+    legend = _solid_phase_legend(lines)
+    tables = []
+
+    parsed = list(_row_tables(region))
+    if not parsed:
+        # Column layout: a temperature block and value blocks of equal length
+        temps = next((block for label, block in blocks if _TEMPERATURE_HEADING.match(label)), None)
+        if temps is None:
+            return tables
+        parsed = [([], [([number], '') for number, _ in temps])]
+
+    for kinds, rows in parsed:
+        numeric = [kind for kind in kinds if kind != 'solid']
+        columns = {}
+        for position, kind in enumerate(numeric, start=1):
+            values = [numbers[position] if position < len(numbers) else '' for numbers, _ in rows]
+            if any(values):
+                if kind == 'g100' and 'g100' in columns:
+                    columns['g100_new'] = values
+                elif kind == 'mass_percent' and numeric.count(kind) == 2:
+                    # Of a pair of mass % columns the second is the solute itself:
+                    # the first is the oxide (Sc2O3) or water the authors reported
+                    columns[kind] = values
+                else:
+                    columns.setdefault(kind, values)
+        if any(trailing for _, trailing in rows):
+            columns['solid'] = [trailing for _, trailing in rows]
+        _fill_from_blocks(columns, blocks, len(rows), ['mass_percent', 'molality', 'g100'])
+
+        format_type = _format_type(set(columns) | ({'g100'} if 'g100_new' in columns else set()))
+        if format_type is None:
+            continue
+
+        solid = ''
+        table = []
+        for i, (numbers, _) in enumerate(rows):
+            def column(kind):
+                return columns[kind][i] if kind in columns else ''
+            if 'solid' in columns:
+                # A blank cell repeats the solid phase above it
+                solid = _resolve_solid(column('solid'), solid, legend) or solid
+            g_old, g_new = column('g100'), column('g100_new')
+            if not g_new:
+                g_old, g_new = '', g_old
+            table.append({
+                'temp': numbers[0], 'mass_satd': column('mass_satd'),
+                'mass_oxide': column('mass_oxide'), 'g_old': g_old, 'g_new': g_new,
+                'mass_percent': column('mass_percent'), 'molality': column('molality'),
+                'solid': solid,
+            })
+        tables.append((format_type, table))
+    return tables
+
+
+def _sentence_values(region):
+    """
+    Read values reported in running text instead of a table.
+
+    Returns:
+        List of row dicts (see parse_tables) in order of first mention
+    """
+    rows = {}
+    for match in _SENTENCE_VALUE.finditer(' '.join(line.strip() for line in region)):
+        temp, number, unit = match.groups()
+        row = rows.setdefault(temp, {
+            'temp': temp, 'mass_satd': '', 'mass_oxide': '', 'g_old': '', 'g_new': '',
+            'mass_percent': '', 'molality': '', 'solid': '',
+        })
+        key = 'mass_percent' if unit == '%' else 'molality'
+        row[key] = row[key] or number
+    return [row for row in rows.values() if row['mass_percent'] or row['molality']]
+
+
+def _sheet_solid_phase(lines, region, salt):
+    """Solid phase stated once for the whole sheet, or ''."""
+    text = '\n'.join(lines)
+    match = _SOLID_PHASE_IS.search(text)
+    if match and re.search(r'[\d(]', match.group(1)):
+        return normalise_formula(match.group(1))
+    match = _HYDRATE_WORD.search(text)
+    if match:
+        count = _HYDRATE_COUNTS[match.group(1).lower()]
+        return f"{salt}·{count if count > 1 else ''}H2O"
+    for i, line in enumerate(region[:-1]):
+        if re.search(r'solid\s+phase\s*$', line, re.IGNORECASE):
+            candidate = region[i + 1].strip()
+            if re.search(r'H\s*2\s*[O0]', candidate) and not _split_row(candidate)[0]:
+                return normalise_formula(candidate)
+    return ''
+
+
+def _transition_notes(lines):
+    """Temperatures of phase transitions mentioned in the sheet's comments."""
+    temps = []
+    for match in _TRANSITION.finditer(' '.join(lines)):
+        try:
+            temps.append(float(match.group(1)))
+        except ValueError:
+            pass
+    return temps
+
+
+def extract_page_records(text, context=None):
+    """
+    Extract solubility records from the text of one page.
+
+    Args:
+        text: Page text
+        context: Sheet context (salt, cas, reference, journal, year) carried
+            over from the previous page, used when a table continues onto a
+            page without its own COMPONENTS box
+
+    Returns:
+        Tuple (records, context) with the list of SolubilityRecord and the
+        context to pass to the next page
+    """
+    if 'CRITICAL EVALUATION' in text or 'EVALUATOR' in text:
+        return [], None
+
+    lines = text.splitlines()
+    if _COMPONENTS.search(text):
+        component = parse_components(text)
+        if component is None:
+            return [], None
+        context = component + parse_reference(lines)
+    if context is None:
+        return [], None
+    salt, cas, reference, journal, year = context
+
+    records = []
+    region = _table_region(lines)
+    sheet_solid = _sheet_solid_phase(lines, region, salt)
+    transitions = sorted(_transition_notes(lines))
+    tables = parse_tables(lines)
+    if not tables and any('EXPERIMENTAL' in line for line in lines):
+        sentence_rows = _sentence_values(region)
+        if sentence_rows:
+            tables = [('mass_percent', sentence_rows)]
+    for format_type, table in tables:
+        seen_temps = set()
+        for row in table:
+            # Misaligned OCR rows give impossible compositions
+            if row['mass_percent'] and not 0 < float(row['mass_percent']) < 100:
+                logger.debug(f"Skipping {salt} row at {row['temp']} with mass % {row['mass_percent']}")
+                continue
+            temp = _parse_number(row['temp'])
+            notes = []
+            if temp in seen_temps:
+                notes.append('Duplicate measurement')
+            seen_temps.add(temp)
+            while transitions and temp > transitions[0]:
+                notes.append(f"Transition at {transitions.pop(0):g}°C")
+
+            def value(key):
+                return _parse_number(row[key]) if row[key] else ''
+
+            if format_type == 'experimental':
+                solubility = (value('mass_satd'), value('mass_oxide'), value('g_old'), value('g_new'))
+            else:
+                solubility = ('', '', '', value('mass_percent'))
+            records.append(SolubilityRecord(
+                salt, cas, temp, *solubility, value('molality'), row['solid'] or sheet_solid,
+                reference, journal, year, format_type, '; '.join(notes),
+            ))
+    return records, context
+
+
+def iter_page_texts(pdf_path, physical_indices=None, reader=None):
+    """
+    Yield (physical index, text) for each page, extracting one page at a time.
+
+    Args:
+        pdf_path: Path to the PDF
+        physical_indices: Only these pages, in this order (default: every page)
+        reader: PdfReader already opened from pdf_path, to avoid reopening it
+
+    Yields:
+        Tuples (physical page index, page text)
+    """
+    reader = reader if reader is not None else PdfReader(pdf_path)
+    if physical_indices is None:
+        physical_indices = range(len(reader.pages))
+    for physical_idx in physical_indices:
+        try:
+            text = reader.pages[physical_idx].extract_text() or ''
+        except Exception as e:
+            logger.warning(f"Warning: Could not extract text from page {physical_idx + 1}: {e}")
+            text = ''
+        yield physical_idx, text
+
+
+def extract_records(pdf_path):
+    """
+    Stream the solubility records of a whole SDS volume.
+
+    Args:
+        pdf_path: Path to a (filtered) SDS PDF
+
+    Yields:
+        SolubilityRecord tuples in page order
+    """
+    context = None
+    for physical_idx, text in iter_page_texts(pdf_path):
+        records, context = extract_page_records(text, context)
+        if records:
+            logger.debug(f"Physical page {physical_idx + 1:3d} -> {len(records)} records "
+                         f"({records[0].salt}, {records[0].reference})")
+        yield from records
@@ -0,0 +1,472 @@
+#!/usr/bin/env python3
+"""
+Streaming pipeline from source SDS volumes to the solubility dataset.
+
+Replaces the two manual steps (pdf_page_filter.py to write
+SDS-NN_filtered.pdf, then extract_solubility_complete.py on that file) with
+one pass over the source PDF. Each volume flows through generator stages:
+
+    resolve   printed page numbers -> physical pages (page map cache aware)
+    select    physical pages whose printed numbers were requested
+    extract   page text -> SolubilityRecords, one page at a time
+    convert   records -> CSV rows, in batches of BATCH_SIZE
+    store     CSV per volume, plus the SQLite store and columnar table
+
+No intermediate PDF is written. With several workers, volumes are resolved,
+extracted and converted concurrently in separate processes and their row
+batches pass through one bounded queue to the storage stage, which runs in
+the main process so the store has a single writer. A full queue blocks the
+workers, so memory stays bounded however far extraction runs ahead.
+
+Usage:
+    python solubility_pipeline.py SDS-13.pdf --pages "1-120" --db solubility.db
+    python solubility_pipeline.py --manifest volumes.csv --workers 4
+"""
+
+import os
+import csv
+import sys
+import time
+import argparse
+import multiprocessing
+from queue import Empty
+from itertools import islice
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+import pdf_page_filter
+import page_fingerprints
+from pdf_page_filter import PdfReader
+from pdf_batch import load_manifest
+from solubility_extractor import iter_page_texts, extract_page_records
+from extract_solubility_complete import (FIELDNAMES, BATCH_SIZE, build_rows, volume_paths,
+                                         store_volume, check_output_csv)
+from solubility_store import SolubilityStore
+from solubility_columns import ColumnWriter, check_table_path
+
+# Row batches that may wait between the convert and store stages
+DEFAULT_BUFFER = 16
+
+
+def resolve_pages(reader, pdf_path, page_ranges=None, options=None, metrics=None):
+    """
+    Resolve and select the physical pages of a volume.
+
+    Args:
+        reader: PdfReader opened from pdf_path
+        pdf_path: Path to the source PDF (hashed for the page map cache)
+        page_ranges: Printed page ranges to keep, e.g. "17-250" (default: every page)
+        options: Detection options (header_band, band_edges, use_cache,
+            cache_dir, use_page_labels), as in pdf_batch, and fingerprints
+            (page fingerprint index path, see page_fingerprints.py)
+        metrics: Optional metrics dict (see pdf_page_filter)
+
+    Returns:
+        Tuple (physical indices in printed order, missing PageRanges or None)
+
+    Raises:
+        ValueError: If the ranges are empty, no page numbers are detected or
+            none of the requested pages exist
+    """
+    total_pages = len(reader.pages)
+    if page_ranges is None:
+        return list(range(total_pages)), None
+
+    requested = pdf_page_filter.parse_page_ranges(page_ranges)
+    if not requested:
+        raise ValueError(f"No valid pages in '{page_ranges}'")
+    options = options or {}
+    detected, page_mapping = pdf_page_filter.resolve_page_mapping(
+        reader, pdf_path, verbose=False,
+        header_band=options.get('header_band'),
+        band_edges=options.get('band_edges', ('top',)),
+        use_cache=options.get('use_cache', True),
+        cache_dir=options.get('cache_dir'),
+        use_page_labels=options.get('use_page_labels', True),
+        metrics=metrics,
+        fingerprints=options.get('fingerprints'),
+    )
+    if not detected:
+        raise ValueError("No page numbers detected on any pages")
+    with pdf_page_filter._timed_stage(metrics, 'select'):
+        selected, missing = pdf_page_filter.select_printed_pages(
+            requested, pdf_page_filter.build_printed_to_physical(page_mapping))
+    if not selected:
+        raise ValueError(f"No page found with printed number(s) {missing}")
+    return [physical_idx for _, physical_idx in selected], missing
+
+
+def page_records(pages):
+    """
+    Extract stage: records from (physical index, text) pairs.
+
+    Args:
+        pages: Iterable of (physical index, page text), in page order
+
+    Yields:
+        SolubilityRecord tuples
+    """
+    context = None
+    for _, text in pages:
+        records, context = extract_page_records(text, context)
+        yield from records
+
+
+def row_batches(records, derive=False, batch_size=BATCH_SIZE):
+    """
+    Convert stage: CSV rows in batches of at most batch_size.
+
+    Args:
+        records: Iterable of SolubilityRecords
+        derive: Fill blank mass% and molality cells (see build_rows())
+        batch_size: Records converted at once
+
+    Yields:
+        Lists of row dictionaries keyed by FIELDNAMES
+    """
+    records = iter(records)
+    for batch in iter(lambda: list(islice(records, batch_size)), []):
+        yield build_rows(batch, verbose=False, derive=derive, extracted=True)
+
+
+def volume_batches(pdf_path, page_ranges=None, derive=False, options=None, summary=None):
+    """
+    Run the resolve, select, extract and convert stages for one volume.
+
+    Args:
+        pdf_path: Path to the source PDF
+        page_ranges: Printed page ranges to keep (default: every page)
+        derive: Fill blank mass% and molality cells (see build_rows())
+        options: Detection options (see resolve_pages()); with a fingerprints
+            index, pages already extracted are reused rather than extracted
+            again, or left out if skip_duplicate_pages is set
+        summary: Optional dict that receives 'pages' and 'missing_pages', and
+            with a fingerprints index the 'extracted', 'linked' and 'skipped'
+            page counts
+
+    Yields:
+        Lists of row dictionaries keyed by FIELDNAMES
+    """
+    options = options or {}
+    reader = PdfReader(pdf_path)
+    physical_indices, missing = resolve_pages(reader, pdf_path, page_ranges, options)
+    if summary is not None:
+        summary['pages'] = len(physical_indices)
+        summary['missing_pages'] = str(missing) if missing else ''
+    if options.get('fingerprints'):
+        records = page_fingerprints.volume_records(
+            pdf_path, options['fingerprints'], physical_indices, reader=reader,
+            skip_duplicates=options.get('skip_duplicate_pages', False), stats=summary)
+    else:
+        records = page_records(iter_page_texts(pdf_path, physical_indices, reader=reader))
+    yield from row_batches(records, derive=derive)
+
+
+def _produce(index, pdf_path, page_ranges, derive, options, queue):
+    """
+    Worker process: put ('rows', index, batch) messages on the queue, then
+    one ('done', index, summary) or ('error', index, message) message. The
+    summary's 'seconds' is the time spent on this volume alone.
+    """
+    start = time.perf_counter()
+    summary = {}
+    try:
+        for rows in volume_batches(pdf_path, page_ranges, derive, options, summary):
+            queue.put(('rows', index, rows))
+    except Exception as e:
+        queue.put(('error', index, f"{type(e).__name__}: {e}"))
+        return
+    summary['seconds'] = time.perf_counter() - start
+    queue.put(('done', index, summary))
+
+
+def _messages_inline(jobs, derive, options):
+    """Run every volume in this process, one after another, as pipeline messages."""
+    for index, job in enumerate(jobs):
+        start = time.perf_counter()
+        summary = {}
+        try:
+            for rows in volume_batches(job['input'], job.get('ranges'), derive, options, summary):
+                yield 'rows', index, rows
+        except Exception as e:
+            yield 'error', index, f"{type(e).__name__}: {e}"
+            continue
+        # Time spent on this volume, not counting the consumer's work on its batches
+        summary['seconds'] = time.perf_counter() - start
+        yield 'done', index, summary
+
+
+def _messages_parallel(jobs, derive, options, workers, buffer):
+    """Run volumes in a process pool; their batches arrive through a bounded queue."""
+    with multiprocessing.Manager() as manager:
+        queue = manager.Queue(maxsize=buffer)
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_produce, index, job['input'], job.get('ranges'),
+                                       derive, options, queue)
+                       for index, job in enumerate(jobs)]
+            pending = set(range(len(jobs)))
+            while pending:
+                try:
+                    message = queue.get(timeout=1.0)
+                except Empty:
+                    # A worker that died (killed, out of memory) never sends its
+                    # last message; report it instead of waiting forever
+                    for index in sorted(pending):
+                        error = futures[index].exception() if futures[index].done() else None
+                        if error is not None:
+                            pending.discard(index)
+                            yield 'error', index, f"{type(error).__name__}: {error}"
+                    continue
+                if message[0] != 'rows':
+                    pending.discard(message[1])
+                yield message
+
+
+class _VolumeSink:
+    """Store stage for one volume: a CSV written to a temporary path until done."""
+
+    def __init__(self, output_csv):
+        self.output_csv = Path(output_csv)
+        self.tmp_path = self.output_csv.with_name(f".{self.output_csv.name}.{os.getpid()}.tmp")
+        self._file = open(self.tmp_path, 'w', newline='', encoding='utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=FIELDNAMES)
+        self._writer.writeheader()
+        self.rows = 0
+        self.invalid = 0
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        self.rows += len(rows)
+        self.invalid += sum(1 for row in rows if row['Solubility_mass_percent'] != '' and
+                            float(row['Solubility_mass_percent']) > 100)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self.tmp_path, self.output_csv)
+
+    def discard(self):
+        self._file.close()
+        try:
+            os.unlink(self.tmp_path)
+        except OSError:
+            pass
+
+
+def run_pipeline(jobs, output_dir=None, db_path=None, columns_path=None, derive=False,
+                 workers=1, buffer=DEFAULT_BUFFER, options=None, verbose=True):
+    """
+    Stream source volumes into per-volume CSVs (and optionally a store and a
+    columnar table).
+
+    Each CSV is written to a temporary file and renamed when its volume
+    completes, so a failed volume never leaves a partial CSV. Completed
+    volumes are merged into the store by stable row key (see
+    SolubilityStore.merge_volume()), streaming their CSV back, so one
+    volume's rows are never all held in memory, under store_volume(volume)
+    so they never merge into curated rows. The columnar table is written
+    last, in job order.
+
+    Args:
+        jobs: List of {'input': PDF path, 'ranges': printed page ranges or
+            None, 'output': CSV path or None} dictionaries
+        output_dir: Directory for CSVs of jobs without 'output', created if
+            needed (default: next to each PDF)
+        db_path: Optional SQLite store to merge each volume into
+        columns_path: Optional columnar table of all volumes
+        derive: Fill blank mass% and molality cells (see build_rows())
+        workers: Volumes processed concurrently (1: in this process)
+        buffer: Row batches that may wait for the store stage
+        options: Detection options (see resolve_pages())
+        verbose: Print one line per volume
+
+    Returns:
+        List of per-job result dictionaries in job order; 'seconds' is the
+        time spent on that volume
+
+    Raises:
+        ValueError: If columns_path exists and is not a columnar table, two
+            jobs write the same output CSV (or, with db_path, the same
+            volume), or an output CSV is a hand-curated file (see
+            check_output_csv())
+    """
+    if columns_path:
+        check_table_path(columns_path)
+    options = options or {}
+    results = []
+    for job in jobs:
+        volume, output_csv = volume_paths(job['input'], output_dir)
+        results.append({
+            'input': str(job['input']), 'ranges': job.get('ranges') or '', 'volume': volume,
+            'output': str(job.get('output') or output_csv), 'status': 'error', 'pages': 0,
+            'missing_pages': '', 'rows': 0, 'invalid': 0, 'error': None,
+        })
+    # Before any work: refuse jobs that would overwrite each other's CSV or
+    # stored rows, refuse curated outputs and create the output directories
+    outputs = {}
+    volumes = {}
+    for result in results:
+        output = Path(result['output']).resolve()
+        if output in outputs:
+            raise ValueError(f"'{outputs[output]}' and '{result['input']}' both write '{result['output']}'")
+        outputs[output] = result['input']
+        if db_path:
+            if result['volume'] in volumes:
+                raise ValueError(f"'{volumes[result['volume']]}' and '{result['input']}' are both "
+                                 f"volume '{result['volume']}' in the store")
+            volumes[result['volume']] = result['input']
+    for result in results:
+        check_output_csv(result['output'])
+
+    workers = max(1, min(workers or 1, len(jobs) or 1))
+    if workers == 1:
+        messages = _messages_inline(jobs, derive, options)
+    else:
+        messages = _messages_parallel(jobs, derive, options, workers, max(1, buffer))
+
+    first_message = {}
+    sinks = {}
+    store = SolubilityStore(db_path) if db_path else None
+    try:
+        for kind, index, payload in messages:
+            result = results[index]
+            first_message.setdefault(index, time.perf_counter())
+            if kind == 'rows':
+                if index not in sinks:
+                    sinks[index] = _VolumeSink(result['output'])
+                sinks[index].write(payload)
+                continue
+
+            sink = sinks.pop(index, None) or _VolumeSink(result['output'])
+            if kind == 'error':
+                sink.discard()
+                result['error'] = payload
+            else:
+                sink.commit()
+                result.update(payload, status='ok', rows=sink.rows, invalid=sink.invalid)
+                if store is not None:
+                    with open(result['output'], 'r', newline='', encoding='utf-8') as f:
+                        store.merge_volume(csv.DictReader(f), store_volume(result['volume']))
+            if 'seconds' not in result:
+                # Failed volumes report no timing; count from their first message
+                result['seconds'] = time.perf_counter() - first_message[index]
+            if verbose:
+                detail = (f"{result['rows']} rows from {result['pages']} pages"
+                          if result['status'] == 'ok' else result['error'])
+                if result['status'] == 'ok' and (result.get('linked') or result.get('skipped')):
+                    detail += (f"; {result['linked']} pages reused, "
+                               f"{result['skipped']} duplicate pages skipped")
+                print(f"[{result['status']:>5}] {result['input']} -> {result['output']} "
+                      f"({detail}, {result['seconds']:.2f}s)")
+                if result['invalid']:
+                    print(f"  ⚠ WARNING: {result['invalid']} entries with mass% > 100!")
+                if result['missing_pages']:
+                    print(f"  No page found with printed number(s) {result['missing_pages']}")
+    finally:
+        for sink in sinks.values():
+            sink.discard()
+        if store is not None:
+            store.close()
+
+    if columns_path:
+        writer = ColumnWriter(columns_path)
+        for result in results:
+            if result['status'] == 'ok':
+                with open(result['output'], 'r', newline='', encoding='utf-8') as f:
+                    writer.append(csv.DictReader(f))
+        writer.close()
+        if verbose:
+            print(f"Wrote {writer.rows} rows to columnar table {columns_path}")
+    return results
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Extract solubility data straight from SDS volumes, without intermediate PDFs."
+    )
+    parser.add_argument('pdfs', nargs='*', help="Source SDS PDFs")
+    parser.add_argument('--pages', default=None, metavar='RANGES',
+                        help="Printed page ranges to extract from every PDF (default: all pages)")
+    parser.add_argument('--manifest', default=None,
+                        help="CSV/JSON/TOML manifest of input, ranges and output (CSV) columns, "
+                             "as for pdf_batch.py")
+    parser.add_argument('--output-dir', default=None,
+                        help="Directory for the CSVs (default: next to each PDF)")
+    parser.add_argument('--db', default=None, metavar='PATH', help="SQLite store to merge volumes into")
+    parser.add_argument('--columns', default=None, metavar='DIR',
+                        help="Also write every row to one columnar table")
+    parser.add_argument('--derive', action='store_true',
+                        help="Fill blank mass%% and molality cells from the salt's molar mass")
+    parser.add_argument('--workers', '-w', type=int, default=1, metavar='N',
+                        help="Process N volumes concurrently (default: 1)")
+    parser.add_argument('--buffer', type=int, default=DEFAULT_BUFFER, metavar='BATCHES',
+                        help=f"Row batches queued for the store stage (default: {DEFAULT_BUFFER})")
+    parser.add_argument('--header-band', type=float, nargs='?',
+                        const=pdf_page_filter.DEFAULT_HEADER_BAND, default=None,
+                        metavar='FRACTION', help="Detect page numbers from a header strip first")
+    parser.add_argument('--band-edge', choices=['top', 'bottom', 'both'], default='top',
+                        help="Which strip to scan in header-band mode (default: top)")
+    parser.add_argument('--no-page-labels', action='store_true',
+                        help="Ignore /PageLabels and always detect numbers from text")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Do not read or write the page map cache")
+    parser.add_argument('--cache-dir', default=None, help="Page map cache directory")
+    parser.add_argument('--fingerprints', default=None, metavar='PATH',
+                        help="Page fingerprint index: reuse pages already extracted from any volume "
+                             "(see page_fingerprints.py)")
+    parser.add_argument('--skip-duplicate-pages', action='store_true',
+                        help="With --fingerprints, leave out pages already extracted from another volume")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function to run the streaming pipeline."""
+    args = parse_args()
+    if args.workers < 1:
+        print("Error: --workers must be at least 1")
+        sys.exit(2)
+
+    if args.manifest:
+        try:
+            jobs = load_manifest(args.manifest)
+        except (OSError, ValueError) as e:
+            print(f"Error: Could not read manifest '{args.manifest}': {e}")
+            sys.exit(2)
+    else:
+        jobs = [{'input': pdf, 'ranges': args.pages, 'output': None} for pdf in args.pdfs]
+    if not jobs:
+        print("Error: No PDFs given (pass PDFs or --manifest)")
+        sys.exit(2)
+    if args.skip_duplicate_pages and not args.fingerprints:
+        print("Error: --skip-duplicate-pages needs --fingerprints")
+        sys.exit(2)
+    missing = [job['input'] for job in jobs if not os.path.exists(job['input'])]
+    if missing:
+        print(f"Error: File(s) not found: {', '.join(missing)}")
+        sys.exit(2)
+
+    options = {
+        'header_band': args.header_band,
+        'band_edges': ('top', 'bottom') if args.band_edge == 'both' else (args.band_edge,),
+        'use_cache': not args.no_cache,
+        'cache_dir': args.cache_dir,
+        'use_page_labels': not args.no_page_labels,
+        'fingerprints': args.fingerprints,
+        'skip_duplicate_pages': args.skip_duplicate_pages,
+    }
+    start = time.perf_counter()
+    try:
+        results = run_pipeline(jobs, output_dir=args.output_dir, db_path=args.db,
+                               columns_path=args.columns, derive=args.derive, workers=args.workers,
+                               buffer=args.buffer, options=options)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    failed = [result for result in results if result['status'] != 'ok']
+    print(f"{len(results) - len(failed)}/{len(results)} volume(s) extracted, "
+          f"{sum(result['rows'] for result in results)} rows in {time.perf_counter() - start:.2f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+SQLite store for solubility data merged across SDS volumes.
+
+Rows use the same field names as the CSVs written by
+extract_solubility_complete.py and are split over three tables:
+
+    salts          one row per salt formula, with its CAS number
+    refs           one row per (authors, journal, year) reference
+    measurements   one row per data point, pointing at a salt and a reference
+
+Indexes on CAS number, salt and (salt, temperature) make lookups such as
+"all Nd(NO3)3 points between 20 and 40 °C" an index range scan instead of a
+CSV scan. Missing values are stored as NULL and read back as "".
+"""
+
+import sqlite3
+from contextlib import contextmanager
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS salts (
+    id INTEGER PRIMARY KEY,
+    formula TEXT NOT NULL,
+    cas TEXT NOT NULL DEFAULT '',
+    UNIQUE (formula, cas)
+);
+CREATE TABLE IF NOT EXISTS refs (
+    id INTEGER PRIMARY KEY,
+    authors TEXT NOT NULL,
+    journal TEXT NOT NULL,
+    year TEXT NOT NULL,
+    UNIQUE (authors, journal, year)
+);
+CREATE TABLE IF NOT EXISTS measurements (
+    id INTEGER PRIMARY KEY,
+    volume TEXT NOT NULL DEFAULT '',
+    salt_id INTEGER NOT NULL REFERENCES salts (id),
+    ref_id INTEGER NOT NULL REFERENCES refs (id),
+    temperature_c REAL,
+    mass_satd_g REAL,
+    mass_oxide_g REAL,
+    g_per_100g_old REAL,
+    g_per_100g_new REAL,
+    mass_percent REAL,
+    molality REAL,
+    solid_phase TEXT NOT NULL DEFAULT '',
+    notes TEXT NOT NULL DEFAULT '',
+    row_key TEXT
+);
+CREATE INDEX IF NOT EXISTS salts_cas ON salts (cas);
+CREATE INDEX IF NOT EXISTS measurements_salt_temperature ON measurements (salt_id, temperature_c);
+CREATE INDEX IF NOT EXISTS measurements_temperature ON measurements (temperature_c);
+CREATE INDEX IF NOT EXISTS measurements_volume ON measurements (volume);
+"""
+
+# Created after the row_key column is guaranteed to exist (older stores lack it)
+ROW_KEY_INDEX = """
+CREATE UNIQUE INDEX IF NOT EXISTS measurements_row_key ON measurements (volume, row_key);
+"""
+
+# CSV field -> measurements column, for the numeric fields
+NUMERIC_FIELDS = {
+    'Temperature_C': 'temperature_c',
+    'Mass_Saturated_Solution_g': 'mass_satd_g',
+    'Mass_Oxide_g': 'mass_oxide_g',
+    'Solubility_g_per_100g_H2O_old_masses': 'g_per_100g_old',
+    'Solubility_g_per_100g_H2O_new_masses': 'g_per_100g_new',
+    'Solubility_mass_percent': 'mass_percent',
+    'Solubility_mol_per_kg': 'molality',
+}
+
+_SELECT = """
+SELECT m.volume, s.formula, s.cas, {numeric}, m.solid_phase, r.authors, r.journal, r.year, m.notes
+FROM measurements m
+JOIN salts s ON s.id = m.salt_id
+JOIN refs r ON r.id = m.ref_id
+""".format(numeric=', '.join(f'm.{column}' for column in NUMERIC_FIELDS.values()))
+
+# measurements columns written for each row (besides id and row_key)
+_COLUMNS = (['volume', 'salt_id', 'ref_id'] + list(NUMERIC_FIELDS.values()) +
+            ['solid_phase', 'notes'])
+
+_ROW_FIELDS = (['Volume', 'Salt', 'CAS_Number'] + list(NUMERIC_FIELDS) +
+               ['Solid_Phase', 'Reference', 'Journal', 'Year', 'Additional_Conditions'])
+
+
+def _number(value):
+    """CSV cell -> REAL or NULL."""
+    if value is None or value == '':
+        return None
+    return float(value)
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _cas(value):
+    """CAS number without the brackets the extractor prints, e.g. '13465-60-6'."""
+    return _text(value).strip().strip('[]').strip()
+
+
+def row_keys(rows, counts=None):
+    """
+    Stable keys identifying rows across rebuilds.
+
+    A key is salt, temperature and reference plus a duplicate index that
+    numbers repeated (salt, temperature, reference) points in row order, so
+    re-extracting unchanged data always yields the same keys.
+
+    Args:
+        rows: Iterable of dictionaries keyed by the CSV field names
+        counts: Dictionary of occurrences seen so far, updated in place
+            (pass the same one for consecutive batches of one volume)
+
+    Returns:
+        List of key strings, e.g. 'Y(NO3)3|22.5|Crew, M.C.; ...|1'
+    """
+    counts = {} if counts is None else counts
+    keys = []
+    for row in rows:
+        temperature = _number(row.get('Temperature_C'))
+        base = (_text(row['Salt']), '' if temperature is None else f"{temperature:g}",
+                _text(row.get('Reference')))
+        counts[base] = counts.get(base, -1) + 1
+        keys.append('|'.join(base + (str(counts[base]),)))
+    return keys
+
+
+class SolubilityStore:
+    """
+    Solubility measurements in a SQLite database.
+
+    Usable as a context manager; the connection is closed on exit.
+    """
+
+    def __init__(self, path):
+        """
+        Open (and create if needed) a store.
+
+        Args:
+            path: Database file path, or ':memory:'
+        """
+        self.path = str(path)
+        # Autocommit mode: transactions are opened explicitly by transaction()
+        self._conn = sqlite3.connect(self.path, isolation_level=None)
+        self._conn.execute('PRAGMA foreign_keys = ON')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(measurements)')}
+        if 'row_key' not in columns:
+            self._conn.execute('ALTER TABLE measurements ADD COLUMN row_key TEXT')
+        self._conn.executescript(ROW_KEY_INDEX)
+        self._depth = 0
+        self._salt_ids = {}
+        self._ref_ids = {}
+        self._normalize_cas()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Close the database connection."""
+        self._conn.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Group writes into one transaction (nested calls join the outer one).
+
+        The transaction is committed when the outermost block exits and
+        rolled back if it raises.
+        """
+        if self._depth == 0:
+            self._conn.execute('BEGIN')
+        self._depth += 1
+        try:
+            yield self
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute('ROLLBACK')
+                # Ids cached during the transaction may have been rolled back
+                self._salt_ids.clear()
+                self._ref_ids.clear()
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            self._conn.execute('COMMIT')
+
+    def _normalize_cas(self):
+        """Strip the brackets from CAS numbers in stores written before _cas()."""
+        bracketed = self._conn.execute(
+            "SELECT id, formula, cas FROM salts WHERE cas LIKE '[%' OR cas LIKE '%]'").fetchall()
+        if not bracketed:
+            return
+        with self.transaction():
+            for salt_id, formula, cas in bracketed:
+                existing = self._conn.execute('SELECT id FROM salts WHERE formula = ? AND cas = ?',
+                                              (formula, _cas(cas))).fetchone()
+                if existing is None:
+                    self._conn.execute('UPDATE salts SET cas = ? WHERE id = ?', (_cas(cas), salt_id))
+                else:
+                    self._conn.execute('UPDATE measurements SET salt_id = ? WHERE salt_id = ?',
+                                       (existing[0], salt_id))
+                    self._conn.execute('DELETE FROM salts WHERE id = ?', (salt_id,))
+
+    def _salt_id(self, formula, cas):
+        key = (formula, cas)
+        if key not in self._salt_ids:
+            self._conn.execute('INSERT OR IGNORE INTO salts (formula, cas) VALUES (?, ?)', key)
+            self._salt_ids[key] = self._conn.execute(
+                'SELECT id FROM salts WHERE formula = ? AND cas = ?', key).fetchone()[0]
+        return self._salt_ids[key]
+
+    def _ref_id(self, authors, journal, year):
+        key = (authors, journal, year)
+        if key not in self._ref_ids:
+            self._conn.execute('INSERT OR IGNORE INTO refs (authors, journal, year) VALUES (?, ?, ?)', key)
+            self._ref_ids[key] = self._conn.execute(
+                'SELECT id FROM refs WHERE authors = ? AND journal = ? AND year = ?', key).fetchone()[0]
+        return self._ref_ids[key]
+
+    def _values(self, rows, volume):
+        """Parameter tuples for the _COLUMNS of each row."""
+        for row in rows:
+            yield (
+                volume,
+                self._salt_id(_text(row['Salt']), _cas(row.get('CAS_Number'))),
+                self._ref_id(_text(row.get('Reference')), _text(row.get('Journal')),
+                             _text(row.get('Year'))),
+                *(_number(row.get(field)) for field in NUMERIC_FIELDS),
+                _text(row.get('Solid_Phase')),
+                _text(row.get('Additional_Conditions')),
+            )
+
+    def insert_rows(self, rows, volume=''):
+        """
+        Append CSV-style rows in one transaction, without row keys.
+
+        Use merge_volume() for rows that should be updated in place by later
+        rebuilds.
+
+        Args:
+            rows: Iterable of dictionaries keyed by the CSV field names
+            volume: Volume the rows came from (e.g. 'SDS-13')
+
+        Returns:
+            Number of rows inserted
+        """
+        with self.transaction():
+            return self._conn.executemany(
+                f"INSERT INTO measurements ({', '.join(_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+                self._values(rows, volume)).rowcount
+
+    def merge_volume(self, rows, volume):
+        """
+        Make a volume's measurements equal to rows, keyed by row_keys().
+
+        Rows whose key already exists are updated only if a value changed,
+        new keys are inserted and keys no longer present are deleted, all in
+        one transaction. Merging the same rows twice changes nothing, and
+        unchanged measurements keep their ids.
+
+        Args:
+            rows: Iterable of dictionaries keyed by the CSV field names
+            volume: Volume the rows came from (e.g. 'SDS-13')
+
+        Returns:
+            Tuple (rows merged, measurements deleted)
+        """
+        counts = {}
+        seen = []
+
+        def values():
+            for row in rows:
+                key = row_keys([row], counts)[0]
+                seen.append(key)
+                yield next(self._values([row], volume)) + (key,)
+
+        updates = ', '.join(f"{column} = excluded.{column}" for column in _COLUMNS[1:])
+        changed = ' OR '.join(f"{column} IS NOT excluded.{column}" for column in _COLUMNS[1:])
+        with self.transaction():
+            self._conn.executemany(
+                f"INSERT INTO measurements ({', '.join(_COLUMNS)}, row_key) "
+                f"VALUES ({', '.join('?' * (len(_COLUMNS) + 1))}) "
+                f"ON CONFLICT (volume, row_key) DO UPDATE SET {updates} WHERE {changed}",
+                values())
+            self._conn.execute('CREATE TEMP TABLE IF NOT EXISTS merge_keys (row_key TEXT PRIMARY KEY)')
+            self._conn.execute('DELETE FROM merge_keys')
+            self._conn.executemany('INSERT OR IGNORE INTO merge_keys VALUES (?)', ((key,) for key in seen))
+            deleted = self._conn.execute(
+                'DELETE FROM measurements WHERE volume = ? AND '
+                '(row_key IS NULL OR row_key NOT IN (SELECT row_key FROM merge_keys))', (volume,)).rowcount
+        return len(seen), deleted
+
+    def delete_volume(self, volume):
+        """
+        Remove every measurement of one volume (e.g. before re-importing it).
+
+        Returns:
+            Number of measurements removed
+        """
+        with self.transaction():
+            return self._conn.execute('DELETE FROM measurements WHERE volume = ?', (volume,)).rowcount
+
+    def query(self, salt=None, cas=None, temp_min=None, temp_max=None, volume=None):
+        """
+        Look up measurements.
+
+        Args:
+            salt: Salt formula, e.g. 'Nd(NO3)3'
+            cas: CAS number, with or without brackets, e.g. '10045-95-1'
+                or '[10045-95-1]'
+            temp_min: Lowest temperature in °C (inclusive)
+            temp_max: Highest temperature in °C (inclusive)
+            volume: Only rows from this volume
+
+        Returns:
+            List of dictionaries keyed by the CSV field names plus 'Volume',
+            ordered by salt and temperature
+        """
+        clauses = []
+        params = []
+        for clause, value in (('s.formula = ?', salt),
+                              ('s.cas = ?', None if cas is None else _cas(cas)),
+                              ('m.temperature_c >= ?', temp_min),
+                              ('m.temperature_c <= ?', temp_max), ('m.volume = ?', volume)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        sql = _SELECT
+        if clauses:
+            sql += 'WHERE ' + ' AND '.join(clauses) + '\n'
+        sql += 'ORDER BY s.formula, m.temperature_c, m.id'
+        return [{field: '' if value is None else value for field, value in zip(_ROW_FIELDS, row)}
+                for row in self._conn.execute(sql, params)]
+
+    def salts(self):
+        """List of (formula, CAS number, measurement count), ordered by formula."""
+        return self._conn.execute(
+            'SELECT s.formula, s.cas, COUNT(m.id) FROM salts s '
+            'LEFT JOIN measurements m ON m.salt_id = s.id '
+            'GROUP BY s.id ORDER BY s.formula, s.cas').fetchall()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Columnar unit conversions for solubility data.
+
+Solubilities of a salt in water are reported in three interchangeable units:
+
+    mass %          g salt / 100 g saturated solution
+    g/100 g H2O     g salt / 100 g water
+    mol/kg          mol salt / kg water (molality)
+
+Every function here takes whole columns as NumPy arrays and converts them in
+one vectorised pass. Missing values are NaN (never "") and simply propagate,
+so a column can be converted without filtering it first. Conversions that
+involve molality also need the molar mass of the salt in g/mol, either one
+value for the whole column or one per row.
+"""
+
+import numpy as np
+
+# Units understood by derive_columns()
+UNITS = ('mass_percent', 'g_per_100g', 'molality')
+
+
+def to_array(values):
+    """
+    Convert a column of numbers to a float array.
+
+    Args:
+        values: Iterable of numbers, numeric strings, "" or None
+
+    Returns:
+        1-D float64 array with NaN for "" and None
+    """
+    if isinstance(values, np.ndarray):
+        return values.astype(float, copy=False)
+    return np.array([np.nan if value is None or value == '' else float(value)
+                     for value in values], dtype=float)
+
+
+def to_values(array, decimals=None):
+    """
+    Convert a float array back to a list of CSV values.
+
+    Args:
+        array: 1-D float array
+        decimals: Round to this many decimals (default: no rounding)
+
+    Returns:
+        List of Python floats, with "" for NaN
+    """
+    if decimals is not None:
+        array = np.round(array, decimals)
+    return ['' if np.isnan(value) else float(value) for value in array.tolist()]
+
+
+def mass_percent_from_g_per_100g(g_per_100g):
+    """Convert g salt / 100 g H2O to mass %."""
+    g_per_100g = to_array(g_per_100g)
+    return 100.0 * g_per_100g / (100.0 + g_per_100g)
+
+
+def g_per_100g_from_mass_percent(mass_percent):
+    """Convert mass % to g salt / 100 g H2O (infinite at 100 %)."""
+    mass_percent = to_array(mass_percent)
+    with np.errstate(divide='ignore'):
+        return 100.0 * mass_percent / (100.0 - mass_percent)
+
+
+def molality_from_g_per_100g(g_per_100g, molar_mass):
+    """Convert g salt / 100 g H2O to mol/kg."""
+    return 10.0 * to_array(g_per_100g) / np.asarray(molar_mass, dtype=float)
+
+
+def g_per_100g_from_molality(molality, molar_mass):
+    """Convert mol/kg to g salt / 100 g H2O."""
+    return to_array(molality) * np.asarray(molar_mass, dtype=float) / 10.0
+
+
+def molality_from_mass_percent(mass_percent, molar_mass):
+    """Convert mass % to mol/kg."""
+    return molality_from_g_per_100g(g_per_100g_from_mass_percent(mass_percent), molar_mass)
+
+
+def mass_percent_from_molality(molality, molar_mass):
+    """Convert mol/kg to mass %."""
+    return mass_percent_from_g_per_100g(g_per_100g_from_molality(molality, molar_mass))
+
+
+def derive_columns(mass_percent=None, g_per_100g=None, molality=None, molar_mass=None):
+    """
+    Fill every unit column from whichever unit each row was reported in.
+
+    Reported values are never overwritten. A missing cell is computed from
+    g/100 g H2O if the row has it, otherwise from mass %, otherwise from
+    molality; conversions to or from molality need molar_mass and stay NaN
+    where it is NaN or not given.
+
+    Args:
+        mass_percent: Column of mass % values
+        g_per_100g: Column of g salt / 100 g H2O values
+        molality: Column of mol/kg values
+        molar_mass: Molar mass in g/mol, scalar or one per row
+
+    Returns:
+        Dictionary with 'mass_percent', 'g_per_100g' and 'molality' arrays
+
+    Raises:
+        ValueError: If no column is given or the columns differ in length
+    """
+    given = {unit: to_array(column) for unit, column in
+             zip(UNITS, (mass_percent, g_per_100g, molality)) if column is not None}
+    if not given:
+        raise ValueError("At least one of mass_percent, g_per_100g or molality is required")
+    lengths = {len(column) for column in given.values()}
+    if len(lengths) != 1:
+        raise ValueError(f"Columns differ in length: {sorted(lengths)}")
+    empty = np.full(lengths.pop(), np.nan)
+    mass = given.get('mass_percent', empty)
+    g100 = given.get('g_per_100g', empty)
+    molal = given.get('molality', empty)
+    molar_mass = np.nan if molar_mass is None else molar_mass
+
+    # g/100 g H2O is the hub: every other unit converts through it
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hub = np.where(np.isnan(g100), g_per_100g_from_mass_percent(mass), g100)
+        hub = np.where(np.isnan(hub), g_per_100g_from_molality(molal, molar_mass), hub)
+        return {
+            'mass_percent': np.where(np.isnan(mass), mass_percent_from_g_per_100g(hub), mass),
+            'g_per_100g': hub,
+            'molality': np.where(np.isnan(molal), molality_from_g_per_100g(hub, molar_mass), molal),
+        }
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+"""
+Consistency validation for solubility datasets.
+
+Every check runs column-wise over the whole dataset with NumPy:
+
+    range        mass % outside (0, 100], negative g/100 g H2O or molality,
+                 missing temperature
+    g_per_100g   reported mass % disagrees with the mass % computed from
+                 g/100 g H2O (skipped for mass_percent-format rows, whose
+                 g/100 g H2O column repeats the mass % by convention)
+    molality     reported molality disagrees with the molality computed from
+                 mass % and the salt's molar mass (1977 atomic masses)
+    duplicate    measurements of the same salt and solid phase at the same
+                 temperature whose mass % spread exceeds a tolerance
+    monotonic    a temperature that reverses the direction of the rest of its
+                 (reference, salt, solid phase) series, in table order
+
+Input is one or more solubility CSVs or a columnar table (see
+solubility_columns.py). The report is JSON: counts per check plus one entry
+per flagged row, with its 0-based row number across all inputs.
+
+With --against, the input is also compared point by point with a curated
+dataset: the regression check for the PDF extractor, which reports how many
+reference points it recovers and which recovered values disagree.
+
+Usage:
+    python solubility_validate.py SDS-13_solubility_data_COMPLETE.csv --report report.json
+    python solubility_validate.py SDS-13_extracted.csv --against SDS-13_solubility_data_COMPLETE.csv
+"""
+
+import csv
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from molar_mass import molar_masses
+from solubility_units import to_array, mass_percent_from_g_per_100g, molality_from_mass_percent
+
+CHECKS = ('range', 'g_per_100g', 'molality', 'duplicate', 'monotonic')
+
+# Default tolerances
+MASS_PERCENT_TOLERANCE = 0.1     # mass % points between reported and converted values
+MOLALITY_TOLERANCE = 0.01        # relative difference between reported and computed molality
+DUPLICATE_TOLERANCE = 1.0        # mass % spread allowed between duplicate measurements
+
+NUMERIC_COLUMNS = {
+    'temperature': 'Temperature_C',
+    'g_per_100g': 'Solubility_g_per_100g_H2O_new_masses',
+    'mass_percent': 'Solubility_mass_percent',
+    'molality': 'Solubility_mol_per_kg',
+}
+STRING_COLUMNS = {
+    'salt': 'Salt',
+    'solid_phase': 'Solid_Phase',
+    'reference': 'Reference',
+}
+
+
+def _encode(values):
+    """Dictionary-encode strings: (int64 codes, list of distinct values)."""
+    categories = {}
+    codes = np.fromiter((categories.setdefault(value, len(categories)) for value in values),
+                        dtype=np.int64)
+    return codes, list(categories)
+
+
+def columns_from_rows(rows):
+    """
+    Build validator columns from CSV-style rows.
+
+    Args:
+        rows: List of dictionaries keyed by the CSV field names
+
+    Returns:
+        Dictionary of float arrays (temperature, g_per_100g, mass_percent,
+        molality) and (codes, categories) pairs (salt, solid_phase, reference)
+    """
+    columns = {name: to_array([row.get(field, '') for row in rows])
+               for name, field in NUMERIC_COLUMNS.items()}
+    columns.update({name: _encode(str(row.get(field, '')) for row in rows)
+                    for name, field in STRING_COLUMNS.items()})
+    return columns
+
+
+def columns_from_table(table):
+    """
+    Build validator columns from a ColumnTable without decoding strings.
+
+    Args:
+        table: ColumnTable from solubility_columns.read_columns()
+
+    Returns:
+        Same layout as columns_from_rows()
+    """
+    columns = {name: np.asarray(table[field], dtype=float) for name, field in NUMERIC_COLUMNS.items()}
+    for name, field in STRING_COLUMNS.items():
+        # Missing values (-1) become one extra category, ""
+        codes = np.asarray(table[field], dtype=np.int64)
+        categories = list(table.categories[field]) + ['']
+        columns[name] = (np.where(codes < 0, len(categories) - 1, codes), categories)
+    return columns
+
+
+def _group_codes(*code_arrays):
+    """Combine several code arrays into one group id per row."""
+    combined = np.zeros(len(code_arrays[0]), dtype=np.int64)
+    size = 1
+    for codes in code_arrays:
+        width = int(codes.max(initial=0)) + 1
+        if size * width >= 2 ** 62:
+            # Renumber densely so the product does not overflow int64
+            combined = np.unique(combined, return_inverse=True)[1].reshape(-1)
+            size = int(combined.max(initial=0)) + 1
+        combined = combined * width + codes
+        size *= width
+    return np.unique(combined, return_inverse=True)[1].reshape(-1)
+
+
+def validate(columns, mass_tolerance=MASS_PERCENT_TOLERANCE, molality_tolerance=MOLALITY_TOLERANCE,
+             duplicate_tolerance=DUPLICATE_TOLERANCE):
+    """
+    Run every check over the dataset.
+
+    Args:
+        columns: Output of columns_from_rows() or columns_from_table()
+        mass_tolerance: Allowed |mass % - mass % from g/100 g H2O|
+        molality_tolerance: Allowed relative molality difference
+        duplicate_tolerance: Allowed mass % spread between duplicates
+
+    Returns:
+        Dictionary of check name -> (boolean row mask, dict of detail arrays)
+    """
+    temperature = columns['temperature']
+    mass = columns['mass_percent']
+    g100 = columns['g_per_100g']
+    molal = columns['molality']
+    salt_codes, salt_names = columns['salt']
+    solid_codes, _ = columns['solid_phase']
+    ref_codes, _ = columns['reference']
+    results = {}
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Range
+        results['range'] = (
+            np.isnan(temperature) | (mass <= 0) | (mass > 100) | (g100 < 0) | (molal < 0),
+            {'mass_percent': mass},
+        )
+
+        # mass % against g/100 g H2O, except in mass_percent-format rows,
+        # where the g/100 g H2O column holds the mass % itself
+        converted = mass_percent_from_g_per_100g(g100)
+        difference = np.abs(converted - mass)
+        mass_percent_format = g100 == mass
+        results['g_per_100g'] = ((difference > mass_tolerance) & ~mass_percent_format,
+                                 {'mass_percent': mass, 'expected': converted})
+
+        # molality against mass % through the molar mass; each salt resolved once
+        masses = molar_masses(salt_names)[salt_codes] if len(salt_names) else np.empty(0)
+        computed = molality_from_mass_percent(mass, masses)
+        relative = np.abs(computed - molal) / molal
+        results['molality'] = (relative > molality_tolerance,
+                               {'molality': molal, 'expected': computed})
+
+    # Duplicates: same salt, solid phase and temperature, spread of mass % too wide
+    known = ~np.isnan(temperature) & ~np.isnan(mass)
+    rounded = np.round(np.where(np.isnan(temperature), 0.0, temperature), 2)
+    _, temp_codes = np.unique(rounded, return_inverse=True)
+    groups = _group_codes(salt_codes, solid_codes, temp_codes.reshape(-1))
+    groups = np.where(known, groups, -1)
+    n_groups = int(groups.max(initial=-1)) + 1
+    low = np.full(n_groups, np.inf)
+    high = np.full(n_groups, -np.inf)
+    count = np.zeros(n_groups, dtype=np.int64)
+    np.minimum.at(low, groups[known], mass[known])
+    np.maximum.at(high, groups[known], mass[known])
+    np.add.at(count, groups[known], 1)
+    spread = np.where(known, (high - low)[np.maximum(groups, 0)], np.nan)
+    with np.errstate(invalid='ignore'):
+        duplicate = known & (count[np.maximum(groups, 0)] > 1) & (spread > duplicate_tolerance)
+    results['duplicate'] = (duplicate, {'mass_percent': mass, 'spread': spread})
+
+    # Monotonic temperatures within each (reference, salt, solid phase) series
+    series = _group_codes(ref_codes, salt_codes, solid_codes)
+    order = np.argsort(series, kind='stable')
+    ordered_series = series[order]
+    step = np.diff(temperature[order])
+    same = ordered_series[1:] == ordered_series[:-1]
+    sign = np.where(same & ~np.isnan(step), np.sign(step), 0.0)
+    n_series = int(series.max(initial=-1)) + 1
+    direction = np.zeros(n_series)
+    np.add.at(direction, ordered_series[1:], sign)
+    expected = np.sign(direction)[ordered_series[1:]]
+    reversed_step = (sign != 0) & (expected != 0) & (sign != expected)
+    monotonic = np.zeros(len(temperature), dtype=bool)
+    monotonic[order[1:][reversed_step]] = True
+    previous = np.full(len(temperature), np.nan)
+    previous[order[1:]] = np.where(same, temperature[order[:-1]], np.nan)
+    results['monotonic'] = (monotonic, {'previous_temperature': previous})
+
+    return results
+
+
+def _mass_percent(columns):
+    """Mass % per row, computed from g/100 g H2O where it was not reported."""
+    mass = columns['mass_percent']
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(np.isnan(mass), mass_percent_from_g_per_100g(columns['g_per_100g']), mass)
+
+
+def compare_reference(columns, reference, mass_tolerance=MASS_PERCENT_TOLERANCE):
+    """
+    Compare a dataset with a curated reference dataset point by point.
+
+    A reference point is found when the dataset has a row for the same salt
+    at the same temperature, and matches when one of those rows also agrees
+    on mass % within the tolerance (points without a mass % match on
+    temperature alone).
+
+    Args:
+        columns: Validator columns of the dataset under test
+        reference: Validator columns of the reference dataset
+        mass_tolerance: Allowed mass % difference
+
+    Returns:
+        Dictionary with 'points', 'found' and 'matched' counts, per-salt
+        counts under 'salts', and one entry per reference point that is
+        missing or disagrees under 'differences'
+    """
+    salt_codes, salt_names = columns['salt']
+    mass = _mass_percent(columns)
+    found = {}
+    for salt, temperature, value in zip(np.asarray(salt_names + [''], dtype=object)[salt_codes],
+                                        np.round(columns['temperature'], 2).tolist(), mass.tolist()):
+        found.setdefault((salt, temperature), []).append(value)
+
+    ref_codes, ref_names = reference['salt']
+    ref_mass = _mass_percent(reference)
+    salts = {}
+    differences = []
+    for salt, temperature, value in zip(np.asarray(ref_names + [''], dtype=object)[ref_codes],
+                                        np.round(reference['temperature'], 2).tolist(),
+                                        ref_mass.tolist()):
+        counts = salts.setdefault(salt, {'points': 0, 'found': 0, 'matched': 0})
+        counts['points'] += 1
+        candidates = found.get((salt, temperature))
+        if candidates is None:
+            differences.append({'salt': salt, 'temperature': temperature, 'mass_percent': value,
+                                'found': None})
+            continue
+        counts['found'] += 1
+        if value != value or any(abs(candidate - value) <= mass_tolerance for candidate in candidates):
+            counts['matched'] += 1
+        else:
+            differences.append({'salt': salt, 'temperature': temperature, 'mass_percent': value,
+                                'found': [None if c != c else round(c, 6) for c in candidates]})
+
+    return {
+        'points': sum(counts['points'] for counts in salts.values()),
+        'found': sum(counts['found'] for counts in salts.values()),
+        'matched': sum(counts['matched'] for counts in salts.values()),
+        'salts': salts,
+        'differences': differences,
+    }
+
+
+def _values(array, index):
+    """Report values for the given rows: rounded floats, None where missing."""
+    values = np.round(np.asarray(array, dtype=float)[index], 6)
+    return [None if value != value else value for value in values.tolist()]
+
+
+def build_report(columns, results, sources=None, seconds=None):
+    """
+    Turn check results into a JSON-serialisable report.
+
+    Issues are ordered by row, then by check.
+
+    Args:
+        columns: Validator columns
+        results: Output of validate()
+        sources: Optional list of {'path', 'first_row', 'rows'} dictionaries
+        seconds: Optional validation time
+
+    Returns:
+        Report dictionary
+    """
+    temperature = columns['temperature']
+    strings = {name: np.array(columns[name][1] + [''], dtype=object)
+               for name in STRING_COLUMNS}
+
+    flagged = [np.flatnonzero(results[check][0]) for check in CHECKS]
+    rows = np.concatenate(flagged) if flagged else np.empty(0, dtype=np.int64)
+    checks = np.repeat(np.arange(len(CHECKS)), [len(index) for index in flagged])
+    position = np.lexsort((checks, rows))
+
+    # Build every field for all issues at once, then zip them into dictionaries
+    issues = []
+    for check, index in zip(CHECKS, flagged):
+        fields = {
+            'row': index.tolist(),
+            **{name: strings[name][columns[name][0][index]].tolist() for name in STRING_COLUMNS},
+            'temperature': _values(temperature, index),
+            **{name: _values(values, index) for name, values in results[check][1].items()},
+        }
+        names = list(fields)
+        issues.extend({'check': check, **dict(zip(names, values))}
+                      for values in zip(*fields.values()))
+    issues = [issues[i] for i in position.tolist()]
+
+    report = {
+        'rows': int(len(temperature)),
+        'flagged_rows': int(len(np.unique(rows))),
+        'checks': {check: int(len(index)) for check, index in zip(CHECKS, flagged)},
+        'issues': issues,
+    }
+    if sources is not None:
+        report['sources'] = sources
+    if seconds is not None:
+        report['seconds'] = seconds
+    return report
+
+
+def load_inputs(paths):
+    """
+    Load CSVs and columnar tables into validator columns.
+
+    Args:
+        paths: CSV files and/or columnar table directories
+
+    Returns:
+        Tuple (columns, sources)
+    """
+    from solubility_columns import read_columns
+
+    if len(paths) == 1 and Path(paths[0]).is_dir():
+        table = read_columns(paths[0])
+        return columns_from_table(table), [{'path': str(paths[0]), 'first_row': 0, 'rows': len(table)}]
+
+    rows = []
+    sources = []
+    for path in paths:
+        if Path(path).is_dir():
+            table = read_columns(path)
+            new_rows = table.to_rows()
+        else:
+            with open(path, 'r', newline='', encoding='utf-8') as f:
+                new_rows = list(csv.DictReader(f))
+        sources.append({'path': str(path), 'first_row': len(rows), 'rows': len(new_rows)})
+        rows.extend(new_rows)
+    return columns_from_rows(rows), sources
+
+
+def parse_args(argv=None):
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description="Validate solubility data: unit cross-checks, duplicates and temperature order."
+    )
+    parser.add_argument('inputs', nargs='+', help="Solubility CSV(s) or a columnar table directory")
+    parser.add_argument('--report', default=None, metavar='PATH', help="Write the JSON report to PATH")
+    parser.add_argument('--mass-tolerance', type=float, default=MASS_PERCENT_TOLERANCE,
+                        help=f"Allowed mass %% difference (default: {MASS_PERCENT_TOLERANCE})")
+    parser.add_argument('--molality-tolerance', type=float, default=MOLALITY_TOLERANCE,
+                        help=f"Allowed relative molality difference (default: {MOLALITY_TOLERANCE})")
+    parser.add_argument('--duplicate-tolerance', type=float, default=DUPLICATE_TOLERANCE,
+                        help=f"Allowed mass %% spread between duplicates (default: {DUPLICATE_TOLERANCE})")
+    parser.add_argument('--against', default=None, metavar='PATH',
+                        help="Curated CSV or columnar table to compare the input with point by point")
+    parser.add_argument('--min-coverage', type=float, default=0.0, metavar='FRACTION',
+                        help="With --against, exit with 1 only when fewer of its points are matched "
+                             "(default: 0)")
+    return parser.parse_args(argv)
+
+
+def main():
+    """Main function to validate solubility data."""
+    args = parse_args()
+    try:
+        columns, sources = load_inputs(args.inputs)
+        reference = load_inputs([args.against])[0] if args.against else None
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not load input: {e}")
+        sys.exit(2)
+
+    start = time.perf_counter()
+    results = validate(columns, mass_tolerance=args.mass_tolerance,
+                       molality_tolerance=args.molality_tolerance,
+                       duplicate_tolerance=args.duplicate_tolerance)
+    seconds = time.perf_counter() - start
+    report = build_report(columns, results, sources=sources, seconds=seconds)
+
+    print(f"Validated {report['rows']} rows in {seconds:.3f}s")
+    for check, count in report['checks'].items():
+        print(f"  {check:<12} {count:>6} flagged")
+    for issue in report['issues'][:10]:
+        print(f"  row {issue['row']}: {issue['check']} - {issue['salt']} at {issue['temperature']} °C "
+              f"({issue['reference']})")
+    if len(report['issues']) > 10:
+        print(f"  ... {len(report['issues']) - 10} more")
+
+    failed = bool(report['issues'])
+    if reference is not None:
+        comparison = compare_reference(columns, reference, mass_tolerance=args.mass_tolerance)
+        report['reference'] = {'path': str(args.against), **comparison}
+        points = comparison['points']
+        coverage = comparison['matched'] / points if points else 1.0
+        print(f"Against '{args.against}': {comparison['matched']}/{points} points matched "
+              f"({coverage:.0%}), {comparison['found'] - comparison['matched']} with different values")
+        for salt, counts in sorted(comparison['salts'].items()):
+            print(f"  {salt:<14} {counts['matched']:>4}/{counts['points']:<4} matched")
+        for difference in comparison['differences']:
+            if difference['found'] is not None:
+                print(f"  {difference['salt']} at {difference['temperature']} °C: "
+                      f"{difference['mass_percent']} mass %, found {difference['found']}")
+        # As a regression check, only the coverage of the reference decides the exit status
+        failed = coverage < args.min_coverage
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Report written to '{args.report}'")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
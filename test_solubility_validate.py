@@ -0,0 +1,23 @@
+"""Consistency checks of solubility_validate.py against the curated SDS-13 data."""
+
+import csv
+from pathlib import Path
+
+from solubility_validate import columns_from_rows, load_inputs, validate
+
+CURATED_CSV = Path(__file__).resolve().parent / 'SDS-13_solubility_data.csv'
+
+
+def test_curated_mass_percent_rows_pass_g_per_100g_check():
+    columns, _ = load_inputs([CURATED_CSV])
+    flagged, _ = validate(columns)['g_per_100g']
+    assert len(flagged) == 45
+    assert not flagged.any()
+
+
+def test_g_per_100g_check_still_flags_experimental_rows():
+    with open(CURATED_CSV, 'r', newline='', encoding='utf-8') as f:
+        experimental = next(row for row in csv.DictReader(f) if row['Mass_Saturated_Solution_g'])
+    experimental['Solubility_mass_percent'] = str(float(experimental['Solubility_mass_percent']) + 5)
+    flagged, _ = validate(columns_from_rows([experimental]))['g_per_100g']
+    assert flagged.tolist() == [True]